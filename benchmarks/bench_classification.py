@@ -0,0 +1,56 @@
+"""Batch classification throughput against the stub LLM, by concurrency.
+
+    python -m benchmarks.bench_classification --threads 200 --llm-delay 0.5 --concurrency 1 4 8
+
+Threads are synthetic six-exchange conversations fed straight into
+``classify_threads`` with the real classification chain, so the numbers
+cover prompt formatting, the Ollama client and label parsing but not the
+Postgres scan or label writes. The stub answers every call after
+``llm-delay`` seconds, so threads/min should scale with concurrency until
+the stub or the client becomes the limit.
+"""
+import argparse
+import json
+import time
+from benchmarks.stub_ollama import StubOllamaHandler, start_stub
+from server.jobs.classification import classify_threads, make_classifier
+from server.utils.classification import CLASSIFICATION_MODEL, CLASSIFICATION_WINDOW
+from server.utils.models import models
+
+
+def synthetic_threads(count):
+    for i in range(count):
+        exchanges = [
+            json.dumps([
+                {"content": f"Halo, saya butuh WhatsApp API untuk {i % 7 + 1} cabang, turn {turn}", "role": "user"},
+                {"content": "Tentu, paket kami mendukung multi-agent dan broadcast.", "role": "assistant"},
+            ])
+            for turn in range(CLASSIFICATION_WINDOW)
+        ]
+        yield f"thread-{i:06d}", exchanges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--llm-delay", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    # A reply shaped like the prompt asks for, so labels are parsed as in production.
+    StubOllamaHandler.tokens = ["Konteks Percakapan: ", "calon pelanggan.\n", "Label: ", "Qualified"]
+    server, url = start_stub(llm_delay=args.llm_delay)
+    classify = make_classifier(models.chat_model(model=CLASSIFICATION_MODEL, base_url=url))
+
+    print(f"{'concurrency':>11} {'threads':>8} {'labelled':>9} {'threads/min':>12}")
+    for concurrency in args.concurrency:
+        started = time.perf_counter()
+        results = list(classify_threads(synthetic_threads(args.threads), classify, concurrency))
+        elapsed = time.perf_counter() - started
+        labelled = sum(1 for _thread_id, label, error in results if label is not None and error is None)
+        print(f"{concurrency:>11} {len(results):>8} {labelled:>9} {len(results) / elapsed * 60:>12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Embedding throughput: per-text OllamaEmbeddings vs. the batched EmbeddingEngine.
+
+    python -m benchmarks.bench_embedding --chunks 2000 --embed-delay 0.02
+
+A stub embedding server is started in-process; each request costs
+``embed-delay`` seconds regardless of how many texts it carries, which is
+roughly how a local Ollama behaves for small models.
+"""
+import argparse
+import os
+import tempfile
+import time
+from langchain_community.embeddings import OllamaEmbeddings
+from server.utils.embedding import EmbeddingCache, EmbeddingEngine
+from benchmarks.stub_ollama import start_stub
+
+
+def measure(label, embed, texts):
+    started = time.perf_counter()
+    vectors = embed(texts)
+    elapsed = time.perf_counter() - started
+    assert len(vectors) == len(texts)
+    print(f"{label:<32} {len(texts) / elapsed:>10.1f} embeddings/s  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--embed-delay", type=float, default=0.02)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--in-flight", type=int, default=4)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    server, url = start_stub(embed_delay=args.embed_delay)
+    texts = [f"Potongan dokumen nomor {i} tentang produk Maxchat SKU-{i:05d}." for i in range(args.chunks)]
+
+    if not args.skip_baseline:
+        baseline = OllamaEmbeddings(model="all-minilm:l6-v2", base_url=url)
+        measure("OllamaEmbeddings (per text)", baseline.embed_documents, texts)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = EmbeddingEngine(
+            base_url=url,
+            batch_size=args.batch_size,
+            max_in_flight=args.in_flight,
+            cache=EmbeddingCache(os.path.join(directory, "cache.sqlite3")),
+        )
+        measure(f"EmbeddingEngine cold (b={args.batch_size}, n={args.in_flight})", engine.embed_documents, texts)
+        measure("EmbeddingEngine warm cache", engine.embed_documents, texts)
+        print(engine.stats())
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Peak memory and throughput: eager ingestion vs. the streaming pipeline.
+
+    python -m benchmarks.bench_ingestion_memory --files 10 40 --pages 40
+
+Each (mode, corpus size) runs in a fresh interpreter so ru_maxrss is that
+run's own peak. "eager" parses every page, splits everything and only then
+writes to Chroma, as ingestion did before; "streaming" goes through
+``ingest_documents``. Embeddings come from the in-process Ollama stub.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_once(mode, paths, url, workdir):
+    from server.utils.embedding import EmbeddingCache, EmbeddingEngine
+    from server.utils.pdf_loader import ParallelPDFLoader, shutdown_pdf_pool
+    from server.utils.chroma import split_documents, add_to_chroma
+    from server.utils.pipeline import ingest_documents
+
+    engine = EmbeddingEngine(base_url=url, cache=EmbeddingCache(os.path.join(workdir, "cache.sqlite3")))
+    location = os.path.join(workdir, "chroma")
+    started = time.perf_counter()
+    if mode == "eager":
+        documents = ParallelPDFLoader(paths).load()
+        chunk_ids = add_to_chroma(split_documents(documents), location, embedding_function=engine)
+    else:
+        chunk_ids = ingest_documents(ParallelPDFLoader(paths).lazy_load(), location, embedding_function=engine)
+    elapsed = time.perf_counter() - started
+    shutdown_pdf_pool()
+
+    # Linux reports ru_maxrss in KiB.
+    peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"chunks": len(chunk_ids), "seconds": elapsed, "peak_rss_mib": peak_mib}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--embed-delay", type=float, default=0.005)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "CORPUS", "URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, corpus, url = args.child
+        paths = sorted(os.path.join(corpus, name) for name in os.listdir(corpus))
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(run_once(mode, paths, url, workdir)))
+        return
+
+    from benchmarks.stub_ollama import start_stub
+    from benchmarks.synthetic_pdf import write_corpus
+
+    server, url = start_stub(embed_delay=args.embed_delay)
+    print(f"{'mode':<10} {'files':>6} {'chunks':>8} {'chunks/s':>10} {'peak RSS':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for files in args.files:
+            corpus = os.path.join(directory, f"corpus_{files}")
+            write_corpus(corpus, files, args.pages)
+            for mode in ("eager", "streaming"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_ingestion_memory", "--child", mode, corpus, url],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{mode:<10} {files:>6} {result['chunks']:>8} {result['chunks'] / result['seconds']:>10.1f} {result['peak_rss_mib']:>9.1f} MiB")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""PDF parsing throughput: PyPDFLoader vs. the process-pool ParallelPDFLoader.
+
+    python -m benchmarks.bench_pdf_loading --files 50 --pages 40 --workers 8
+
+A synthetic corpus is written to a temporary directory first; pages carry
+about 600 words of text each, so the numbers reflect text extraction cost.
+"""
+import argparse
+import tempfile
+import time
+from langchain_community.document_loaders import PyPDFLoader
+from server.utils.pdf_loader import ParallelPDFLoader, shutdown_pdf_pool
+from benchmarks.synthetic_pdf import write_corpus
+
+
+def measure(label, load):
+    started = time.perf_counter()
+    documents = load()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {len(documents) / elapsed:>10.1f} pages/s  ({len(documents)} pages, {elapsed:.2f}s)")
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_corpus(directory, args.files, args.pages)
+
+        if not args.skip_baseline:
+            baseline = measure("PyPDFLoader (sequential)", lambda: [doc for path in paths for doc in PyPDFLoader(path).load()])
+
+        loader = ParallelPDFLoader(paths, max_workers=args.workers, pages_per_task=args.pages_per_task)
+        # The first run includes starting the worker processes.
+        measure(f"ParallelPDFLoader cold (w={args.workers})", loader.load)
+        documents = measure(f"ParallelPDFLoader warm (w={args.workers})", loader.load)
+
+        if not args.skip_baseline:
+            assert [(d.metadata["source"], d.metadata["page"]) for d in documents] == \
+                [(d.metadata["source"], d.metadata["page"]) for d in baseline]
+
+    shutdown_pdf_pool()
+
+
+if __name__ == "__main__":
+    main()
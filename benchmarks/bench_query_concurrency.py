@@ -0,0 +1,70 @@
+"""Throughput of POST /{assistant_id}/query/{thread_id} at increasing concurrency.
+
+Start the stub Ollama server and the API against it, then run the load:
+
+    python -m benchmarks.stub_ollama --port 11500 --llm-delay 0.5
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 python main.py --port 1111
+    python -m benchmarks.bench_query_concurrency --token <jwt> --assistant <id> --assistant <id>
+
+With a non-blocking query path requests per second should grow roughly
+linearly with concurrency until the executor or the database saturates; with a
+blocking path it stays flat at about 1 / llm_delay.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _post(url, token, body=None):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body or {}).encode("utf-8"),
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read())
+
+
+def run_level(base_url, token, threads, concurrency, requests_per_worker):
+    def worker(index):
+        assistant_id, thread_id = threads[index % len(threads)]
+        latencies = []
+        for _ in range(requests_per_worker):
+            started = time.perf_counter()
+            _post(f"{base_url}/{assistant_id}/query/{thread_id}", token, {"query_text": "Apa itu Maxchat?"})
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [value for result in pool.map(worker, range(concurrency)) for value in result]
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, statistics.median(latencies), max(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:1111/api/v1/assistant")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--assistant", action="append", required=True)
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per worker at each level")
+    args = parser.parse_args()
+
+    threads = []
+    for assistant_id in args.assistant:
+        created = _post(f"{args.base_url}/{assistant_id}/thread", args.token)
+        threads.append((assistant_id, created["thread_id"]))
+
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 s':>8} {'max s':>8}")
+    for level in [int(value) for value in args.levels.split(",")]:
+        throughput, p50, worst = run_level(args.base_url, args.token, threads, level, args.requests)
+        print(f"{level:>11} {throughput:>8.2f} {p50:>8.3f} {worst:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
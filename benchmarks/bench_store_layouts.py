@@ -0,0 +1,95 @@
+"""Query latency and resource use: one store per assistant vs. one per tenant.
+
+    python -m benchmarks.bench_store_layouts --assistants 50 --chunks 2000 --queries 1000
+
+Every assistant gets the same number of random chunks. Queries go to random
+assistants; the per-assistant layout keeps every store open the way the
+store cache would, the tenant layout filters one shared store by
+``assistant_id``. Open file descriptors and RSS are read after loading.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+from server.vectorstores.chroma import ChromaVectorStore
+from server.vectorstores.local import LocalVectorStore
+from server.vectorstores.scoped import AssistantScopedStore
+
+
+def open_files() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def load(store, vectors, batch_size=1000):
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        ids = [f"doc.pdf:0:{i}" for i in range(start, start + len(batch))]
+        store.upsert(ids, batch.tolist(), ids, [{"id": chunk_id} for chunk_id in ids])
+    store.persist()
+
+
+def build(layout, make, directory, data):
+    if layout == "assistant":
+        stores = {}
+        for assistant_id, vectors in data.items():
+            stores[assistant_id] = make(os.path.join(directory, assistant_id))
+            load(stores[assistant_id], vectors)
+        return stores
+    shared = make(os.path.join(directory, "COLLECTION"))
+    stores = {assistant_id: AssistantScopedStore(shared, assistant_id) for assistant_id in data}
+    for assistant_id, vectors in data.items():
+        load(stores[assistant_id], vectors)
+    return stores
+
+
+def run(label, layout, make, data, probes, k):
+    with tempfile.TemporaryDirectory() as directory:
+        fds_before = open_files()
+        started = time.perf_counter()
+        stores = build(layout, make, directory, data)
+        load_seconds = time.perf_counter() - started
+        fds = open_files() - fds_before
+
+        assistants = list(stores)
+        latencies = []
+        for i, probe in enumerate(probes):
+            store = stores[assistants[i % len(assistants)]]
+            started = time.perf_counter()
+            store.search(probe.tolist(), k=k)
+            latencies.append(time.perf_counter() - started)
+
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{label:<26} p50 {p50:>7.2f} ms  p95 {p95:>7.2f} ms  fds {fds:>5}  peak RSS {rss_mib:>7.1f} MiB  (load {load_seconds:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assistants", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--layouts", nargs="+", choices=("assistant", "tenant"), default=["assistant", "tenant"])
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {f"assistant{i:03d}": rng.normal(size=(args.chunks, args.dim)).astype(np.float32) for i in range(args.assistants)}
+    probes = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    backends = [("local", lambda d: LocalVectorStore(d))]
+    if not args.skip_chroma:
+        backends.append(("chroma", lambda d: ChromaVectorStore(d, embedding_function=None)))
+
+    # Peak RSS only grows within a process; pass a single --layouts value
+    # to compare memory.
+    for backend, make in backends:
+        for layout in args.layouts:
+            run(f"{backend} {layout}", layout, make, data, probes, args.k)
+
+
+if __name__ == "__main__":
+    main()
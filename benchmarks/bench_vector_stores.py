@@ -0,0 +1,80 @@
+"""Recall@k and QPS of the vector store backends on the same data.
+
+    python -m benchmarks.bench_vector_stores --vectors 100000 --dim 384 --queries 500
+
+Vectors are random unit vectors with some cluster structure; queries are
+noisy copies of stored vectors. Ground truth is an exact float64 search, so
+the exact local engine should score 1.0 and HNSW/float16 show what they trade.
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from server.vectorstores.chroma import ChromaVectorStore
+from server.vectorstores.local import LocalVectorStore
+
+
+def make_data(count, dim, queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 1000, 1), dim))
+    vectors = centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.5, size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, count, queries)
+    probes = vectors[picks] + rng.normal(scale=0.05, size=(queries, dim))
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return vectors.astype(np.float32), probes.astype(np.float32)
+
+
+def load(store, vectors, batch_size=5000):
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        ids = [f"chunk:{i}" for i in range(start, start + len(batch))]
+        store.upsert(ids, batch.tolist(), ids, [{"id": chunk_id} for chunk_id in ids])
+    store.persist()
+    return time.perf_counter() - started
+
+
+def evaluate(label, store, vectors, probes, k):
+    load_seconds = load(store, vectors)
+    truth = np.argsort(-(vectors.astype(np.float64) @ probes.T.astype(np.float64)), axis=0)[:k].T
+
+    # One untimed query builds any lazy index.
+    store.search(probes[0].tolist(), k=k)
+    started = time.perf_counter()
+    found = [store.search(probe.tolist(), k=k) for probe in probes]
+    elapsed = time.perf_counter() - started
+
+    hits = 0
+    for expected, results in zip(truth, found):
+        rows = {int(doc.metadata["id"].split(":")[1]) for doc, _score in results}
+        hits += len(rows & set(expected.tolist()))
+    recall = hits / (len(probes) * k)
+    print(f"{label:<28} recall@{k}={recall:.3f}  {len(probes) / elapsed:>9.1f} QPS  (load {load_seconds:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors, probes = make_data(args.vectors, args.dim, args.queries)
+    backends = [
+        ("local exact float32", lambda d: LocalVectorStore(d, dtype="float32", exact_max=args.vectors)),
+        ("local exact float16", lambda d: LocalVectorStore(d, dtype="float16", exact_max=args.vectors)),
+        ("local hnsw float32", lambda d: LocalVectorStore(d, dtype="float32", exact_max=0)),
+    ]
+    if not args.skip_chroma:
+        backends.append(("chroma 0.3", lambda d: ChromaVectorStore(d, embedding_function=None)))
+
+    for label, make in backends:
+        with tempfile.TemporaryDirectory() as directory:
+            evaluate(label, make(directory), vectors, probes, args.k)
+
+
+if __name__ == "__main__":
+    main()
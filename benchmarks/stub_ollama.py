@@ -0,0 +1,132 @@
+"""Minimal stand-in for the Ollama HTTP API used by the benchmarks.
+
+Run it on its own with ``python -m benchmarks.stub_ollama --port 11500`` and
+point ``OLLAMA_BASE_URL`` at it, or start it in-process with ``start_stub``.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 384
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM):
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    values = []
+    while len(values) < dim:
+        seed = hashlib.sha256(seed).digest()
+        values.extend((byte - 128) / 128.0 for byte in seed)
+    return values[:dim]
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    llm_delay = 0.5
+    embed_delay = 0.01
+    tokens = ["Ini ", "adalah ", "jawaban ", "dari ", "stub ", "Ollama."]
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            data = (json.dumps(chunk) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _count(self):
+        with StubOllamaHandler.lock:
+            StubOllamaHandler.requests_served += 1
+
+    def do_POST(self):
+        body = self._read_json()
+        self._count()
+        model = body.get("model", "stub")
+
+        if self.path in ("/api/embeddings", "/api/embed"):
+            inputs = body.get("input", body.get("prompt", ""))
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            time.sleep(self.embed_delay)
+            vectors = [fake_embedding(text) for text in inputs]
+            if self.path == "/api/embed":
+                return self._send_json({"model": model, "embeddings": vectors})
+            return self._send_json({"embedding": vectors[0]})
+
+        if self.path in ("/api/chat", "/api/generate"):
+            per_token = self.llm_delay / len(self.tokens)
+            chat = self.path == "/api/chat"
+
+            def chunk(text, done):
+                payload = {"model": model, "created_at": "1970-01-01T00:00:00Z", "done": done}
+                if chat:
+                    payload["message"] = {"role": "assistant", "content": text}
+                else:
+                    payload["response"] = text
+                return payload
+
+            if body.get("stream") is False:
+                time.sleep(self.llm_delay)
+                return self._send_json(chunk("".join(self.tokens), True))
+
+            def generate():
+                for token in self.tokens:
+                    time.sleep(per_token)
+                    yield chunk(token, False)
+                yield chunk("", True)
+
+            return self._send_stream(generate())
+
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def make_stub(port: int = 0, llm_delay: float = 0.5, embed_delay: float = 0.01):
+    StubOllamaHandler.llm_delay = llm_delay
+    StubOllamaHandler.embed_delay = embed_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubOllamaHandler)
+    server.daemon_threads = True
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_stub(port: int = 0, llm_delay: float = 0.5, embed_delay: float = 0.01):
+    server, url = make_stub(port, llm_delay, embed_delay)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--llm-delay", type=float, default=0.5)
+    parser.add_argument("--embed-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    server, url = make_stub(args.port, args.llm_delay, args.embed_delay)
+    print(f"Stub Ollama listening on {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,62 @@
+"""Minimal PDF writer for benchmark corpora; pypdf can read but not lay out text."""
+import os
+import random
+
+WORDS = (
+    "maxchat whatsapp business api pelanggan layanan pesan omnichannel integrasi "
+    "broadcast template agen tiket laporan produk harga paket dukungan kontak"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(rng, lines: int, words_per_line: int) -> bytes:
+    parts = ["BT /F1 10 Tf 12 TL 50 780 Td"]
+    for _ in range(lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+        parts.append(f"({_escape(line)}) Tj T*")
+    parts.append("ET")
+    return "\n".join(parts).encode("latin-1")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 50, words_per_line: int = 12, seed: int = 0):
+    rng = random.Random(seed)
+    # Objects: 1 catalog, 2 pages, 3 font, then a (page, content) pair per page.
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for _ in range(pages):
+        stream = _page_stream(rng, lines_per_page, words_per_line)
+        page_number = len(objects) + 1
+        kids.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_number + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_corpus(directory: str, files: int, pages: int, **kwargs):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(files):
+        path = os.path.join(directory, f"doc_{index:03d}.pdf")
+        write_pdf(path, pages, seed=index, **kwargs)
+        paths.append(path)
+    return paths
@@ -1,21 +1,52 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import click, warnings, uvicorn
 from server.api.v1.assistant.handler.delete_handler import router as delete_router
 from server.api.v1.assistant.handler.get_handler import router as get_router
 from server.api.v1.assistant.handler.post_handler import router as post_router
 from server.api.v1.assistant.handler.upload_handler import router as upload_router
 from server.api.v1.user.handler.post_handler import router as user_post_router
+from server.api.v1.user.handler.delete_handler import router as user_delete_router
 from server.api.v1.assistant.workflows.chat_handler import router as chat_router
+from server.api.v1.system.handler.get_handler import router as system_get_router
+from server.database.db import open_pools, close_pools
+from server.database.migrate import migrate
+from server.jobs.ingestion import ingestion_workers
+from server.utils.executor import run_blocking
+from server.utils.admission import Saturated
+from server.utils.pdf_loader import shutdown_pdf_pool
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup():
+    await open_pools()
+    await run_blocking(migrate)
+    ingestion_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    ingestion_workers.stop()
+    shutdown_pdf_pool()
+    await close_pools()
+
+@app.exception_handler(Saturated)
+async def saturated_handler(request: Request, exc: Saturated):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 app.include_router(post_router, prefix="/api/v1/assistant", tags=["Assistant"])
 app.include_router(get_router, prefix="/api/v1/assistant", tags=["Assistant"])
 app.include_router(upload_router, prefix="/api/v1/assistant", tags=["Assistant"])
 app.include_router(delete_router, prefix="/api/v1/assistant", tags=["Assistant"])
 app.include_router(chat_router, prefix="/api/v1/assistant", tags=["Chat"])
 app.include_router(user_post_router, prefix="/api/v1/user", tags=["User"])
+app.include_router(user_delete_router, prefix="/api/v1/user", tags=["User"])
+app.include_router(system_get_router, prefix="/api/v1/system", tags=["System"])
 
 @click.command()
 @click.option('--host', default='0.0.0.0', help='Host address (default: 0.0.0.0)')
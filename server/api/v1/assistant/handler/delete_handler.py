@@ -1,19 +1,19 @@
-from fastapi import APIRouter, Path, Query, HTTPException, Header
-from server.plugins.jwt_utils import verify_token
-from server.database.db import get_db_connection
+from fastapi import APIRouter, Path, Query, HTTPException, Depends
+from server.plugins.jwt_utils import get_tenant_id
+from server.database.db import get_db
+from server.utils.store_cache import vector_stores
+from server.utils.vector_db import forget_file
+from server.utils.chroma import delete_assistant_chunks
+from server.vectorstores.layout import is_shared_location
+from server.utils.manifest import manifest_path
+from server.utils.semantic_cache import semantic_cache
 import os, shutil
 
 router = APIRouter()
 
 @router.delete("/{assistant_id}/file/{file_id}")
-async def delete_file(assistant_id: str, file_id: str = Path(...), authorization: str = Header(None)):
-    conn = get_db_connection()
+def delete_file(assistant_id: str, file_id: str = Path(...), tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
     cursor = conn.cursor()
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
     cursor.execute(
         "SELECT file_location, vector_db_location FROM files WHERE id = %s AND tenant_id = %s AND assistant_id = %s",
         (file_id, tenant_id, assistant_id)
@@ -22,11 +22,12 @@ async def delete_file(assistant_id: str, file_id: str = Path(...), authorization
 
     if result is None:
         cursor.close()
-        conn.close()
         raise HTTPException(status_code=404, detail="File not found or mismatch in tenant_id or assistant_id")
 
     file_location, vector_db_location = result
 
+    forget_file(file_location, vector_db_location, assistant_id)
+
     if os.path.exists(file_location):
         os.remove(file_location)
 
@@ -34,38 +35,30 @@ async def delete_file(assistant_id: str, file_id: str = Path(...), authorization
     if os.path.isdir(file_id_folder):
         shutil.rmtree(file_id_folder)
 
+    if not is_shared_location(vector_db_location):
+        vector_stores.invalidate(vector_db_location)
+
     cursor.execute("DELETE FROM files WHERE id = %s AND tenant_id = %s AND assistant_id = %s", (file_id, tenant_id, assistant_id))
     conn.commit()
 
     cursor.close()
-    conn.close()
 
     return {"message": f"File {file_id} and its associated folder deleted successfully"}
 
-@router.delete("/{assistant_id}")
-async def delete_assistant(assistant_id: str, authorization: str = Header(None)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
-    cursor.execute("SELECT vector_db_location FROM files WHERE tenant_id = %s AND assistant_id = %s LIMIT 1", (tenant_id, assistant_id))
-    result = cursor.fetchone()
-
-    if not result:
-        cursor.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Assistant ID not found for the given tenant")
-
-    vector_db_location = result[0]
+def remove_assistant_data(cursor, tenant_id: str, assistant_id: str):
+    """Removes an assistant's uploads, chunks, manifest and cached answers.
 
-    cursor.execute("SELECT file_location FROM files WHERE tenant_id = %s AND assistant_id = %s", (tenant_id, assistant_id))
+    Leaves its database rows to the caller. Returns False when the assistant
+    has no files.
+    """
+    cursor.execute("SELECT file_location, vector_db_location FROM files WHERE tenant_id = %s AND assistant_id = %s", (tenant_id, assistant_id))
     file_results = cursor.fetchall()
+    if not file_results:
+        return False
+
+    vector_db_location = file_results[0][1]
 
-    for file_result in file_results:
-        file_location = file_result[0]
+    for file_location, _vector_db_location in file_results:
         if os.path.exists(file_location):
             os.remove(file_location)
 
@@ -73,8 +66,26 @@ async def delete_assistant(assistant_id: str, authorization: str = Header(None))
         if os.path.isdir(file_id_folder):
             shutil.rmtree(file_id_folder)
 
-    if os.path.isdir(vector_db_location):
-        shutil.rmtree(vector_db_location)
+    semantic_cache.invalidate(assistant_id)
+    if is_shared_location(vector_db_location):
+        # Other assistants of the tenant live in the same collection.
+        delete_assistant_chunks(vector_db_location, assistant_id)
+    else:
+        vector_stores.invalidate(vector_db_location)
+        if os.path.isdir(vector_db_location):
+            shutil.rmtree(vector_db_location)
+
+    manifest_location = manifest_path(vector_db_location, assistant_id)
+    if os.path.exists(manifest_location):
+        os.remove(manifest_location)
+    return True
+
+@router.delete("/{assistant_id}")
+def delete_assistant(assistant_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    cursor = conn.cursor()
+    if not remove_assistant_data(cursor, tenant_id, assistant_id):
+        cursor.close()
+        raise HTTPException(status_code=404, detail="Assistant ID not found for the given tenant")
 
     cursor.execute("DELETE FROM files WHERE tenant_id = %s AND assistant_id = %s", (tenant_id, assistant_id))
     conn.commit()
@@ -83,6 +94,5 @@ async def delete_assistant(assistant_id: str, authorization: str = Header(None))
     conn.commit()
 
     cursor.close()
-    conn.close()
 
-    return {"message": f"Assistant {assistant_id} and all related data deleted successfully"}
\ No newline at end of file
+    return {"message": f"Assistant {assistant_id} and all related data deleted successfully"}
@@ -1,43 +1,150 @@
-from fastapi import APIRouter, Query, Header, HTTPException
-from server.database.db import get_db_connection
-from server.plugins.jwt_utils import verify_token
+from fastapi import APIRouter, Query, HTTPException, Depends
+from server.database.db import get_db
+from server.plugins.jwt_utils import get_tenant_id
+from server.jobs.ingestion import get_ingestion_job
+from server.jobs.classification import get_classification_run
+from server.utils.pagination import PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, page
+from server.utils.classification import exchanges
 
 router = APIRouter()
 
 @router.get("/{assistant_id}/files")
-async def list_files(assistant_id: str, authorization: str = Header(...)):
-    conn = get_db_connection()
+def list_files(assistant_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
     cursor = conn.cursor()
 
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
-
     cursor.execute("SELECT id, file_name FROM files WHERE tenant_id = %s AND assistant_id = %s", (tenant_id, assistant_id))
     files = cursor.fetchall()
 
     cursor.close()
-    conn.close()
 
     return [f"{file_id}: {file_name}" for file_id, file_name in files]
 
+@router.get("/{assistant_id}/jobs/{job_id}")
+def get_job(assistant_id: str, job_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    job = get_ingestion_job(conn, tenant_id, assistant_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found for the given tenant and assistant")
+
+    return job
+
+@router.get("/{assistant_id}/classification/runs/{run_id}")
+def get_classification(assistant_id: str, run_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    run = get_classification_run(conn, tenant_id, run_id)
+    if run is None or run["assistant_id"] != assistant_id:
+        raise HTTPException(status_code=404, detail="Classification run not found for the given tenant and assistant")
+
+    return run
+
 @router.get("/")
-async def list_assistant_ids(authorization: str = Header(...)):
-    conn = get_db_connection()
+def list_assistant_ids(tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
     cursor = conn.cursor()
-
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
     
     cursor.execute("SELECT DISTINCT assistant_id FROM files WHERE tenant_id = %s", (tenant_id,))
     assistant_ids = cursor.fetchall()
 
     cursor.close()
-    conn.close()
 
-    return [assistant_id[0] for assistant_id in assistant_ids]
\ No newline at end of file
+    return [assistant_id[0] for assistant_id in assistant_ids]
+
+THREAD_COLUMNS = ("id", "assistant_id", "tenant_id", "created_at", "last_message_at", "message_count", "classification")
+
+def _list_threads(conn, tenant_id: str, assistant_id: str, limit: int, cursor_token: str):
+    filters = ["tenant_id = %s"]
+    params = [tenant_id]
+    if assistant_id is not None:
+        filters.append("assistant_id = %s")
+        params.append(assistant_id)
+    if cursor_token:
+        # Row comparison matches the (last_message_at DESC, id DESC) index order.
+        filters.append("(last_message_at, id) < (%s, %s)")
+        params.extend(decode_cursor(cursor_token))
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT {', '.join(THREAD_COLUMNS)}
+        FROM threads
+        WHERE {' AND '.join(filters)}
+        ORDER BY last_message_at DESC, id DESC
+        LIMIT %s
+        """,
+        (*params, limit + 1)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+
+    rows, next_cursor = page(rows, limit, lambda row: (row[4], row[0]))
+    return {"threads": [dict(zip(THREAD_COLUMNS, row)) for row in rows], "next_cursor": next_cursor}
+
+@router.get("/threads")
+def list_tenant_threads(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
+):
+    return _list_threads(conn, tenant_id, None, limit, cursor)
+
+@router.get("/{assistant_id}/threads")
+def list_threads(
+    assistant_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
+):
+    return _list_threads(conn, tenant_id, assistant_id, limit, cursor)
+
+@router.get("/{assistant_id}/threads/{thread_id}/messages")
+def list_messages(
+    assistant_id: str,
+    thread_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    order: str = "asc",
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
+):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+
+    db_cursor = conn.cursor()
+    db_cursor.execute(
+        "SELECT id FROM threads WHERE id = %s AND assistant_id = %s AND tenant_id = %s",
+        (thread_id, assistant_id, tenant_id)
+    )
+    if db_cursor.fetchone() is None:
+        db_cursor.close()
+        raise HTTPException(status_code=404, detail="Thread not found for the given tenant and assistant")
+
+    direction, comparison = ("ASC", ">") if order == "asc" else ("DESC", "<")
+    keyset = ""
+    params = [thread_id]
+    if cursor:
+        keyset = f"AND (created_at, id) {comparison} (%s, %s)"
+        params.extend(decode_cursor(cursor))
+    db_cursor.execute(
+        f"""
+        SELECT id, created_at, message_text
+        FROM messages
+        WHERE thread_id = %s {keyset}
+        ORDER BY created_at {direction}, id {direction}
+        LIMIT %s
+        """,
+        (*params, limit + 1)
+    )
+    rows = db_cursor.fetchall()
+    db_cursor.close()
+
+    rows, next_cursor = page(rows, limit, lambda row: (row[1], row[0]))
+    messages = [
+        {
+            "id": message_id,
+            "created_at": created_at,
+            # One stored row is a user/assistant exchange.
+            "messages": exchanges([message_text]),
+        }
+        for message_id, created_at, message_text in rows
+    ]
+    return {"messages": messages, "next_cursor": next_cursor}
+
@@ -1,10 +1,18 @@
-from server.database.db import get_db_connection
-from server.plugins.jwt_utils import verify_token
-from server.api.v1.assistant.schema.assistant import AssistantCreateRequest, SourceInput
+from server.database.db import get_db
+from server.plugins.jwt_utils import get_tenant_id
+from server.api.v1.assistant.schema.assistant import AssistantCreateRequest, AssistantSettingsRequest, SourceInput, ClassificationRunRequest
+from psycopg.types.json import Jsonb
 import uuid
 from datetime import datetime, timezone
-from server.utils.vector_db import run_update_database_multi, run_update_database_webbase
-from fastapi import FastAPI, HTTPException, Query, Header, APIRouter
+from server.jobs.ingestion import enqueue_ingestion_job, ingestion_workers
+from server.jobs.classification import create_classification_run, get_classification_run, start_classification_run
+from server.utils.semantic_cache import semantic_cache
+from server.utils.retrieval import RETRIEVAL_MODES
+from server.utils.rerank import RERANKERS
+from server.vectorstores.layout import vector_db_location_for
+from server.vectorstores.factory import embedding_info
+from server.utils.models import models
+from fastapi import FastAPI, HTTPException, Query, APIRouter, Depends
 import os, uuid
 from langchain_community.document_loaders import WebBaseLoader
 router = APIRouter()
@@ -12,11 +20,34 @@ router = APIRouter()
 CHUNK_PATH = "data"
 USER_ID = "test"
 DATA_PATH = "data"
+
+INTEGER_SETTINGS = {
+    "rerank_candidates": (1, 200),
+    "context_tokens": (100, 32000),
+    "history_tokens": (0, 32000),
+    "context_chunks": (1, 20),
+}
+
+def _validate_settings(settings: dict):
+    retrieval = settings.get("retrieval")
+    if retrieval is not None and retrieval not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval must be one of: {', '.join(RETRIEVAL_MODES)}")
+    reranker = settings.get("reranker")
+    if reranker is not None and reranker not in RERANKERS:
+        raise HTTPException(status_code=400, detail=f"reranker must be one of: {', '.join(RERANKERS)}")
+    for name, (low, high) in INTEGER_SETTINGS.items():
+        value = settings.get(name)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high):
+            raise HTTPException(status_code=400, detail=f"{name} must be an integer between {low} and {high}")
+
 @router.post("/")
-async def create_assistant(request: AssistantCreateRequest):
+def create_assistant(request: AssistantCreateRequest, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    # The tenant comes from the token; a tenant_id in the body must match it.
+    if request.tenant_id is not None and request.tenant_id != tenant_id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
     assistant_id = str(uuid.uuid4())
+    _validate_settings(request.settings or {})
 
-    conn = get_db_connection()
     cursor = conn.cursor()
 
     created_at = datetime.now(timezone.utc)
@@ -24,49 +55,75 @@ async def create_assistant(request: AssistantCreateRequest):
 
     cursor.execute(
         """
-        INSERT INTO assistants (id, tenant_id, vector_db_location, created_at, llm_model, llm_provider, embedding_model, embedding_provider, type)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO assistants (id, tenant_id, vector_db_location, created_at, llm_model, llm_provider, embedding_model, embedding_provider, type, settings)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """,
-        (assistant_id, request.tenant_id, None, created_at, 
+        (assistant_id, tenant_id, None, created_at, 
          request.llm_model, request.llm_provider, request.embedding_model, 
-         request.embedding_provider, request.type)
+         request.embedding_provider, request.type, Jsonb(request.settings or {}))
     )
     conn.commit()
     cursor.close()
-    conn.close()
 
     return {"assistant_id": assistant_id, "message": "Assistant created successfully"}
 
+@router.patch("/{assistant_id}/settings")
+def update_assistant_settings(
+    assistant_id: str,
+    request: AssistantSettingsRequest,
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
+):
+    _validate_settings(request.settings)
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE assistants
+        SET settings = settings || %s
+        WHERE id = %s AND tenant_id = %s
+        RETURNING settings
+        """,
+        (Jsonb(request.settings), assistant_id, tenant_id)
+    )
+    result = cursor.fetchone()
+    conn.commit()
+    cursor.close()
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Assistant ID not found for the given tenant")
+
+    semantic_cache.invalidate(assistant_id)
+
+    return {"assistant_id": assistant_id, "settings": result[0]}
+
 @router.post("/{assistant_id}/database/add_source")
-async def add_source(
+def add_source(
     assistant_id: str,
     source: SourceInput,
-    authorization: str = Header(None)
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
 ):
 
-    conn = get_db_connection()
     cursor = conn.cursor()
 
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
-
     cursor.execute(
         """
-        SELECT id FROM assistants WHERE id = %s AND tenant_id = %s
+        SELECT vector_db_location, embedding_provider, embedding_model FROM assistants WHERE id = %s AND tenant_id = %s
         """,
         (assistant_id, tenant_id)
     )
-    if cursor.fetchone() is None:
+    assistant = cursor.fetchone()
+    if assistant is None:
         cursor.close()
-        conn.close()
         return {"error": "Assistant ID not found or does not belong to the specified tenant"}
 
     tenant_folder = os.path.join(DATA_PATH, tenant_id)
     assistant_folder = os.path.join(tenant_folder, assistant_id)
-    vector_db_location = os.path.join(assistant_folder, "CHROMA")
+    # An assistant stays in the store it was first given, whatever the
+    # configured layout is now.
+    vector_db_location = assistant[0] or vector_db_location_for(
+        DATA_PATH, tenant_id, assistant_id, embedding=embedding_info(models.embedding_model(assistant[1], assistant[2]))
+    )
 
     cursor.execute(
         """
@@ -77,8 +134,6 @@ async def add_source(
         (vector_db_location, assistant_id, tenant_id)
     )
     conn.commit()
-    cursor.close()
-    conn.close()
 
     os.makedirs(vector_db_location, exist_ok=True)
 
@@ -90,8 +145,6 @@ async def add_source(
 
         os.makedirs(file_folder, exist_ok=True)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
         cursor.execute(
             """
             INSERT INTO files (id, file_name, file_location, assistant_id, vector_db_location, tenant_id)
@@ -99,16 +152,51 @@ async def add_source(
             """,
             (source_id, file_name, file_location, assistant_id, vector_db_location, tenant_id)
         )
-        conn.commit()
         cursor.close()
-        conn.close()
 
-        run_update_database_webbase(source.url, assistant_id, vector_db_location)
+        job_id = enqueue_ingestion_job(
+            conn, tenant_id, assistant_id, "webbase",
+            {"url": source.url, "vector_db_location": vector_db_location}
+        )
+        conn.commit()
+        ingestion_workers.notify()
 
         return {
-            "message": "Website source added and database updated",
+            "message": "Website source added and database update queued",
             "tenant_id": tenant_id,
             "assistant_id": assistant_id,
+            "job_id": job_id,
         }
     else:
-        raise HTTPException(status_code=400, detail="Unsupported source type")
\ No newline at end of file
+        cursor.close()
+        raise HTTPException(status_code=400, detail="Unsupported source type")
+
+@router.post("/{assistant_id}/classification/runs")
+def start_classification(
+    assistant_id: str,
+    request: ClassificationRunRequest = None,
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
+):
+    request = request or ClassificationRunRequest()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM assistants WHERE id = %s AND tenant_id = %s", (assistant_id, tenant_id))
+    if cursor.fetchone() is None:
+        cursor.close()
+        raise HTTPException(status_code=404, detail="Assistant ID not found for the given tenant")
+    cursor.close()
+
+    run_id = create_classification_run(conn, tenant_id, assistant_id, request.relabel)
+    conn.commit()
+    start_classification_run(run_id)
+
+    return {"message": "Classification run started", "assistant_id": assistant_id, "run_id": run_id}
+
+@router.post("/{assistant_id}/classification/runs/{run_id}/resume")
+def resume_classification(assistant_id: str, run_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    run = get_classification_run(conn, tenant_id, run_id)
+    if run is None or run["assistant_id"] != assistant_id:
+        raise HTTPException(status_code=404, detail="Classification run not found for the given tenant and assistant")
+    if not start_classification_run(run_id):
+        raise HTTPException(status_code=409, detail=f"Classification run is {run['status']} and cannot be resumed")
+    return {"message": "Classification run resumed", "assistant_id": assistant_id, "run_id": run_id}
@@ -1,7 +1,10 @@
-from server.database.db import get_db_connection
-from server.utils.vector_db import run_update_database_multi
-from server.plugins.jwt_utils import verify_token
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Path, APIRouter, Header
+from server.database.db import get_db
+from server.jobs.ingestion import enqueue_ingestion_job, ingestion_workers
+from server.plugins.jwt_utils import get_tenant_id
+from server.vectorstores.layout import vector_db_location_for
+from server.vectorstores.factory import embedding_info
+from server.utils.models import models
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Path, APIRouter, Depends
 from typing import List
 import os, uuid, shutil
 
@@ -12,21 +15,14 @@ DATA_PATH = "data"
 router = APIRouter()
 
 @router.post("/{assistant_id}/database/update")
-async def update_database(assistant_id: str, files: List[UploadFile] = File(...), authorization: str = Header(None)):
-    conn = get_db_connection()
+def update_database(assistant_id: str, files: List[UploadFile] = File(...), tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
     cursor = conn.cursor()
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
 
     cursor.execute("SELECT vector_db_location FROM files WHERE tenant_id = %s AND assistant_id = %s LIMIT 1", (tenant_id, assistant_id))
     result = cursor.fetchone()
     
     if not result:
         cursor.close()
-        conn.close()
         raise HTTPException(status_code=404, detail="Assistant ID not found for the given tenant")
 
     vector_db_location = result[0]
@@ -57,40 +53,43 @@ async def update_database(assistant_id: str, files: List[UploadFile] = File(...)
         conn.commit()
 
     cursor.close()
-    conn.close()
 
     all_file_locations = [os.path.join(assistant_folder, file_id, file.filename) for file_id, file in zip(file_ids, files)]
-    run_update_database_multi(all_file_locations, assistant_id, vector_db_location)
+    job_id = enqueue_ingestion_job(
+        conn, tenant_id, assistant_id, "files",
+        {"file_locations": all_file_locations, "vector_db_location": vector_db_location}
+    )
+    conn.commit()
+    ingestion_workers.notify()
 
-    return {"message": "Files uploaded and database update initiated", "tenant_id": tenant_id, "assistant_id": assistant_id}
+    return {"message": "Files uploaded and database update initiated", "tenant_id": tenant_id, "assistant_id": assistant_id, "job_id": job_id}
 
 @router.post("/{assistant_id}/database/upload")
-async def upload_files(
+def upload_files(
     assistant_id: str,
     files: List[UploadFile] = File(...),
-    authorization: str = Header(None)
+    tenant_id: str = Depends(get_tenant_id),
+    conn=Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
     cursor.execute(
         """
-        SELECT id FROM assistants WHERE id = %s AND tenant_id = %s
+        SELECT vector_db_location, embedding_provider, embedding_model FROM assistants WHERE id = %s AND tenant_id = %s
         """,
         (assistant_id, tenant_id)
     )
-    if cursor.fetchone() is None:
+    assistant = cursor.fetchone()
+    if assistant is None:
         cursor.close()
-        conn.close()
         return {"error": "Assistant ID not found or does not belong to the specified tenant"}
 
     tenant_folder = os.path.join(DATA_PATH, tenant_id)
     assistant_folder = os.path.join(tenant_folder, assistant_id)
-    vector_db_location = os.path.join(assistant_folder, "CHROMA")
+    # An assistant stays in the store it was first given, whatever the
+    # configured layout is now.
+    vector_db_location = assistant[0] or vector_db_location_for(
+        DATA_PATH, tenant_id, assistant_id, embedding=embedding_info(models.embedding_model(assistant[1], assistant[2]))
+    )
 
     cursor.execute(
         """
@@ -102,9 +101,6 @@ async def upload_files(
     )
     conn.commit()
 
-    cursor.close()
-    conn.close()
-
     os.makedirs(vector_db_location, exist_ok=True)
 
     file_ids = []
@@ -120,8 +116,6 @@ async def upload_files(
         with open(file_location, "wb") as f:
             shutil.copyfileobj(file.file, f)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
         cursor.execute(
             """
             INSERT INTO files (id, file_name, file_location, assistant_id, vector_db_location, tenant_id)
@@ -130,10 +124,15 @@ async def upload_files(
             (file_id, file.filename, file_location, assistant_id, vector_db_location, tenant_id)
         )
         conn.commit()
-        cursor.close()
-        conn.close()
+
+    cursor.close()
 
     all_file_locations = [os.path.join(assistant_folder, file_id, file.filename) for file_id, file in zip(file_ids, files)]
-    run_update_database_multi(all_file_locations, assistant_id, vector_db_location)
+    job_id = enqueue_ingestion_job(
+        conn, tenant_id, assistant_id, "files",
+        {"file_locations": all_file_locations, "vector_db_location": vector_db_location}
+    )
+    conn.commit()
+    ingestion_workers.notify()
 
-    return {"message": "Files uploaded and database update initiated", "tenant_id": tenant_id, "assistant_id": assistant_id}
\ No newline at end of file
+    return {"message": "Files uploaded and database update initiated", "tenant_id": tenant_id, "assistant_id": assistant_id, "job_id": job_id}
\ No newline at end of file
@@ -1,15 +1,22 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 
 class AssistantCreateRequest(BaseModel):
-    tenant_id: str
+    tenant_id: Optional[str] = None
     vector_db_location: Optional[str] = None
     llm_model: Optional[str] = None
     llm_provider: Optional[str] = None
     embedding_model: Optional[str] = None
     embedding_provider: Optional[str] = None
     type: Optional[str] = None
+    settings: Optional[Dict[str, Any]] = None
+
+class AssistantSettingsRequest(BaseModel):
+    settings: Dict[str, Any]
 
 class SourceInput(BaseModel):
     url: str
     type: str
+
+class ClassificationRunRequest(BaseModel):
+    relabel: bool = False
@@ -1,105 +1,187 @@
-from fastapi import Query, APIRouter, HTTPException, Header
-from server.database.db import get_db_connection
-from server.plugins.jwt_utils import verify_token
+from fastapi import Query, APIRouter, HTTPException, Depends
+from server.database.db import get_db, async_db_connection
+from server.plugins.jwt_utils import get_tenant_id
 from server.api.v1.assistant.schema.workflow import QueryRequest
-from server.api.v1.assistant.workflows.rag_handler import query_rag
-from server.api.v1.assistant.workflows.classification_handler import classification_workflow
+from server.api.v1.assistant.workflows.rag_handler import query_rag, stream_rag
+from server.api.v1.assistant.workflows.classification_handler import classification_workflow, stream_classification_workflow
+from server.utils.admission import Saturated
+from server.utils.context import HISTORY_TOKEN_BUDGET
+from server.utils.models import models
+from server.utils.thread_memory import record_turn, schedule_summary
+from fastapi.responses import StreamingResponse
+from psycopg.types.json import Jsonb
 from langchain_core.messages import AIMessage
-import uuid, json
+import uuid, json, anyio, traceback
 
 router = APIRouter()
 
 @router.post("/{assistant_id}/thread")
-async def create_thread(assistant_id: str, authorization: str = Header(None)):
+def create_thread(assistant_id: str, tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
     thread_id = str(uuid.uuid4())
     
-    conn = get_db_connection()
     cursor = conn.cursor()
     
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
 
     cursor.execute(
         """
         INSERT INTO threads (id, assistant_id, tenant_id)
-        VALUES (%s, %s, %s)
+        SELECT %s, id, tenant_id FROM assistants WHERE id = %s AND tenant_id = %s
         """,
         (thread_id, assistant_id, tenant_id)
     )
+    created = cursor.rowcount
     conn.commit()
     cursor.close()
-    conn.close()
+
+    if not created:
+        raise HTTPException(status_code=404, detail="Assistant ID not found")
 
     return {"message": "Thread created", "tenant_id": tenant_id, "assistant_id": assistant_id, "thread_id": thread_id}
 
+async def _prepare_thread(assistant_id: str, tenant_id: str, thread_id: str):
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                """
+                SELECT type, settings, llm_model, llm_provider, embedding_model, embedding_provider
+                FROM assistants WHERE id = %s AND tenant_id = %s
+                """,
+                (assistant_id, tenant_id)
+            )
+            assistant_result = await cursor.fetchone()
+    
+            if not assistant_result:
+                raise HTTPException(status_code=404, detail="Assistant ID not found")
+
+            assistant = dict(zip(("type", "settings", "llm_model", "llm_provider", "embedding_model", "embedding_provider"), assistant_result))
+            assistant["settings"] = assistant["settings"] or {}
+            assistant["tenant_id"] = tenant_id
+
+            if not thread_id:
+                thread_id = str(uuid.uuid4())
+                await cursor.execute(
+                    """
+                    INSERT INTO threads (id, assistant_id, tenant_id, created_at)
+                    VALUES (%s, %s, %s, NOW())
+                    """,
+                    (thread_id, assistant_id, tenant_id)
+                )
+                await conn.commit()
+
+    if assistant["type"] not in ("rag", "classification"):
+        raise HTTPException(status_code=400, detail=f"Unsupported assistant type: {assistant['type']}")
+
+    return assistant, thread_id
+
+async def _save_message(query_text: str, assistant_response, assistant_id: str, tenant_id: str, thread_id: str, assistant: dict = None, partial: bool = False):
+    assistant = assistant or {}
+    settings = assistant.get("settings") or {}
+    combined_message = [
+        {"content": query_text, "role": "user"},
+        {"content": assistant_response, "role": "assistant"}
+    ]
+    if partial:
+        # The client went away mid-answer; the text is kept but marked as cut off.
+        combined_message[1]["partial"] = True
+
+    message_id = str(uuid.uuid4())
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                """
+                INSERT INTO messages (id, thread_id, assistant_id, tenant_id, message_text, created_at)
+                VALUES (%s, %s, %s, %s, %s, NOW())
+                """,
+                (message_id, thread_id, assistant_id, tenant_id, Jsonb(combined_message))
+            )
+            await cursor.execute(
+                "UPDATE threads SET message_count = message_count + 1, last_message_at = NOW() WHERE id = %s",
+                (thread_id,)
+            )
+            summarize = await record_turn(
+                cursor, thread_id, tenant_id, query_text, assistant_response, settings.get("history_tokens", HISTORY_TOKEN_BUDGET)
+            )
+            await conn.commit()
+
+    if summarize:
+        schedule_summary(thread_id, tenant_id, models.chat_model(assistant.get("llm_provider"), assistant.get("llm_model")))
+
+def _sse(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/{assistant_id}/query/{thread_id}")
-async def query_rag_endpoint(request: QueryRequest, assistant_id: str, thread_id: str = None, authorization: str = Header(None)):
+async def query_rag_endpoint(request: QueryRequest, assistant_id: str, thread_id: str = None, tenant_id: str = Depends(get_tenant_id)):
     if not assistant_id:
         raise HTTPException(status_code=400, detail="Assistant ID must be provided")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
-    
-    token = authorization.split(" ")[1]
-    tenant_id = verify_token(token)
-    
-    cursor.execute("SELECT type FROM assistants WHERE id = %s AND tenant_id = %s", (assistant_id, tenant_id))
-    assistant_type_result = cursor.fetchone()
-    
-    if not assistant_type_result:
-        cursor.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Assistant ID not found")
+    # The connection is released before the workflow runs so it is not held
+    # for the whole LLM call.
+    assistant, thread_id = await _prepare_thread(assistant_id, tenant_id, thread_id)
 
-    assistant_type = assistant_type_result[0]
-
-    if not thread_id:
-        thread_id = str(uuid.uuid4())
-        cursor.execute(
-            """
-            INSERT INTO threads (id, assistant_id, tenant_id, created_at)
-            VALUES (%s, %s, %s, NOW())
-            """,
-            (thread_id, assistant_id, tenant_id)
-        )
-        conn.commit()
-
-    if assistant_type == "rag":
-        workflow_result = query_rag(request.query_text, assistant_id, thread_id)
-    elif assistant_type == "classification":
-        workflow_result = classification_workflow(request.query_text, assistant_id, thread_id)
+    if assistant["type"] == "rag":
+        workflow_result = await query_rag(request.query_text, assistant_id, thread_id, assistant)
     else:
-        cursor.close()
-        conn.close()
-        raise HTTPException(status_code=400, detail=f"Unsupported assistant type: {assistant_type}")
+        workflow_result = await classification_workflow(request.query_text, assistant_id, thread_id, assistant)
     
     assistant_response = workflow_result["response"].content if isinstance(workflow_result["response"], AIMessage) else workflow_result["response"]
 
-    combined_message = [
-        {"content": request.query_text, "role": "user"},
-        {"content": assistant_response, "role": "assistant"}
-    ]
+    await _save_message(request.query_text, assistant_response, assistant_id, tenant_id, thread_id, assistant)
 
-    message_id = str(uuid.uuid4())
-    cursor.execute(
-        """
-        INSERT INTO messages (id, thread_id, assistant_id, tenant_id, message_text, created_at)
-        VALUES (%s, %s, %s, %s, %s, NOW())
-        """,
-        (message_id, thread_id, assistant_id, tenant_id, json.dumps(combined_message))
-    )
-    conn.commit()
-
-    cursor.close()
-    conn.close()
     print(workflow_result)
     return {
         "message": "Query executed",
         "result": workflow_result,
         "thread_id": thread_id
-    }
\ No newline at end of file
+    }
+
+@router.post("/{assistant_id}/query/{thread_id}/stream")
+async def stream_query_endpoint(request: QueryRequest, assistant_id: str, thread_id: str = None, tenant_id: str = Depends(get_tenant_id)):
+    if not assistant_id:
+        raise HTTPException(status_code=400, detail="Assistant ID must be provided")
+
+    assistant, thread_id = await _prepare_thread(assistant_id, tenant_id, thread_id)
+
+    # Retrieval runs before the response starts so lookup errors still come
+    # back as regular HTTP errors instead of a broken event stream.
+    if assistant["type"] == "rag":
+        workflow_result = await stream_rag(request.query_text, assistant_id, thread_id, assistant)
+    else:
+        workflow_result = await stream_classification_workflow(request.query_text, assistant_id, thread_id, assistant)
+
+    async def event_stream():
+        parts = []
+        completed = False
+        failed = False
+        try:
+            async for token in workflow_result["tokens"]:
+                parts.append(token)
+                yield _sse("token", {"content": token})
+            completed = True
+
+            done = {"sources": workflow_result.get("sources", []), "thread_id": thread_id}
+            for key in ("scores", "usage", "classification", "label", "cached"):
+                if key in workflow_result:
+                    done[key] = workflow_result[key]
+            yield _sse("done", done)
+        # Headers are already sent, so failures are reported in-band.
+        except Saturated as e:
+            failed = True
+            yield _sse("error", {"status": e.status_code, "detail": e.detail, "retry_after": e.retry_after})
+        except Exception as e:
+            failed = True
+            traceback.print_exc()
+            yield _sse("error", {"status": 500, "detail": f"Generation failed: {type(e).__name__}"})
+        finally:
+            # Persist whatever was generated, also when the client went away
+            # and the stream was cancelled; a failed generation is not a turn.
+            if not failed:
+                with anyio.CancelScope(shield=True):
+                    await _save_message(
+                        request.query_text, "".join(parts), assistant_id, tenant_id, thread_id, assistant, partial=not completed
+                    )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
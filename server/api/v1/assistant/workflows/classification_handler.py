@@ -1,80 +1,212 @@
 from server.api.v1.assistant.schema.workflow import InputData
-from server.database.db import get_db_connection
+from server.database.db import async_db_connection
 from fastapi import HTTPException
 from server.utils.prompts import prompt
-from langchain_community.chat_models import ChatOllama
+from server.utils.models import models
+from server.utils.admission import Saturated
+from server.utils.context import HISTORY_TOKEN_BUDGET
+from server.utils.thread_memory import thread_history
+from server.utils.classification import CLASSIFICATION_MODEL, CLASSIFICATION_WINDOW, classification_input, exchanges, is_due, parse_label
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
-import os
+import anyio
 
 load_dotenv()
 
-classification_llm = ChatOllama(model='llama3:8b-maxchat', temperature=0, base_url=os.getenv('OLLAMA_BASE_URL'))
-
 output_parser = StrOutputParser()
 
-def generate_response(data: InputData):
+regular_prompt = PromptTemplate.from_template(
+    """Anda adalah assistant AI dari Maxchat, Maxchat merupakan WhatsApp Business Solutions Provider (BSP WA) untuk penyedia layanan WhatsApp API Official dan Omnichannel, jika ada pertanyaan, jawab sebaik mungkin sebagai Assistant AI Maxchat, jika ada pertanyaan terkait produk atau hal spesifik, berikan kontak maxchat: 0812-3451-1449 dan halo@maxchat.id
+    {input}"""
+)
+
+_chains = {}
+
+def _chain(chain_prompt, handle):
+    # Chains are composed once per (prompt, model) and reused.
+    key = (id(chain_prompt), handle)
+    chain = _chains.get(key)
+    if chain is None:
+        chain = _chains[key] = chain_prompt | handle.client | output_parser
+    return chain
+
+def _classification_chain_input(data: InputData):
+    return {"input": classification_input(data.input)}
+
+async def generate_response(data: InputData, tenant_id: str = None):
     try:
-        formatted_input = "\n".join([f'{key}: {value}' for message in data.input for key, value in message.items()])
-        
-        chain = prompt | classification_llm | output_parser
-        response = chain.invoke({"input": formatted_input})
+        handle = models.chat_model(model=CLASSIFICATION_MODEL)
+        chain_input = _classification_chain_input(data)
+        response = await handle.admission.run(
+            tenant_id, (handle.model, chain_input["input"]), lambda: _chain(prompt, handle).ainvoke(chain_input)
+        )
         
         return {"response": response}
+    except Saturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-def classification_workflow(query_text: str, assistant_id: str, thread_id: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT message_text 
-        FROM messages 
-        WHERE thread_id = %s 
-        ORDER BY created_at DESC 
-        LIMIT 6
-        """, 
-        (thread_id,)
-    )
-
-    previous_messages = cursor.fetchall()
-
-    if len(previous_messages) >= 10:
-        previous_messages.reverse()
-        formatted_input = [{"content": f"{msg[0]}", "role": "user"} for msg in previous_messages]
-        formatted_input.append({"content": query_text, "role": "user"})
-
-        input_data = InputData(input=formatted_input)
-        classification_response = generate_response(input_data)
-
-        cursor.close()
-        conn.close()
+class _Claim:
+    def __init__(self, previous_messages, message_count: int, previous_count):
+        self.previous_messages = previous_messages
+        self.message_count = message_count
+        self.previous_count = previous_count
+
+async def _classification_state(thread_id: str):
+    """The thread's stored label, plus a claim when a new window is due.
+
+    The trigger reads the counters kept on ``threads``; messages are only
+    fetched for a window that is actually classified, and the claim keeps
+    concurrent turns from classifying the same window twice.
+    """
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                "SELECT message_count, classification, classified_at_count FROM threads WHERE id = %s",
+                (thread_id,)
+            )
+            row = await cursor.fetchone()
+            if row is None:
+                return None, None
+            message_count, label, classified_at_count = row
+            if not is_due(message_count, classified_at_count):
+                return label, None
+
+            await cursor.execute(
+                """
+                UPDATE threads SET classified_at_count = %s
+                WHERE id = %s AND classified_at_count IS NOT DISTINCT FROM %s
+                """,
+                (message_count, thread_id, classified_at_count)
+            )
+            if cursor.rowcount == 0:
+                return label, None
+
+            await cursor.execute(
+                """
+                SELECT message_text 
+                FROM messages 
+                WHERE thread_id = %s 
+                ORDER BY created_at DESC 
+                LIMIT %s
+                """, 
+                (thread_id, CLASSIFICATION_WINDOW)
+            )
+            previous_messages = await cursor.fetchall()
+        await conn.commit()
+    return label, _Claim(previous_messages, message_count, classified_at_count)
+
+async def _finish_classification(thread_id: str, claim: _Claim, response: str = None):
+    # Stores the label, or gives the window back when classification failed.
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            if response is None:
+                await cursor.execute(
+                    "UPDATE threads SET classified_at_count = %s WHERE id = %s AND classified_at_count = %s",
+                    (claim.previous_count, thread_id, claim.message_count)
+                )
+                label = None
+            else:
+                label = parse_label(response)
+                await cursor.execute(
+                    "UPDATE threads SET classification = COALESCE(%s, classification), classified_at = NOW() WHERE id = %s",
+                    (label, thread_id)
+                )
+        await conn.commit()
+    return label
+
+def _format_classification_input(previous_messages, query_text: str):
+    formatted_input = exchanges([msg[0] for msg in reversed(previous_messages)])
+    formatted_input.append({"content": query_text, "role": "user"})
+    return InputData(input=formatted_input)
+
+async def _fetch_history(thread_id: str, assistant: dict):
+    settings = assistant.get("settings") or {}
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            history_text, _tokens = await thread_history(cursor, thread_id, settings.get("history_tokens", HISTORY_TOKEN_BUDGET))
+    return history_text
+
+def _regular_chain(history_text: str, query_text: str, assistant: dict):
+    handle = models.chat_model(assistant.get("llm_provider"), assistant.get("llm_model"))
+
+    formatted_input = f"{history_text}\n{query_text}"
+    
+    return handle, _chain(regular_prompt, handle), {"input": formatted_input}
+
+async def classification_workflow(query_text: str, assistant_id: str, thread_id: str, assistant: dict = None):
+    assistant = assistant or {}
+    tenant_id = assistant.get("tenant_id")
+    label, claim = await _classification_state(thread_id)
+
+    if claim is not None:
+        input_data = _format_classification_input(claim.previous_messages, query_text)
+        try:
+            classification_response = await generate_response(input_data, tenant_id)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await _finish_classification(thread_id, claim)
+            raise
+        label = await _finish_classification(thread_id, claim, classification_response["response"]) or label
 
         return {
             "response": classification_response,
-            "classification": "Classification Response Generated"
+            "classification": "Classification Response Generated",
+            "label": label
         }
     else:
-        regular_llm = ChatOllama(model="llama3.1:latest", temperature=0, base_url=os.getenv('OLLAMA_BASE_URL'))
-        
-        regular_prompt = PromptTemplate.from_template(
-            """Anda adalah assistant AI dari Maxchat, Maxchat merupakan WhatsApp Business Solutions Provider (BSP WA) untuk penyedia layanan WhatsApp API Official dan Omnichannel, jika ada pertanyaan, jawab sebaik mungkin sebagai Assistant AI Maxchat, jika ada pertanyaan terkait produk atau hal spesifik, berikan kontak maxchat: 0812-3451-1449 dan halo@maxchat.id
-            {input}"""
+        handle, chain, chain_input = _regular_chain(await _fetch_history(thread_id, assistant), query_text, assistant)
+        regular_response = await handle.admission.run(
+            tenant_id, (handle.model, chain_input["input"]), lambda: chain.ainvoke(chain_input)
         )
 
-        formatted_input = "\n".join([f'{msg[0]}' for msg in previous_messages])
-        formatted_input += f"\n{query_text}"
-        
-        chain = regular_prompt | regular_llm | output_parser
-        regular_response = chain.invoke({"input": formatted_input})
-
-        cursor.close()
-        conn.close()
-
         return {
             "response": regular_response,
-            "classification": "Regular Response Generated"
-        }
\ No newline at end of file
+            "classification": "Regular Response Generated",
+            "label": label
+        }
+
+async def stream_classification_workflow(query_text: str, assistant_id: str, thread_id: str, assistant: dict = None):
+    assistant = assistant or {}
+    tenant_id = assistant.get("tenant_id")
+    label, claim = await _classification_state(thread_id)
+
+    if claim is not None:
+        input_data = _format_classification_input(claim.previous_messages, query_text)
+        handle = models.chat_model(model=CLASSIFICATION_MODEL)
+        chain = _chain(prompt, handle)
+        chain_input = _classification_chain_input(input_data)
+        classification = "Classification Response Generated"
+    else:
+        handle, chain, chain_input = _regular_chain(await _fetch_history(thread_id, assistant), query_text, assistant)
+        classification = "Regular Response Generated"
+
+    try:
+        handle.admission.check()
+    except Saturated:
+        if claim is not None:
+            await _finish_classification(thread_id, claim)
+        raise
+
+    result = {"classification": classification, "label": label}
+
+    async def tokens():
+        parts = []
+        completed = False
+        try:
+            async with handle.admission.slot(tenant_id):
+                async for chunk in chain.astream(chain_input):
+                    if chunk:
+                        parts.append(chunk)
+                        yield chunk
+            completed = True
+        finally:
+            if claim is not None:
+                with anyio.CancelScope(shield=True):
+                    stored = await _finish_classification(thread_id, claim, "".join(parts) if completed else None)
+                result["label"] = stored or label
+
+    result["tokens"] = tokens()
+    return result
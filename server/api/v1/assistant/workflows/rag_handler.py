@@ -1,59 +1,165 @@
-from server.database.db import get_db_connection
+from server.database.db import async_db_connection
 from fastapi import HTTPException
-from server.utils.embedding import get_embedding_function
-from langchain.vectorstores.chroma import Chroma
+from server.utils.query_cache import query_cache, normalize_query
+from server.utils.semantic_cache import semantic_cache, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES
+from server.utils.store_cache import vector_stores
+from server.utils.executor import run_blocking
+from server.utils.models import models
+from server.utils.rerank import RERANK_CANDIDATES
+from server.utils.context import CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET, CONTEXT_CANDIDATES, CONTEXT_MAX_CHUNKS, build_context
+from server.utils.thread_memory import thread_history
+from server.utils.tokens import count_tokens
 from langchain.prompts import ChatPromptTemplate
-from langchain_community.chat_models import ChatOllama
-from server.utils.embedding import get_embedding_function
 from server.utils.prompts import PROMPT_TEMPLATE
-from fastapi import HTTPException
-import os
 
-def query_rag(query_text: str, assistant_id: str, thread_id: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+
+async def _search(assistant_id: str, vector_db_location: str, query_text: str, embeddings, tenant_id=None, settings: dict = None):
+    # Identical questions to the same assistant share one embedding and search.
+    settings = settings or {}
+    mode = settings.get("retrieval", "vector")
+    reranker = settings.get("reranker")
+    candidates = settings.get("rerank_candidates", RERANK_CANDIDATES)
+    admission = models.embedding_admission(embeddings)
+    key = (assistant_id, normalize_query(query_text), mode, reranker, candidates)
+    return await admission.run(
+        tenant_id, key,
+        lambda: run_blocking(
+            query_cache.search, assistant_id, vector_db_location, query_text, k=CONTEXT_CANDIDATES, embeddings=embeddings, mode=mode,
+            reranker=reranker, candidates=candidates
+        )
+    )
+
+async def prepare_rag(query_text: str, assistant_id: str, thread_id: str, embeddings=None, tenant_id=None, settings: dict = None):
+    embeddings = embeddings or models.embedding_model()
+    settings = settings or {}
+    async with async_db_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT vector_db_location FROM files WHERE assistant_id = %s", (assistant_id,))
+            vector_db_location = await cursor.fetchone()
+
+            if vector_db_location is None:
+                raise HTTPException(status_code=404, detail="Vector DB location not found")
 
-    cursor.execute("SELECT vector_db_location FROM files WHERE assistant_id = %s", (assistant_id,))
-    vector_db_location = cursor.fetchone()
+            history_text, history_tokens = await thread_history(
+                cursor, thread_id, settings.get("history_tokens", HISTORY_TOKEN_BUDGET)
+            )
 
-    if vector_db_location is None:
-        raise HTTPException(status_code=404, detail="Vector DB location not found")
+    embeddings = models.embedding_for_store(vector_db_location[0], embeddings)
+    combined_context = f"{history_text}\nUser: {query_text}"
 
-    cursor.execute("""
-        SELECT message_text 
-        FROM messages 
-        WHERE thread_id = %s 
-        ORDER BY created_at DESC 
-        LIMIT 4
-    """, (thread_id,))
-    
-    previous_messages = cursor.fetchall()
+    results = await _search(assistant_id, vector_db_location[0], query_text, embeddings, tenant_id, settings)
 
-    previous_messages.reverse()
+    context = build_context(
+        results, settings.get("context_tokens", CONTEXT_TOKEN_BUDGET), settings.get("context_chunks", CONTEXT_MAX_CHUNKS)
+    )
+
+    prompt = prompt_template.format(context=context.text, question=combined_context)
+
+    sources = [doc.metadata.get("id", None) for doc, _score in context.results]
+    scores = [round(float(score), 4) for _doc, score in context.results]
+
+    return {
+        "prompt": prompt,
+        "sources": sources,
+        "scores": scores,
+        "usage": {
+            "prompt_tokens": count_tokens(prompt),
+            "context_tokens": context.tokens,
+            "history_tokens": history_tokens,
+            "context_chunks": len(context.results),
+        },
+        "vector_db_location": vector_db_location[0],
+        "embeddings": embeddings
+    }
 
-    previous_context = "\n".join([msg[0] for msg in previous_messages])
+class _SemanticCacheLookup:
+    def __init__(self, assistant_id: str, settings: dict, context: dict, embeddings):
+        self.assistant_id = assistant_id
+        self.settings = settings
+        self.embeddings = embeddings
+        self.sources = context["sources"]
+        self.version = vector_stores.version(context["vector_db_location"], assistant_id)
+        self.embedding = None
 
-    combined_context = f"{previous_context}\nUser: {query_text}"
+    async def lookup(self, query_text: str):
+        self.embedding = await run_blocking(query_cache.embed_query, self.assistant_id, normalize_query(query_text), self.embeddings)
+        threshold = self.settings.get("semantic_cache_threshold", SEMANTIC_CACHE_THRESHOLD)
+        return semantic_cache.lookup(self.assistant_id, self.version, self.embedding, self.sources, threshold)
 
-    embedding_function = get_embedding_function()
-    db = Chroma(persist_directory=vector_db_location[0], embedding_function=embedding_function)
+    def store(self, response: str):
+        max_entries = self.settings.get("semantic_cache_max_entries", SEMANTIC_CACHE_MAX_ENTRIES)
+        semantic_cache.store(self.assistant_id, self.version, self.embedding, self.sources, response, max_entries)
 
-    results = db.similarity_search_with_score(query_text, k=5)
+async def _semantic_cache_for(query_text: str, assistant_id: str, settings: dict, context: dict, embeddings):
+    if not settings.get("semantic_cache"):
+        return None, None
+    cache = _SemanticCacheLookup(assistant_id, settings, context, embeddings)
+    return cache, await cache.lookup(query_text)
 
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+async def query_rag(query_text: str, assistant_id: str, thread_id: str, assistant: dict = None):
+    assistant = assistant or {}
+    settings = assistant.get("settings") or {}
+    chat, embeddings = models.for_assistant(assistant)
+    tenant_id = assistant.get("tenant_id")
+    context = await prepare_rag(query_text, assistant_id, thread_id, embeddings, tenant_id, settings)
 
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt = prompt_template.format(context=context_text, question=combined_context)
+    cache, cached_response = await _semantic_cache_for(query_text, assistant_id, settings, context, context["embeddings"])
+    if cached_response is not None:
+        return {
+            "response": cached_response,
+            "sources": context["sources"],
+            "scores": context["scores"],
+            "usage": context["usage"],
+            "cached": True
+        }
 
-    model = ChatOllama(model="llama3.1:latest", temperature=0, base_url=os.getenv('OLLAMA_BASE_URL'))
-    response_text = model.invoke(prompt)
+    # Concurrent requests with the same prompt share one generation.
+    response_text = await chat.admission.run(
+        tenant_id, (chat.model, context["prompt"]), lambda: chat.client.ainvoke(context["prompt"])
+    )
 
-    sources = [doc.metadata.get("id", None) for doc, _score in results]
+    if cache is not None:
+        cache.store(response_text.content)
 
-    cursor.close()
-    conn.close()
-    
     return {
         "response": response_text,
-        "sources": sources
-    }
\ No newline at end of file
+        "sources": context["sources"],
+        "scores": context["scores"],
+        "usage": context["usage"],
+        "cached": False
+    }
+
+async def stream_rag(query_text: str, assistant_id: str, thread_id: str, assistant: dict = None):
+    assistant = assistant or {}
+    settings = assistant.get("settings") or {}
+    chat, embeddings = models.for_assistant(assistant)
+    tenant_id = assistant.get("tenant_id")
+    context = await prepare_rag(query_text, assistant_id, thread_id, embeddings, tenant_id, settings)
+
+    cache, cached_response = await _semantic_cache_for(query_text, assistant_id, settings, context, context["embeddings"])
+    if cached_response is None:
+        chat.admission.check()
+
+    async def tokens():
+        if cached_response is not None:
+            yield cached_response
+            return
+
+        parts = []
+        async with chat.admission.slot(tenant_id):
+            async for chunk in chat.client.astream(context["prompt"]):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+
+        if cache is not None:
+            cache.store("".join(parts))
+
+    return {
+        "tokens": tokens(),
+        "sources": context["sources"],
+        "scores": context["scores"],
+        "usage": context["usage"],
+        "cached": cached_response is not None
+    }
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from server.utils.store_cache import vector_stores
+from server.database.db import pool_stats
+from server.plugins.jwt_utils import auth_cache_stats
+from server.utils.models import models
+from server.utils.query_cache import query_cache
+from server.utils.semantic_cache import semantic_cache
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "vector_store_cache": vector_stores.stats(),
+        "postgres_pools": pool_stats(),
+        "auth_cache": auth_cache_stats(),
+        "models": models.stats(),
+        "query_cache": query_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+    }
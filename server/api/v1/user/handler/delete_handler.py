@@ -0,0 +1,29 @@
+from server.database.db import get_db
+from server.plugins.jwt_utils import get_tenant_id, invalidate_tenant
+from server.api.v1.assistant.handler.delete_handler import remove_assistant_data
+from fastapi import HTTPException, APIRouter, Depends
+
+router = APIRouter()
+
+@router.delete("/")
+def delete_tenant(tenant_id: str = Depends(get_tenant_id), conn=Depends(get_db)):
+    cursor = conn.cursor()
+
+    try:
+        # The rows go with the tenant through ON DELETE CASCADE; uploads,
+        # vector stores and caches are cleaned up like a deleted assistant's.
+        cursor.execute("SELECT id FROM assistants WHERE tenant_id = %s ORDER BY id", (tenant_id,))
+        for (assistant_id,) in cursor.fetchall():
+            remove_assistant_data(cursor, tenant_id, assistant_id)
+        cursor.execute("DELETE FROM tenants WHERE id = %s", (tenant_id,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete tenant") from e
+    finally:
+        cursor.close()
+
+    # Tokens of this tenant must stop working right away, not when the
+    # cached existence check expires.
+    invalidate_tenant(tenant_id)
+    return {"message": "Tenant deleted successfully", "tenant_id": tenant_id}
@@ -1,18 +1,17 @@
-from server.database.db import get_db_connection
+from server.database.db import get_db
 from server.api.v1.user.schema.user import RegisterTenantRequest
 import uuid
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Depends
 from server.plugins.jwt_utils import create_token
 from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/register")
-async def register_tenant(request: RegisterTenantRequest):
+def register_tenant(request: RegisterTenantRequest, conn=Depends(get_db)):
     tenant_id = request.tenant_id if request.tenant_id else str(uuid.uuid4())
     created_at = datetime.now()
 
-    conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
@@ -29,6 +28,5 @@ async def register_tenant(request: RegisterTenantRequest):
         raise HTTPException(status_code=500, detail="Failed to register tenant") from e
     finally:
         cursor.close()
-        conn.close()
     token = create_token(tenant_id)
     return {"message": "Tenant registered successfully", "token": token,"tenant_id": tenant_id, "name": request.name, "created_at": created_at}
@@ -0,0 +1,84 @@
+"""Converts messages.message_text from TEXT to JSONB on an existing database.
+
+    python -m server.database.convert_message_text [--check] [--wrap-invalid]
+
+Not a migration, as it rewrites the whole messages table under an ACCESS
+EXCLUSIVE lock: chat is unavailable until it finishes, so run it in a
+maintenance window. Rows that are not valid JSON are listed and abort the
+conversion unless --wrap-invalid stores each of them as a single user
+message. Databases created with 0000_base_schema.sql are JSONB already.
+"""
+import argparse
+import sys
+from server.database.db import db_connection
+
+INVALID_SAMPLE_SIZE = 20
+
+# A temporary function, so the check needs no PostgreSQL 16 pg_input_is_valid.
+IS_JSON_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.is_json(value TEXT) RETURNS BOOLEAN AS $$
+BEGIN
+    PERFORM value::jsonb;
+    RETURN TRUE;
+EXCEPTION WHEN others THEN
+    RETURN FALSE;
+END
+$$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+def message_text_type(cursor):
+    cursor.execute(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'messages' AND column_name = 'message_text'
+        """
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def invalid_messages(cursor):
+    """(count, sample ids) of messages whose text is not valid JSON."""
+    cursor.execute(IS_JSON_FUNCTION)
+    cursor.execute("SELECT COUNT(*) FROM messages WHERE NOT pg_temp.is_json(message_text)")
+    count = cursor.fetchone()[0]
+    cursor.execute("SELECT id FROM messages WHERE NOT pg_temp.is_json(message_text) LIMIT %s", (INVALID_SAMPLE_SIZE,))
+    return count, [row[0] for row in cursor.fetchall()]
+
+def convert(wrap_invalid: bool = False, check_only: bool = False):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        column_type = message_text_type(cursor)
+        if column_type == "jsonb":
+            print("messages.message_text is already JSONB")
+            return True
+
+        count, sample = invalid_messages(cursor)
+        if count:
+            print(f"⚠️ {count} messages are not valid JSON, for example: {', '.join(sample)}")
+            if not wrap_invalid:
+                print("Fix or delete them, or rerun with --wrap-invalid to store each as a single user message.")
+                conn.rollback()
+                return False
+        if check_only:
+            conn.rollback()
+            return True
+
+        cursor.execute(
+            """
+            ALTER TABLE messages ALTER COLUMN message_text TYPE JSONB USING
+                CASE WHEN pg_temp.is_json(message_text) THEN message_text::jsonb
+                     ELSE jsonb_build_array(jsonb_build_object('role', 'user', 'content', message_text))
+                END
+            """
+        )
+        conn.commit()
+        cursor.close()
+    print("✅ messages.message_text is now JSONB")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="only report messages that are not valid JSON")
+    parser.add_argument("--wrap-invalid", action="store_true", help="store non-JSON messages as a single user message")
+    args = parser.parse_args()
+    sys.exit(0 if convert(wrap_invalid=args.wrap_invalid, check_only=args.check) else 1)
@@ -1,10 +1,85 @@
-import os, shutil, psycopg2, uuid
+import os
+from contextlib import asynccontextmanager, contextmanager
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 
-def get_db_connection():
-    return psycopg2.connect(
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+POOL_MAX_IDLE = float(os.getenv("POSTGRES_POOL_MAX_IDLE", "600"))
+POOL_MAX_LIFETIME = float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", "3600"))
+POOL_HEALTH_CHECK = os.getenv("POSTGRES_POOL_HEALTH_CHECK", "true").lower() in ("1", "true", "yes")
+
+def _conninfo():
+    return make_conninfo(
         dbname=os.getenv("POSTGRES_DBNAME"),
         user=os.getenv("POSTGRES_USER"),
         password=os.getenv("POSTGRES_PASSWORD"),
         host=os.getenv("POSTGRES_HOST"),
         port=os.getenv("POSTGRES_PORT")
-    )
\ No newline at end of file
+    )
+
+def _pool_kwargs(check):
+    kwargs = dict(
+        conninfo=_conninfo(),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_idle=POOL_MAX_IDLE,
+        max_lifetime=POOL_MAX_LIFETIME,
+        open=False,
+    )
+    if POOL_HEALTH_CHECK:
+        kwargs["check"] = check
+    return kwargs
+
+pool = ConnectionPool(name="sync", **_pool_kwargs(ConnectionPool.check_connection))
+async_pool = AsyncConnectionPool(name="async", **_pool_kwargs(AsyncConnectionPool.check_connection))
+
+def open_pool():
+    if pool.closed:
+        pool.open()
+
+async def open_async_pool():
+    if async_pool.closed:
+        await async_pool.open()
+
+async def open_pools():
+    open_pool()
+    await open_async_pool()
+
+async def close_pools():
+    await async_pool.close()
+    pool.close()
+
+@contextmanager
+def db_connection():
+    # Commits when the block exits cleanly and rolls back on error before the
+    # connection goes back to the pool.
+    open_pool()
+    with pool.connection() as conn:
+        yield conn
+
+@asynccontextmanager
+async def async_db_connection():
+    await open_async_pool()
+    async with async_pool.connection() as conn:
+        yield conn
+
+def get_db():
+    with db_connection() as conn:
+        yield conn
+
+async def get_async_db():
+    async with async_db_connection() as conn:
+        yield conn
+
+def _stats(connection_pool):
+    stats = connection_pool.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    stats["connections_in_use"] = in_use
+    stats["saturation"] = round(in_use / connection_pool.max_size, 3)
+    return stats
+
+def pool_stats():
+    return {"sync": _stats(pool), "async": _stats(async_pool)}
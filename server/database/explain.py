@@ -0,0 +1,135 @@
+"""Checks that the hot queries are planned as index scans.
+
+    python -m server.database.explain
+
+Each query is EXPLAINed with sequential scans disabled for the transaction.
+On a small or empty table the planner would pick a sequential scan anyway,
+but with them disabled it only falls back to one when no index can serve
+the query, so the check means the same on a fresh database as in
+production. Exits non-zero when any query still reads a table sequentially.
+"""
+import sys
+from datetime import datetime, timezone
+from server.database.db import db_connection
+
+_NOW = datetime.now(timezone.utc)
+
+# (name, query, parameters), written as the handlers send them.
+HOT_QUERIES = (
+    (
+        "recent messages",
+        "SELECT message_text FROM messages WHERE thread_id = %s ORDER BY created_at DESC LIMIT %s",
+        ("thread", 4),
+    ),
+    (
+        "message page",
+        """
+        SELECT id, created_at, message_text FROM messages
+        WHERE thread_id = %s AND (created_at, id) > (%s, %s)
+        ORDER BY created_at ASC, id ASC LIMIT %s
+        """,
+        ("thread", _NOW, "message", 51),
+    ),
+    (
+        "thread owner",
+        "SELECT id FROM threads WHERE id = %s AND assistant_id = %s AND tenant_id = %s",
+        ("thread", "assistant", "tenant"),
+    ),
+    (
+        "thread counters",
+        "SELECT message_count, classification, classified_at_count FROM threads WHERE id = %s",
+        ("thread",),
+    ),
+    (
+        "tenant threads",
+        """
+        SELECT id, last_message_at FROM threads
+        WHERE tenant_id = %s AND (last_message_at, id) < (%s, %s)
+        ORDER BY last_message_at DESC, id DESC LIMIT %s
+        """,
+        ("tenant", _NOW, "thread", 51),
+    ),
+    (
+        "assistant threads",
+        """
+        SELECT id, last_message_at FROM threads
+        WHERE tenant_id = %s AND assistant_id = %s AND (last_message_at, id) < (%s, %s)
+        ORDER BY last_message_at DESC, id DESC LIMIT %s
+        """,
+        ("tenant", "assistant", _NOW, "thread", 51),
+    ),
+    (
+        "thread memory",
+        "SELECT history, history_tokens FROM thread_memory WHERE thread_id = %s",
+        ("thread",),
+    ),
+    (
+        "assistant files",
+        "SELECT vector_db_location FROM files WHERE assistant_id = %s",
+        ("assistant",),
+    ),
+    (
+        "tenant assistant files",
+        "SELECT id, file_name FROM files WHERE tenant_id = %s AND assistant_id = %s",
+        ("tenant", "assistant"),
+    ),
+    (
+        "tenant file assistants",
+        "SELECT DISTINCT assistant_id FROM files WHERE tenant_id = %s",
+        ("tenant",),
+    ),
+    (
+        "assistant",
+        "SELECT type, settings, llm_model, llm_provider FROM assistants WHERE id = %s AND tenant_id = %s",
+        ("assistant", "tenant"),
+    ),
+    (
+        "tenant assistants",
+        "SELECT tenant_id, id, vector_db_location FROM assistants WHERE tenant_id = %s ORDER BY id",
+        ("tenant",),
+    ),
+    (
+        "tenant",
+        "SELECT 1 FROM tenants WHERE id = %s",
+        ("tenant",),
+    ),
+)
+
+
+def plan_scans(plan):
+    """(node type, table, index) for every scan node of a JSON plan."""
+    scans = []
+    if "Relation Name" in plan or "Index Name" in plan:
+        scans.append((plan["Node Type"], plan.get("Relation Name"), plan.get("Index Name")))
+    for child in plan.get("Plans", []):
+        scans.extend(plan_scans(child))
+    return scans
+
+
+def check_indexes(conn, queries=HOT_QUERIES):
+    """(name, scans, ok) per query; ok is False when a table is read sequentially."""
+    results = []
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        for name, query, params in queries:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+            scans = plan_scans(cursor.fetchone()[0][0]["Plan"])
+            results.append((name, scans, all(node_type != "Seq Scan" for node_type, _table, _index in scans)))
+    finally:
+        cursor.close()
+        conn.rollback()
+    return results
+
+
+if __name__ == "__main__":
+    with db_connection() as conn:
+        results = check_indexes(conn)
+
+    for name, scans, ok in results:
+        used = ", ".join(
+            node_type + (f" on {table}" if table else "") + (f" using {index}" if index else "")
+            for node_type, table, index in scans
+        )
+        print(f"{'✅' if ok else '❌'} {name}: {used}")
+    sys.exit(0 if all(ok for _name, _scans, ok in results) else 1)
@@ -0,0 +1,133 @@
+import argparse
+import os
+import sys
+from psycopg import sql
+from server.database.db import db_connection
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+# Arbitrary constant so concurrent workers starting together apply each
+# migration once.
+MIGRATION_LOCK_ID = 7130415
+# Missing parents listed per foreign key when it cannot be validated.
+ORPHAN_SAMPLE_SIZE = 20
+
+def list_migrations():
+    migrations = []
+    for file_name in sorted(os.listdir(MIGRATIONS_PATH)):
+        if file_name.endswith(".sql"):
+            version = file_name.split("_", 1)[0]
+            migrations.append((version, file_name, os.path.join(MIGRATIONS_PATH, file_name)))
+    return migrations
+
+def migrate():
+    applied_now = []
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        # A session lock, as each migration commits on its own: locks a file
+        # takes are released when it is done rather than after the last one.
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+
+            for version, file_name, path in list_migrations():
+                if version in applied:
+                    continue
+                with open(path) as f:
+                    cursor.execute(f.read())
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, file_name))
+                conn.commit()
+                applied_now.append(file_name)
+                print(f"Applied migration {file_name}")
+        finally:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+            cursor.close()
+    return applied_now
+
+def _unvalidated_foreign_keys(cursor):
+    cursor.execute(
+        """
+        SELECT c.conname, child.relname, child_column.attname, parent.relname, parent_column.attname
+        FROM pg_constraint c
+        JOIN pg_class child ON child.oid = c.conrelid
+        JOIN pg_class parent ON parent.oid = c.confrelid
+        JOIN pg_attribute child_column ON child_column.attrelid = c.conrelid AND child_column.attnum = c.conkey[1]
+        JOIN pg_attribute parent_column ON parent_column.attrelid = c.confrelid AND parent_column.attnum = c.confkey[1]
+        WHERE c.contype = 'f' AND NOT c.convalidated AND cardinality(c.conkey) = 1
+        ORDER BY child.relname, c.conname
+        """
+    )
+    return cursor.fetchall()
+
+def validate_foreign_keys():
+    """Validates NOT VALID foreign keys whose table has no orphan rows.
+
+    Keys with orphans are reported and left NOT VALID; nothing is deleted.
+    VALIDATE CONSTRAINT does not block reads or writes, so this can run
+    while the service is up. Returns True when every key is valid.
+    """
+    all_valid = True
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        foreign_keys = _unvalidated_foreign_keys(cursor)
+        conn.commit()
+        for constraint, table, column, parent, parent_column in foreign_keys:
+            cursor.execute(
+                sql.SQL(
+                    """
+                    SELECT c.{column}, COUNT(*) FROM {table} c
+                    WHERE c.{column} IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.{parent_column} = c.{column})
+                    GROUP BY c.{column}
+                    ORDER BY COUNT(*) DESC
+                    LIMIT %s
+                    """
+                ).format(
+                    table=sql.Identifier(table), column=sql.Identifier(column),
+                    parent=sql.Identifier(parent), parent_column=sql.Identifier(parent_column),
+                ),
+                (ORPHAN_SAMPLE_SIZE,)
+            )
+            orphans = cursor.fetchall()
+            conn.commit()
+            if orphans:
+                all_valid = False
+                print(f"❌ {constraint}: {table} rows point at {parent} rows that do not exist:")
+                for value, count in orphans:
+                    print(f"    {column} = {value}: {count} rows")
+                continue
+
+            cursor.execute(
+                sql.SQL("ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}").format(
+                    table=sql.Identifier(table), constraint=sql.Identifier(constraint)
+                )
+            )
+            conn.commit()
+            print(f"✅ Validated {constraint}")
+        cursor.close()
+    return all_valid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--validate", action="store_true",
+        help="validate foreign keys added NOT VALID, reporting rows whose parent is missing"
+    )
+    args = parser.parse_args()
+
+    migrate()
+    if args.validate and not validate_foreign_keys():
+        print("Resolve the rows above (restore their parent or delete them) and run --validate again.")
+        sys.exit(1)
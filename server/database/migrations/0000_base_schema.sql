@@ -0,0 +1,49 @@
+-- The core tables. Existing databases already have them, so this only does
+-- work on a fresh one; indexes, foreign keys and later columns come from
+-- the numbered files. Fresh databases get message_text as JSONB; older
+-- ones still hold TEXT until `python -m server.database.convert_message_text`
+-- is run in a maintenance window. Readers and writers work with both.
+CREATE TABLE IF NOT EXISTS tenants (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS assistants (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    vector_db_location TEXT,
+    llm_model TEXT,
+    llm_provider TEXT,
+    embedding_model TEXT,
+    embedding_provider TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT,
+    assistant_id TEXT,
+    file_name TEXT NOT NULL,
+    file_location TEXT,
+    vector_db_id TEXT,
+    vector_db_location TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    assistant_id TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    tenant_id TEXT NOT NULL,
+    assistant_id TEXT NOT NULL,
+    message_text JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,28 @@
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    assistant_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    pages_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_total INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    heartbeat_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ingestion_jobs_queued_idx
+    ON ingestion_jobs (run_after, created_at) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS ingestion_jobs_running_idx
+    ON ingestion_jobs (tenant_id) WHERE status = 'running';
+
+CREATE INDEX IF NOT EXISTS ingestion_jobs_assistant_idx
+    ON ingestion_jobs (tenant_id, assistant_id, created_at DESC);
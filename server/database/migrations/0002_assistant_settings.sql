@@ -0,0 +1 @@
+ALTER TABLE assistants ADD COLUMN IF NOT EXISTS settings JSONB NOT NULL DEFAULT '{}'::jsonb;
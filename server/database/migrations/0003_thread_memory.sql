@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS thread_memory (
+    thread_id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_turns INTEGER NOT NULL DEFAULT 0,
+    pending JSONB NOT NULL DEFAULT '[]'::jsonb,
+    recent JSONB NOT NULL DEFAULT '[]'::jsonb,
+    history TEXT NOT NULL DEFAULT '',
+    history_tokens INTEGER NOT NULL DEFAULT 0,
+    history_budget INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
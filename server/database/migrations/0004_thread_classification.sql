@@ -0,0 +1,9 @@
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS classification TEXT;
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS classified_at_count INTEGER;
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS classified_at TIMESTAMPTZ;
+
+UPDATE threads
+SET message_count = counts.message_count
+FROM (SELECT thread_id, COUNT(*) AS message_count FROM messages GROUP BY thread_id) AS counts
+WHERE threads.id = counts.thread_id;
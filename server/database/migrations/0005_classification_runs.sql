@@ -0,0 +1,19 @@
+CREATE TABLE IF NOT EXISTS classification_runs (
+    id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    assistant_id TEXT,
+    relabel BOOLEAN NOT NULL DEFAULT FALSE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    checkpoint_thread_id TEXT,
+    threads_done INTEGER NOT NULL DEFAULT 0,
+    threads_labelled INTEGER NOT NULL DEFAULT 0,
+    threads_failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    heartbeat_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS classification_runs_tenant_idx
+    ON classification_runs (tenant_id, created_at DESC);
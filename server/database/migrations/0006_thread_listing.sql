@@ -0,0 +1,23 @@
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMPTZ;
+
+UPDATE threads
+SET last_message_at = COALESCE(latest.last_message_at, threads.created_at, NOW())
+FROM (
+    SELECT t.id, MAX(m.created_at) AS last_message_at
+    FROM threads t LEFT JOIN messages m ON m.thread_id = t.id
+    GROUP BY t.id
+) AS latest
+WHERE threads.id = latest.id AND threads.last_message_at IS NULL;
+
+ALTER TABLE threads ALTER COLUMN last_message_at SET DEFAULT NOW();
+ALTER TABLE threads ALTER COLUMN last_message_at SET NOT NULL;
+
+-- Keyset listing: newest activity first, id as the tie-breaker.
+CREATE INDEX IF NOT EXISTS threads_tenant_activity_idx
+    ON threads (tenant_id, last_message_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS threads_tenant_assistant_activity_idx
+    ON threads (tenant_id, assistant_id, last_message_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS messages_thread_created_idx
+    ON messages (thread_id, created_at, id);
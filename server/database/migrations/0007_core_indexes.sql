@@ -0,0 +1,38 @@
+-- Deleting a tenant or an assistant takes everything under it along.
+-- The keys are added NOT VALID: new rows and cascades are enforced right
+-- away, without scanning existing rows under a lock. Existing rows are
+-- checked by `python -m server.database.migrate --validate`, which lists
+-- rows whose parent is missing instead of deleting them.
+ALTER TABLE assistants ADD CONSTRAINT assistants_tenant_fk
+    FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE files ADD CONSTRAINT files_tenant_fk
+    FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE files ADD CONSTRAINT files_assistant_fk
+    FOREIGN KEY (assistant_id) REFERENCES assistants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE threads ADD CONSTRAINT threads_tenant_fk
+    FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE threads ADD CONSTRAINT threads_assistant_fk
+    FOREIGN KEY (assistant_id) REFERENCES assistants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE messages ADD CONSTRAINT messages_thread_fk
+    FOREIGN KEY (thread_id) REFERENCES threads (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE thread_memory ADD CONSTRAINT thread_memory_thread_fk
+    FOREIGN KEY (thread_id) REFERENCES threads (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE ingestion_jobs ADD CONSTRAINT ingestion_jobs_tenant_fk
+    FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE classification_runs ADD CONSTRAINT classification_runs_tenant_fk
+    FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE NOT VALID;
+
+-- Lookups by tenant, and the referencing side of each cascade. Recent
+-- messages of a thread (newest first) scan messages_thread_created_idx
+-- from 0006 backwards; thread listing uses the 0006 activity indexes.
+CREATE INDEX IF NOT EXISTS assistants_tenant_idx
+    ON assistants (tenant_id, id);
+
+CREATE INDEX IF NOT EXISTS files_tenant_assistant_idx
+    ON files (tenant_id, assistant_id);
+
+CREATE INDEX IF NOT EXISTS files_assistant_idx
+    ON files (assistant_id);
+
+CREATE INDEX IF NOT EXISTS threads_assistant_idx
+    ON threads (assistant_id);
@@ -0,0 +1,263 @@
+"""Offline lead classification of every thread of a tenant or assistant.
+
+    python -m server.jobs.classification --tenant TENANT [--assistant ASSISTANT] [--relabel]
+    python -m server.jobs.classification --resume RUN_ID
+
+Threads are read in thread-id order through a server-side cursor, only their
+last CLASSIFICATION_WINDOW exchanges each. Labels are written back in bulk
+together with the run's checkpoint, so an interrupted run resumes after the
+last thread it wrote.
+"""
+import argparse
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from langchain_core.output_parsers import StrOutputParser
+from server.database.db import db_connection
+from server.jobs.heartbeat import Heartbeat
+from server.utils.models import models
+from server.utils.prompts import prompt
+from server.utils.classification import CLASSIFICATION_MODEL, CLASSIFICATION_WINDOW, classification_input, exchanges, parse_label
+
+CLASSIFICATION_BATCH_CONCURRENCY = int(os.getenv("CLASSIFICATION_BATCH_CONCURRENCY", "4"))
+CLASSIFICATION_BATCH_WRITE_SIZE = int(os.getenv("CLASSIFICATION_BATCH_WRITE_SIZE", "100"))
+CLASSIFICATION_SCAN_ITERSIZE = int(os.getenv("CLASSIFICATION_SCAN_ITERSIZE", "2000"))
+CLASSIFICATION_RUN_STALE_AFTER = float(os.getenv("CLASSIFICATION_RUN_STALE_AFTER", "600"))
+CLASSIFICATION_HEARTBEAT_INTERVAL = float(os.getenv("CLASSIFICATION_HEARTBEAT_INTERVAL", "30"))
+
+RUN_COLUMNS = (
+    "id", "tenant_id", "assistant_id", "relabel", "status", "checkpoint_thread_id",
+    "threads_done", "threads_labelled", "threads_failed", "error",
+    "created_at", "started_at", "finished_at",
+)
+
+def create_classification_run(conn, tenant_id: str, assistant_id: str = None, relabel: bool = False):
+    run_id = str(uuid.uuid4())
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO classification_runs (id, tenant_id, assistant_id, relabel) VALUES (%s, %s, %s, %s)",
+        (run_id, tenant_id, assistant_id, relabel)
+    )
+    cursor.close()
+    return run_id
+
+def get_classification_run(conn, tenant_id: str, run_id: str):
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {', '.join(RUN_COLUMNS)} FROM classification_runs WHERE id = %s AND tenant_id = %s",
+        (run_id, tenant_id)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return None
+    return dict(zip(RUN_COLUMNS, row))
+
+def claim_classification_run(run_id: str):
+    # Queued and failed runs can be (re)started, and so can a running one
+    # whose process stopped heartbeating.
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            UPDATE classification_runs
+            SET status = 'running', started_at = COALESCE(started_at, NOW()), heartbeat_at = NOW(), error = NULL
+            WHERE id = %s AND (
+                status IN ('queued', 'failed')
+                OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s))
+            )
+            RETURNING {', '.join(RUN_COLUMNS)}
+            """,
+            (run_id, CLASSIFICATION_RUN_STALE_AFTER)
+        )
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    if row is None:
+        return None
+    return dict(zip(RUN_COLUMNS, row))
+
+def _finish_run(run_id: str, status: str, error: str = None):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE classification_runs SET status = %s, error = %s, finished_at = NOW(), heartbeat_at = NOW() WHERE id = %s",
+            (status, error, run_id)
+        )
+        conn.commit()
+        cursor.close()
+
+def _write_labels(run_id: str, labels, checkpoint: str, done: int, failed: int):
+    # Labels and the checkpoint commit together, so a resumed run never
+    # skips a thread whose label was lost.
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        if labels:
+            cursor.execute(
+                """
+                UPDATE threads
+                SET classification = labels.label, classified_at = NOW(), classified_at_count = threads.message_count
+                FROM unnest(%s::text[], %s::text[]) AS labels(thread_id, label)
+                WHERE threads.id = labels.thread_id
+                """,
+                ([thread_id for thread_id, _label in labels], [label for _thread_id, label in labels])
+            )
+        cursor.execute(
+            """
+            UPDATE classification_runs
+            SET checkpoint_thread_id = %s, threads_done = threads_done + %s, threads_labelled = threads_labelled + %s,
+                threads_failed = threads_failed + %s, heartbeat_at = NOW()
+            WHERE id = %s
+            """,
+            (checkpoint, done, len(labels), failed, run_id)
+        )
+        conn.commit()
+        cursor.close()
+
+def scan_threads(conn, run, window: int = CLASSIFICATION_WINDOW):
+    """(thread id, message texts oldest first) for each thread left in the run."""
+    filters = ["t.tenant_id = %s"]
+    params = [run["tenant_id"]]
+    if run["assistant_id"]:
+        filters.append("t.assistant_id = %s")
+        params.append(run["assistant_id"])
+    if not run["relabel"]:
+        filters.append("t.classification IS NULL")
+    if run["checkpoint_thread_id"]:
+        filters.append("m.thread_id > %s")
+        params.append(run["checkpoint_thread_id"])
+
+    # A named cursor is server-side: rows arrive itersize at a time instead
+    # of the whole result set at once.
+    cursor = conn.cursor(name=f"classification_scan_{run['id'].replace('-', '')}")
+    cursor.itersize = CLASSIFICATION_SCAN_ITERSIZE
+    cursor.execute(
+        f"""
+        SELECT w.thread_id, w.message_text
+        FROM (
+            SELECT m.thread_id, m.message_text, m.created_at,
+                   row_number() OVER (PARTITION BY m.thread_id ORDER BY m.created_at DESC) AS position
+            FROM messages m
+            JOIN threads t ON t.id = m.thread_id
+            WHERE {' AND '.join(filters)}
+        ) w
+        WHERE w.position <= %s
+        ORDER BY w.thread_id, w.created_at
+        """,
+        (*params, window)
+    )
+    try:
+        for thread_id, rows in groupby(cursor, key=lambda row: row[0]):
+            yield thread_id, [row[1] for row in rows]
+    finally:
+        cursor.close()
+
+def make_classifier(handle):
+    chain = prompt | handle.client | StrOutputParser()
+
+    def classify(message_texts):
+        payload = {"input": classification_input(exchanges(message_texts))}
+        # Runs share the model's batch capacity, however many are in progress.
+        with handle.batch_slots:
+            return parse_label(chain.invoke(payload))
+
+    return classify
+
+def classify_threads(threads, classify, concurrency: int = CLASSIFICATION_BATCH_CONCURRENCY):
+    """Runs ``classify`` over threads with at most ``concurrency`` LLM calls at once.
+
+    Yields (thread id, label, error) in input order, which keeps the
+    checkpoint a simple "everything up to here is done".
+    """
+    pending = deque()
+
+    def result(thread_id, future):
+        try:
+            return thread_id, future.result(), None
+        except Exception as e:
+            return thread_id, None, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="classification") as pool:
+        try:
+            for thread_id, message_texts in threads:
+                pending.append((thread_id, pool.submit(classify, message_texts)))
+                if len(pending) >= 2 * concurrency:
+                    yield result(*pending.popleft())
+            while pending:
+                yield result(*pending.popleft())
+        finally:
+            for _thread_id, future in pending:
+                future.cancel()
+
+def _run(run, concurrency: int = CLASSIFICATION_BATCH_CONCURRENCY):
+    run_id = run["id"]
+    classify = make_classifier(models.chat_model(model=CLASSIFICATION_MODEL))
+    started = time.perf_counter()
+    total = 0
+    labels, done, failed, checkpoint = [], 0, 0, None
+    try:
+        with Heartbeat("classification_runs", run_id, CLASSIFICATION_HEARTBEAT_INTERVAL), db_connection() as scan_conn:
+            for thread_id, label, error in classify_threads(scan_threads(scan_conn, run), classify, concurrency):
+                checkpoint = thread_id
+                done += 1
+                total += 1
+                if error is not None:
+                    failed += 1
+                    print(f"⚠️ Classifying thread {thread_id} failed: {error}")
+                elif label is not None:
+                    labels.append((thread_id, label))
+                if done >= CLASSIFICATION_BATCH_WRITE_SIZE:
+                    _write_labels(run_id, labels, checkpoint, done, failed)
+                    labels, done, failed = [], 0, 0
+            if done:
+                _write_labels(run_id, labels, checkpoint, done, failed)
+        _finish_run(run_id, "succeeded")
+    except Exception as e:
+        traceback.print_exc()
+        _finish_run(run_id, "failed", f"{type(e).__name__}: {e}")
+        return None
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed * 60 if elapsed else 0.0
+    print(f"✅ Classification run {run_id}: {total} threads in {elapsed:.1f}s ({rate:.1f} threads/min)")
+    return {"threads": total, "seconds": elapsed, "threads_per_minute": rate}
+
+def run_classification(run_id: str, concurrency: int = CLASSIFICATION_BATCH_CONCURRENCY):
+    run = claim_classification_run(run_id)
+    if run is None:
+        print(f"Classification run {run_id} cannot be started (unknown, finished or still running)")
+        return None
+    return _run(run, concurrency)
+
+def start_classification_run(run_id: str):
+    """Claims the run and works it in a background thread; False if it cannot be claimed."""
+    run = claim_classification_run(run_id)
+    if run is None:
+        return False
+    threading.Thread(target=_run, args=(run,), name=f"classification-{run_id[:8]}", daemon=True).start()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenant")
+    parser.add_argument("--assistant")
+    parser.add_argument("--relabel", action="store_true", help="also reclassify threads that already have a label")
+    parser.add_argument("--resume", metavar="RUN_ID")
+    parser.add_argument("--concurrency", type=int, default=CLASSIFICATION_BATCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.resume:
+        run_id = args.resume
+    elif args.tenant:
+        with db_connection() as conn:
+            run_id = create_classification_run(conn, args.tenant, args.assistant, args.relabel)
+            conn.commit()
+        print(f"Created classification run {run_id}; resume it with --resume {run_id}")
+    else:
+        parser.error("--tenant or --resume is required")
+    run_classification(run_id, args.concurrency)
@@ -0,0 +1,43 @@
+import threading
+from server.database.db import db_connection
+
+class Heartbeat:
+    """Touches a running job's heartbeat_at every ``interval`` seconds while open.
+
+    Stale-job recovery requeues jobs whose heartbeat stopped, so the beat has
+    to run on its own timer: a job can spend far longer than the stale limit
+    between two progress updates (one large PDF, a slow LLM call).
+    """
+    def __init__(self, table: str, job_id: str, interval: float):
+        self.table = table
+        self.job_id = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _beat(self):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE {self.table} SET heartbeat_at = NOW() WHERE id = %s AND status = 'running'",
+                (self.job_id,)
+            )
+            conn.commit()
+            cursor.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self._beat()
+            except Exception as e:
+                print(f"Error sending heartbeat for {self.table} {self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.job_id[:8]}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        return False
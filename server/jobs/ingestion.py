@@ -0,0 +1,234 @@
+import os
+import threading
+import traceback
+import uuid
+from psycopg.types.json import Jsonb
+from server.database.db import db_connection
+from server.jobs.heartbeat import Heartbeat
+from server.utils.vector_db import run_update_database_multi, run_update_database_webbase
+from server.utils.models import models
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_TENANT_CONCURRENCY = int(os.getenv("INGESTION_TENANT_CONCURRENCY", "1"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", "2"))
+INGESTION_RETRY_BACKOFF = float(os.getenv("INGESTION_RETRY_BACKOFF", "30"))
+INGESTION_STALE_AFTER = float(os.getenv("INGESTION_STALE_AFTER", "600"))
+# Well under INGESTION_STALE_AFTER, so a live job is never taken for a dead one.
+INGESTION_HEARTBEAT_INTERVAL = float(os.getenv("INGESTION_HEARTBEAT_INTERVAL", "30"))
+# Serialises job claims so the per-tenant running count cannot be raced.
+CLAIM_LOCK_ID = 7130416
+
+JOB_COLUMNS = (
+    "id", "tenant_id", "assistant_id", "kind", "status", "attempts", "max_attempts",
+    "pages_parsed", "chunks_total", "chunks_embedded", "error",
+    "created_at", "started_at", "finished_at",
+)
+
+def enqueue_ingestion_job(conn, tenant_id: str, assistant_id: str, kind: str, payload: dict):
+    job_id = str(uuid.uuid4())
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO ingestion_jobs (id, tenant_id, assistant_id, kind, payload, max_attempts)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        (job_id, tenant_id, assistant_id, kind, Jsonb(payload), INGESTION_MAX_ATTEMPTS)
+    )
+    cursor.close()
+    return job_id
+
+def get_ingestion_job(conn, tenant_id: str, assistant_id: str, job_id: str):
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM ingestion_jobs WHERE id = %s AND tenant_id = %s AND assistant_id = %s",
+        (job_id, tenant_id, assistant_id)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return None
+    return dict(zip(JOB_COLUMNS, row))
+
+def requeue_stale_jobs():
+    # Jobs left 'running' by a worker that died (or a server restart) stop
+    # heartbeating; put them back in the queue. Live jobs heartbeat every
+    # INGESTION_HEARTBEAT_INTERVAL whether or not they make progress.
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'queued', run_after = NOW()
+            WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)
+            """,
+            (INGESTION_STALE_AFTER,)
+        )
+        requeued = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    if requeued:
+        print(f"Requeued {requeued} stale ingestion jobs")
+    return requeued
+
+def claim_ingestion_job():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (CLAIM_LOCK_ID,))
+        cursor.execute(
+            """
+            UPDATE ingestion_jobs
+            SET status = 'running', attempts = attempts + 1, started_at = NOW(), heartbeat_at = NOW(), error = NULL
+            WHERE id = (
+                SELECT j.id FROM ingestion_jobs j
+                WHERE j.status = 'queued' AND j.run_after <= NOW()
+                  AND (
+                      SELECT COUNT(*) FROM ingestion_jobs r
+                      WHERE r.tenant_id = j.tenant_id AND r.status = 'running'
+                  ) < %s
+                ORDER BY j.run_after, j.created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, tenant_id, assistant_id, kind, payload, attempts, max_attempts
+            """,
+            (INGESTION_TENANT_CONCURRENCY,)
+        )
+        row = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    if row is None:
+        return None
+    return dict(zip(("id", "tenant_id", "assistant_id", "kind", "payload", "attempts", "max_attempts"), row))
+
+def _finish_job(job_id: str):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE ingestion_jobs SET status = 'succeeded', finished_at = NOW(), heartbeat_at = NOW() WHERE id = %s",
+            (job_id,)
+        )
+        conn.commit()
+        cursor.close()
+
+def _fail_job(job, error: str):
+    retry = job["attempts"] < job["max_attempts"]
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        if retry:
+            cursor.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'queued', error = %s, heartbeat_at = NOW(),
+                    pages_parsed = 0, chunks_total = 0, chunks_embedded = 0,
+                    run_after = NOW() + make_interval(secs => %s)
+                WHERE id = %s
+                """,
+                (error, INGESTION_RETRY_BACKOFF * job["attempts"], job["id"])
+            )
+        else:
+            cursor.execute(
+                "UPDATE ingestion_jobs SET status = 'failed', error = %s, finished_at = NOW(), heartbeat_at = NOW() WHERE id = %s",
+                (error, job["id"])
+            )
+        conn.commit()
+        cursor.close()
+
+class JobProgress:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    def _update(self, assignment: str, value: int):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE ingestion_jobs SET {assignment}, heartbeat_at = NOW() WHERE id = %s",
+                (value, self.job_id)
+            )
+            conn.commit()
+            cursor.close()
+
+    def add_pages(self, count: int):
+        self._update("pages_parsed = pages_parsed + %s", count)
+
+    def add_chunks_total(self, count: int):
+        self._update("chunks_total = chunks_total + %s", count)
+
+    def add_chunks_embedded(self, count: int):
+        self._update("chunks_embedded = chunks_embedded + %s", count)
+
+def _assistant_embeddings(assistant_id: str):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT embedding_provider, embedding_model FROM assistants WHERE id = %s", (assistant_id,))
+        row = cursor.fetchone()
+        cursor.close()
+    provider, model = row if row is not None else (None, None)
+    return models.embedding_model(provider, model)
+
+def run_ingestion_job(job):
+    payload = job["payload"]
+    progress = JobProgress(job["id"])
+    embeddings = models.embedding_for_store(payload["vector_db_location"], _assistant_embeddings(job["assistant_id"]))
+    if job["kind"] == "files":
+        run_update_database_multi(payload["file_locations"], job["assistant_id"], payload["vector_db_location"], progress=progress, embedding_function=embeddings)
+    elif job["kind"] == "webbase":
+        run_update_database_webbase(payload["url"], job["assistant_id"], payload["vector_db_location"], progress=progress, embedding_function=embeddings)
+    else:
+        raise ValueError(f"Unknown ingestion job kind: {job['kind']}")
+
+class IngestionWorkerPool:
+    def __init__(self, workers: int = INGESTION_WORKERS, poll_interval: float = INGESTION_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        requeue_stale_jobs()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingestion-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = claim_ingestion_job()
+            except Exception as e:
+                print(f"Error claiming ingestion job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                try:
+                    requeue_stale_jobs()
+                except Exception as e:
+                    print(f"Error requeueing stale ingestion jobs: {e}")
+                continue
+
+            print(f"Running ingestion job {job['id']} (attempt {job['attempts']}/{job['max_attempts']})")
+            try:
+                with Heartbeat("ingestion_jobs", job["id"], INGESTION_HEARTBEAT_INTERVAL):
+                    run_ingestion_job(job)
+                _finish_job(job["id"])
+            except Exception as e:
+                traceback.print_exc()
+                _fail_job(job, f"{type(e).__name__}: {e}")
+
+ingestion_workers = IngestionWorkerPool()
@@ -1,30 +1,75 @@
 import jwt
 import os
+import time
+import hashlib
 from fastapi import Header, HTTPException
-from server.database.db import get_db_connection
+from server.database.db import async_db_connection
+from server.utils.ttl_cache import TTLCache
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "3600"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TENANT_CACHE_TTL = float(os.getenv("TENANT_CACHE_TTL", "30"))
+TENANT_NEGATIVE_CACHE_TTL = float(os.getenv("TENANT_NEGATIVE_CACHE_TTL", "5"))
+TENANT_CACHE_MAX_ENTRIES = int(os.getenv("TENANT_CACHE_MAX_ENTRIES", "10000"))
+
+# sha256(token) -> tenant_id, kept until the token's own expiry at the latest.
+verified_tokens = TTLCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL)
+# tenant_id -> whether the tenant exists; misses are cached briefly too so a
+# flood of requests for a deleted tenant does not reach the database.
+known_tenants = TTLCache(TENANT_CACHE_MAX_ENTRIES, TENANT_CACHE_TTL)
+
 def create_token(tenant_id: str):
     payload = {
         "tenant_id": tenant_id
     }
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
 
-def verify_token(token: str):
+def decode_token(token: str):
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    tenant_id = verified_tokens.get(key)
+    if tenant_id is not None:
+        return tenant_id
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
         tenant_id = payload["tenant_id"]
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tenants WHERE id = %s", (tenant_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=403, detail="Unauthorized")
-        
-        return tenant_id
-
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    ttl = TOKEN_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        verified_tokens.put(key, tenant_id, ttl)
+    return tenant_id
+
+def _remember_tenant(tenant_id: str, exists: bool):
+    known_tenants.put(tenant_id, exists, TENANT_CACHE_TTL if exists else TENANT_NEGATIVE_CACHE_TTL)
+
+def invalidate_tenant(tenant_id: str):
+    known_tenants.pop(tenant_id)
+
+async def get_tenant_id(authorization: str = Header(None)):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization scheme")
+
+    tenant_id = decode_token(authorization.split(" ")[1])
+
+    exists = known_tenants.get(tenant_id)
+    if exists is None:
+        async with async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT 1 FROM tenants WHERE id = %s", (tenant_id,))
+                exists = await cursor.fetchone() is not None
+        _remember_tenant(tenant_id, exists)
+    if not exists:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    return tenant_id
+
+def auth_cache_stats():
+    return {"tokens": verified_tokens.stats(), "tenants": known_tenants.stats()}
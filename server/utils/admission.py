@@ -0,0 +1,168 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+
+class Saturated(Exception):
+    """Raised when a call cannot be admitted; mapped to 429/503 with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, tenant-fair wait queue.
+
+    At most ``capacity`` calls run at once. Further callers wait in a queue
+    per tenant and freed slots are handed to tenants round-robin, so one
+    tenant flooding a model only delays its own requests. A full queue is
+    rejected with 429 and a wait longer than ``timeout`` with 503.
+
+    ``run`` additionally coalesces identical in-flight calls: callers with the
+    same key share the first caller's result instead of queueing again.
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: int = ADMISSION_MAX_QUEUE, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._active = 0
+        self._queued = 0
+        self._queues = OrderedDict()
+        self._inflight = {}
+        self._service_time = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.coalesced = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _retry_after(self) -> int:
+        backlog = (self._queued + 1) / self.capacity
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _grant_next(self):
+        while self._queues:
+            tenant_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(tenant_id)
+            else:
+                del self._queues[tenant_id]
+            if not waiter.done():
+                # The slot passes straight to the waiter; _active is unchanged.
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _forget(self, tenant_id, waiter):
+        queue = self._queues.get(tenant_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not queue:
+            del self._queues[tenant_id]
+
+    def check(self):
+        """Fail fast with 429 if a new caller would be rejected right now."""
+        if self._active >= self.capacity and self._queued >= self.max_queue:
+            self.rejected += 1
+            raise Saturated(429, f"{self.name} is saturated, try again later", self._retry_after())
+
+    async def _acquire(self, tenant_id):
+        if self._active < self.capacity and not self._queued:
+            self._active += 1
+            return 0.0
+
+        self.check()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant_id, deque()).append(waiter)
+        self._queued += 1
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up: hand the slot on.
+                self._grant_next()
+            else:
+                self._forget(tenant_id, waiter)
+            if isinstance(e, TimeoutError):
+                self.timed_out += 1
+                raise Saturated(503, f"Timed out waiting for {self.name}", self._retry_after()) from None
+            raise
+        return time.monotonic() - started
+
+    @asynccontextmanager
+    async def slot(self, tenant_id=None):
+        waited = await self._acquire(tenant_id)
+        self.admitted += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # Exponentially weighted service time, used for Retry-After.
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self._grant_next()
+
+    async def _call(self, tenant_id, call):
+        async with self.slot(tenant_id):
+            return await call()
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieve the exception so an unobserved failure is not logged.
+            task.exception()
+
+    async def run(self, tenant_id, key, call):
+        if key is None:
+            return await self._call(tenant_id, call)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # The shared call runs as its own task so that the first caller
+            # disconnecting does not cancel it for everyone else.
+            task = asyncio.ensure_future(self._call(tenant_id, call))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "active": self._active,
+            "queue_depth": self._queued,
+            "max_queue": self.max_queue,
+            "queued_tenants": {str(tenant_id): len(queue) for tenant_id, queue in self._queues.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "coalesced": self.coalesced,
+            "avg_wait_seconds": round(self.wait_seconds / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 4),
+        }
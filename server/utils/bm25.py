@@ -0,0 +1,195 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+import numpy as np
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_DIRECTORY = "bm25"
+POSTINGS_FILE = "postings.jsonl"
+
+_token = re.compile(r"\w+(?:[-./]\w+)*")
+_separator = re.compile(r"[-./]")
+
+
+def tokenize(text: str):
+    """Lower-cased word tokens that keep SKUs, phone numbers and versions whole.
+
+    "0812-3451-1449" yields the token itself, its parts and "081234511449",
+    so a query matches however the number is written.
+    """
+    tokens = []
+    for match in _token.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = _separator.split(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+            tokens.append("".join(parts))
+    return tokens
+
+
+def lexical_path(vector_db_location: str) -> str:
+    return os.path.join(vector_db_location, BM25_DIRECTORY)
+
+
+class BM25Index:
+    """Incremental BM25 inverted index kept next to a vector store.
+
+    Additions and deletions are appended to ``postings.jsonl`` as they happen
+    and replayed on open. Postings are per-term lists of (row, tf); a
+    replaced or deleted chunk only has its row marked dead. Scoring gathers
+    the postings of the query terms as NumPy arrays and accumulates them with
+    ``bincount``, so a query costs a few array operations per term.
+    """
+
+    def __init__(self, directory: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.row_of = {}
+        self._lengths = []
+        self._alive = bytearray()
+        self._postings = {}
+        self._arrays = {}
+        self._length_array = None
+        # Rows can belong to a group (an assistant in a shared collection).
+        self._group_codes = {}
+        self._row_groups = array("i")
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, POSTINGS_FILE)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _load(self):
+        if not self.exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                self._apply(json.loads(line))
+
+    def _apply(self, record: dict):
+        row = self.row_of.pop(record["id"], None)
+        if row is not None:
+            self._alive[row] = 0
+        if record["op"] != "put":
+            return
+
+        row = len(self.ids)
+        self.ids.append(record["id"])
+        self.row_of[record["id"]] = row
+        self._lengths.append(record["length"])
+        self._length_array = None
+        self._alive.append(1)
+        self._row_groups.append(self._group_code(record.get("group")))
+        for term, tf in record["terms"].items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = ([], [])
+            postings[0].append(row)
+            postings[1].append(tf)
+            self._arrays.pop(term, None)
+
+    def _group_code(self, group):
+        if group is None:
+            return -1
+        code = self._group_codes.get(group)
+        if code is None:
+            code = self._group_codes[group] = len(self._group_codes)
+        return code
+
+    def _append(self, records):
+        if not records:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        for record in records:
+            self._apply(record)
+
+    def add(self, ids, texts, group: str = None):
+        records = []
+        for chunk_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            terms = {}
+            for token in tokens:
+                terms[token] = terms.get(token, 0) + 1
+            record = {"op": "put", "id": chunk_id, "length": len(tokens), "terms": terms}
+            if group is not None:
+                record["group"] = group
+            records.append(record)
+        with self._lock:
+            self._append(records)
+
+    def delete(self, ids):
+        with self._lock:
+            self._append([{"op": "del", "id": chunk_id} for chunk_id in ids if chunk_id in self.row_of])
+
+    def delete_group(self, group: str):
+        with self._lock:
+            code = self._group_codes.get(group)
+            if code is None:
+                return
+            rows = np.flatnonzero((np.frombuffer(self._row_groups.tobytes(), dtype=np.int32) == code) & np.frombuffer(bytes(self._alive), dtype=bool))
+            self._append([{"op": "del", "id": self.ids[row]} for row in rows])
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def _term_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            rows, tfs = self._postings[term]
+            arrays = self._arrays[term] = (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+        return arrays
+
+    def search(self, query_text: str, k: int = 20, group: str = None):
+        """Top ``k`` (chunk id, score) pairs for the query, within ``group`` if given."""
+        with self._lock:
+            terms = [term for term in set(tokenize(query_text)) if term in self._postings]
+            if not terms or not self.row_of or (group is not None and group not in self._group_codes):
+                return []
+            alive = np.frombuffer(bytes(self._alive), dtype=bool)
+            if group is not None:
+                # Document frequencies and lengths are then per group too, as
+                # if the group had its own index.
+                alive = alive & (np.frombuffer(self._row_groups.tobytes(), dtype=np.int32) == self._group_codes[group])
+            if self._length_array is None:
+                self._length_array = np.asarray(self._lengths, dtype=np.float32)
+            lengths = self._length_array
+            arrays = [self._term_arrays(term) for term in terms]
+            ids = self.ids
+
+        count = int(alive.sum())
+        if not count:
+            return []
+        average_length = float(lengths[alive].mean()) or 1.0
+        norms = self.k1 * (1.0 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(len(alive), dtype=np.float32)
+        for rows, tfs in arrays:
+            live = alive[rows]
+            rows, tfs = rows[live], tfs[live]
+            if not len(rows):
+                continue
+            df = len(rows)
+            idf = math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+            scores += np.bincount(rows, weights=idf * tfs * (self.k1 + 1.0) / (tfs + norms[rows]), minlength=len(alive)).astype(np.float32)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[row], float(scores[row])) for row in top]
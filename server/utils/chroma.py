@@ -1,15 +1,16 @@
 import argparse
 import os
 import shutil
-from langchain.document_loaders.pdf import PyPDFDirectoryLoader
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
-from server.utils.embedding import get_embedding_function
-from langchain.vectorstores.chroma import Chroma
+from server.utils.store_cache import vector_stores, get_vector_store
+from server.vectorstores.factory import embedding_info, record_store_embedding
+from server.utils.embedding import get_embedding_function, text_hash
+from server.utils.pdf_loader import ParallelPDFLoader, pdf_files
 from fastapi import HTTPException
 from typing import List
-from server.database.db import get_db_connection
+from server.database.db import db_connection
 
 CHROMA_PATH = "chroma"
 DATA_PATH = "data"
@@ -28,8 +29,10 @@ def main():
 
 
 def load_documents(file_location: str):
-    document_loader = PyPDFDirectoryLoader(file_location)
-    return document_loader.load()
+    return ParallelPDFLoader(pdf_files(file_location)).load()
+
+def load_file(file_location: str):
+    return ParallelPDFLoader(file_location).load()
 
 def load_documents_webbase(url: str):
     docs = WebBaseLoader(url)
@@ -66,66 +69,106 @@ def calculate_chunk_ids(chunks):
 
     return chunks
 
-def add_to_chroma(chunks: List[Document], vector_db_location: str):
+ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "256"))
+
+def changed_chunks(db, chunks):
+    """Chunks whose id is new or whose content differs from what is stored.
+
+    Only the candidate ids are looked up, so the cost does not grow with the
+    size of the collection. The content hash is kept in chunk metadata.
+    """
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = text_hash(chunk.page_content)
+    stored_hashes = db.get_hashes([chunk.metadata["id"] for chunk in chunks])
+    return [chunk for chunk in chunks if stored_hashes.get(chunk.metadata["id"], "") != chunk.metadata["content_hash"]]
+
+def upsert_chunks(db, chunks, vectors):
+    ids = [chunk.metadata["id"] for chunk in chunks]
+    texts = [chunk.page_content for chunk in chunks]
+    db.upsert(ids, vectors, texts, [chunk.metadata for chunk in chunks])
+    db.lexical.add(ids, texts)
+
+def add_to_chroma(chunks: List[Document], vector_db_location: str, progress=None, embedding_function=None, assistant_id: str = None):
     try:
-        db = Chroma(
-            persist_directory=vector_db_location, embedding_function=get_embedding_function()
-        )
+        embedding_function = embedding_function or get_embedding_function()
+        db = get_vector_store(vector_db_location, embedding_function, assistant_id)
         print(vector_db_location)
         chunks_with_ids = calculate_chunk_ids(chunks)
 
-        existing_items = db.get(include=[])
-        existing_ids = set(existing_items["ids"])
-        print(f"Number of existing documents in DB: {len(existing_ids)}")
-
-        new_chunks = []
-        for chunk in chunks_with_ids:
-            chunk_id = chunk.metadata.get("id")
-            if chunk_id not in existing_ids:
-                new_chunks.append(chunk)
-            else:
-                print(f"Chunk with ID {chunk_id} already exists in the database.")
-
-        if new_chunks:
-            print(f"👉 Adding new documents: {len(new_chunks)}")
-            new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
+        added = 0
+        with vector_stores.write_lock(vector_db_location):
+            record_store_embedding(vector_db_location, embedding_info(embedding_function))
             try:
-                db.add_documents(new_chunks, ids=new_chunk_ids)
-            except Exception as e:
-                print(f"Warning: Error while adding documents: {e}")
-            db.persist()
-            print("✅ New documents added and database persisted.")
+                for start in range(0, len(chunks_with_ids), ADD_BATCH_SIZE):
+                    batch = changed_chunks(db, chunks_with_ids[start:start + ADD_BATCH_SIZE])
+                    if progress is not None:
+                        progress.add_chunks_total(len(batch))
+                    if not batch:
+                        continue
+                    upsert_chunks(db, batch, embedding_function.embed_documents([chunk.page_content for chunk in batch]))
+                    added += len(batch)
+                    if progress is not None:
+                        progress.add_chunks_embedded(len(batch))
+            finally:
+                if added:
+                    db.persist()
+                    vector_stores.mark_updated(vector_db_location, assistant_id)
+
+        if added:
+            print(f"✅ {added} new or changed chunks added and database persisted.")
         else:
             print("✅ No new documents to add")
 
+        return [chunk.metadata["id"] for chunk in chunks_with_ids]
+
     except Exception as e:
         print(f"Error in add_to_chroma: {e}")
+        raise
+
+def delete_from_chroma(chunk_ids, vector_db_location: str, assistant_id: str = None):
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return
+    db = get_vector_store(vector_db_location, assistant_id=assistant_id)
+    with vector_stores.write_lock(vector_db_location):
+        db.delete(ids=chunk_ids)
+        db.lexical.delete(chunk_ids)
+        db.persist()
+        vector_stores.mark_updated(vector_db_location, assistant_id)
+    print(f"🗑️ Removed {len(chunk_ids)} stale chunks")
+
+def delete_assistant_chunks(vector_db_location: str, assistant_id: str):
+    # Shared collections only: drops one assistant's chunks by metadata filter.
+    db = get_vector_store(vector_db_location, assistant_id=assistant_id)
+    with vector_stores.write_lock(vector_db_location):
+        db.delete_all()
+        db.persist()
+        vector_stores.mark_updated(vector_db_location, assistant_id)
         
 def clear_database(vector_db_id: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("SELECT vector_db_location FROM files WHERE vector_db_id = %s", (vector_db_id,))
-    result = cursor.fetchone()
+        cursor.execute("SELECT vector_db_location FROM files WHERE vector_db_id = %s", (vector_db_id,))
+        result = cursor.fetchone()
 
-    if result is None:
-        cursor.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Vector DB location not found")
+        if result is None:
+            cursor.close()
+            raise HTTPException(status_code=404, detail="Vector DB location not found")
 
-    vector_db_location = result[0]
-    folder_path = os.path.dirname(vector_db_location)
+        vector_db_location = result[0]
+        folder_path = os.path.dirname(vector_db_location)
 
-    if os.path.isdir(folder_path):
-        shutil.rmtree(folder_path)
-    else:
-        os.remove(folder_path)
+        vector_stores.invalidate(vector_db_location)
+        if os.path.isdir(folder_path):
+            shutil.rmtree(folder_path)
+        else:
+            os.remove(folder_path)
 
-    cursor.execute("DELETE FROM files WHERE vector_db_id = %s", (vector_db_id,))
-    conn.commit()
+        cursor.execute("DELETE FROM files WHERE vector_db_id = %s", (vector_db_id,))
+        conn.commit()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import json
+import os
+import re
+
+CLASSIFICATION_MODEL = 'llama3:8b-maxchat'
+CLASSIFICATION_LABELS = ("L1-Qualified", "S_JUNK", "Qualified", "L1-Junk")
+# A thread is classified each time its exchange count reaches a multiple of
+# this, on its last CLASSIFICATION_WINDOW exchanges.
+CLASSIFICATION_THRESHOLD = int(os.getenv("CLASSIFICATION_THRESHOLD", "10"))
+CLASSIFICATION_WINDOW = int(os.getenv("CLASSIFICATION_WINDOW", "6"))
+
+# Longest labels first so "L1-Qualified" is not read as "Qualified".
+_label = re.compile(r"(?<![\w-])(" + "|".join(sorted(map(re.escape, CLASSIFICATION_LABELS), key=len, reverse=True)) + r")(?![\w-])")
+_label_line = re.compile(r"label\s*:?\s*\[?\s*(.*)", re.IGNORECASE)
+
+
+def parse_label(response: str):
+    """The label a classification answer settled on, or None.
+
+    The prompt lists every label on its "Label:" line, so a label on the
+    last "Label:" line that names exactly one wins; otherwise the last label
+    mentioned anywhere.
+    """
+    for line in reversed(response.splitlines()):
+        match = _label_line.search(line)
+        if match:
+            labels = _label.findall(match.group(1))
+            if len(labels) == 1:
+                return labels[0]
+    labels = _label.findall(response)
+    return labels[-1] if labels else None
+
+
+def is_due(message_count: int, classified_at_count, threshold: int = CLASSIFICATION_THRESHOLD) -> bool:
+    """Whether a thread with ``message_count`` exchanges crossed a new threshold."""
+    if message_count < threshold:
+        return False
+    return classified_at_count is None or message_count // threshold > classified_at_count // threshold
+
+
+def classification_input(messages) -> str:
+    # One "key: value" line per field of each role/content message.
+    return "\n".join([f'{key}: {value}' for message in messages for key, value in message.items()])
+
+
+def exchanges(message_texts):
+    """Role/content pairs from stored ``message_text`` values, oldest first."""
+    parts = []
+    for message_text in message_texts:
+        try:
+            turn = json.loads(message_text) if isinstance(message_text, str) else message_text
+        except ValueError:
+            turn = None
+        if not isinstance(turn, list):
+            parts.append({"role": "user", "content": str(message_text)})
+            continue
+        for part in turn:
+            content = part.get("content", "")
+            parts.append({"role": part.get("role", "user"), "content": content if isinstance(content, str) else json.dumps(content)})
+    return parts
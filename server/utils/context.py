@@ -0,0 +1,171 @@
+import json
+import os
+from server.utils.bm25 import tokenize
+from server.utils.tokens import count_tokens, truncate_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "500"))
+# Retrieved chunks the builder chooses from, and how many it keeps at most.
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "10"))
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "5"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Chunks at least this similar to one already chosen are dropped outright.
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.9"))
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+# The splitter overlaps neighbouring chunks by up to 80 characters.
+MAX_OVERLAP = 200
+MIN_OVERLAP = 10
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr(results, k: int, lambda_: float = MMR_LAMBDA, duplicate_threshold: float = DUPLICATE_THRESHOLD):
+    """Picks up to ``k`` (document, score) results by maximal marginal relevance.
+
+    Relevance is the retrieval score scaled to [0, 1] within the result set,
+    so it works the same for cosine, RRF and reranker scores. Redundancy is
+    the token-set Jaccard similarity to the closest chunk already picked.
+    """
+    if not results:
+        return []
+    scores = [float(score) for _doc, score in results]
+    low, high = min(scores), max(scores)
+    relevance = [(score - low) / (high - low) if high > low else 1.0 for score in scores]
+    terms = [set(tokenize(doc.page_content)) for doc, _score in results]
+
+    selected = []
+    remaining = list(range(len(results)))
+    while remaining and len(selected) < k:
+        best, best_value, duplicates = None, None, []
+        for i in remaining:
+            redundancy = max((_similarity(terms[i], terms[j]) for j in selected), default=0.0)
+            if redundancy >= duplicate_threshold:
+                duplicates.append(i)
+                continue
+            value = lambda_ * relevance[i] - (1.0 - lambda_) * redundancy
+            if best_value is None or value > best_value:
+                best, best_value = i, value
+        remaining = [i for i in remaining if i != best and i not in duplicates]
+        if best is not None:
+            selected.append(best)
+    return [results[i] for i in selected]
+
+
+def parse_chunk_id(chunk_id):
+    """("source:page", index) for ids from ``calculate_chunk_ids``, else None."""
+    if not chunk_id:
+        return None
+    parts = chunk_id.rsplit(":", 2)
+    if len(parts) != 3 or not parts[2].isdigit():
+        return None
+    return f"{parts[0]}:{parts[1]}", int(parts[2])
+
+
+def _join(first: str, second: str) -> str:
+    # Drop the text the splitter repeated at the start of the next chunk.
+    for size in range(min(len(first), len(second), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def merge_adjacent(results):
+    """Merges chunks that follow each other on the same page into one block.
+
+    Returns (text, chunk ids, score) blocks, placed where their best-ranked
+    chunk was.
+    """
+    groups = {}
+    order = []
+    for position, (doc, score) in enumerate(results):
+        parsed = parse_chunk_id(doc.metadata.get("id"))
+        key, index = parsed if parsed else ((None, position), 0)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append((index, position, doc, score))
+
+    blocks = []
+    for key in order:
+        members = sorted(groups[key], key=lambda member: member[0])
+        run = [members[0]]
+        for member in members[1:]:
+            if member[0] == run[-1][0] + 1:
+                run.append(member)
+            else:
+                blocks.append(run)
+                run = [member]
+        blocks.append(run)
+
+    merged = []
+    for run in sorted(blocks, key=lambda run: min(member[1] for member in run)):
+        text = run[0][2].page_content
+        for member in run[1:]:
+            text = _join(text, member[2].page_content)
+        merged.append((text, [member[2].metadata.get("id") for member in run], max(float(member[3]) for member in run)))
+    return merged
+
+
+class BuiltContext:
+    def __init__(self, text: str, results, tokens: int):
+        self.text = text
+        self.results = results
+        self.tokens = tokens
+
+
+def build_context(results, budget: int = CONTEXT_TOKEN_BUDGET, max_chunks: int = CONTEXT_MAX_CHUNKS):
+    """MMR-selects chunks that fit in ``budget`` tokens and merges neighbours.
+
+    ``results`` are the kept (document, score) pairs, in prompt order.
+    """
+    kept = []
+    used = 0
+    for doc, score in mmr(results, max_chunks):
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= budget:
+            kept.append((doc, score))
+            used += tokens
+
+    if not kept and results:
+        # Not even the best chunk fits: send as much of it as the budget allows.
+        doc, score = results[0]
+        text = truncate_tokens(doc.page_content, budget)
+        return BuiltContext(text, [(doc, score)], count_tokens(text))
+
+    blocks = merge_adjacent(kept)
+    text = CONTEXT_SEPARATOR.join(block_text for block_text, _ids, _score in blocks)
+    return BuiltContext(text, kept, count_tokens(text))
+
+
+def _turn_lines(message_text):
+    # message_text holds [{"role": ..., "content": ...}, ...] for one exchange.
+    try:
+        turn = json.loads(message_text) if isinstance(message_text, str) else message_text
+    except ValueError:
+        return message_text
+    if not isinstance(turn, list):
+        return str(message_text)
+    return "\n".join(f"{'User' if part.get('role') == 'user' else 'Assistant'}: {part.get('content', '')}" for part in turn)
+
+
+def build_history(messages, budget: int = HISTORY_TOKEN_BUDGET):
+    """Newest exchanges that fit in ``budget`` tokens, oldest first.
+
+    ``messages`` are ``message_text`` values ordered newest first.
+    Returns (text, tokens).
+    """
+    lines = []
+    used = 0
+    for message_text in messages:
+        text = _turn_lines(message_text)
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            break
+        lines.append(text)
+        used += tokens
+    lines.reverse()
+    return "\n".join(lines), used
@@ -1,6 +1,206 @@
-from langchain_community.embeddings import OllamaEmbeddings
-import os
+from langchain_core.embeddings import Embeddings
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import hashlib, math, os, sqlite3, threading, time
+import requests
 
-def get_embedding_function():
-    embeddings = OllamaEmbeddings(model="all-minilm:l6-v2", base_url=os.getenv('OLLAMA_BASE_URL'))
-    return embeddings
+EMBEDDING_MODEL = "all-minilm:l6-v2"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF", "0.5"))
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "120"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("data", "embedding_cache.sqlite3"))
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def unit(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+def _endpoint_missing(response) -> bool:
+    # Ollama without /api/embed answers with a plain-text "404 page not
+    # found"; a 404 from the endpoint itself (e.g. an unknown model) is JSON.
+    if response.status_code != 404:
+        return False
+    try:
+        response.json()
+    except ValueError:
+        return True
+    return False
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model, sha256(text)).
+
+    Shared by every assistant and tenant on the node, so identical chunks are
+    only ever embedded once per model.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, items):
+        rows = [(model, key, array("f", vector).tobytes()) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+class EmbeddingEngine(Embeddings):
+    """Batched Ollama embeddings with bounded concurrency, retries and a cache.
+
+    Vectors are unit length. With ``normalize=False`` they are the raw
+    output of /api/embeddings instead, as stores written before /api/embed
+    was used hold; queries against those must match them under L2 distance.
+    """
+
+    provider = "ollama"
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        base_url: str = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        retry_backoff: float = EMBEDDING_RETRY_BACKOFF,
+        cache: EmbeddingCache = None,
+        normalize: bool = True,
+    ):
+        self.model = model
+        self.normalize = normalize
+        # Raw and unit vectors of one model are cached apart.
+        self.cache_model = model if normalize else f"{model}#raw"
+        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL") or "http://localhost:11434").rstrip("/")
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.cache = cache
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embedding")
+        self._batch_endpoint = True
+        self._stats_lock = threading.Lock()
+        self.embedded = 0
+        self.cache_hits = 0
+        self.requests = 0
+        self.seconds = 0.0
+
+    def _post(self, path: str, payload: dict):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=EMBEDDING_TIMEOUT)
+                if response.status_code < 500 and response.status_code != 429:
+                    return response
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+            if attempt < self.max_retries:
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        response.raise_for_status()
+        return response
+
+    def _embed_batch(self, texts):
+        with self._stats_lock:
+            self.requests += 1
+        if self.normalize and self._batch_endpoint:
+            response = self._post("/api/embed", {"model": self.model, "input": texts})
+            if not _endpoint_missing(response):
+                response.raise_for_status()
+                return response.json()["embeddings"]
+            # Ollama before 0.3 only has the single-text endpoint.
+            self._batch_endpoint = False
+
+        vectors = []
+        for text in texts:
+            response = self._post("/api/embeddings", {"model": self.model, "prompt": text})
+            response.raise_for_status()
+            vector = response.json()["embedding"]
+            vectors.append(unit(vector) if self.normalize else vector)
+        return vectors
+
+    def embed_documents(self, texts):
+        started = time.perf_counter()
+        keys = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.cache_model, set(keys)) if self.cache is not None else {}
+        hits = sum(1 for key in keys if key in vectors)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+            results = self._executor.map(lambda batch: self._embed_batch([missing[key] for key in batch]), batches)
+            computed = []
+            for batch, batch_vectors in zip(batches, results):
+                computed.extend(zip(batch, batch_vectors))
+            vectors.update(computed)
+            if self.cache is not None:
+                self.cache.put_many(self.cache_model, computed)
+
+        with self._stats_lock:
+            self.embedded += len(missing)
+            self.cache_hits += hits
+            self.seconds += time.perf_counter() - started
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model,
+                "normalize": self.normalize,
+                "embedded": self.embedded,
+                "cache_hits": self.cache_hits,
+                "requests": self.requests,
+                "seconds": round(self.seconds, 3),
+                "embeddings_per_second": round((self.embedded + self.cache_hits) / self.seconds, 1) if self.seconds else 0.0,
+            }
+
+_embedding_cache = None
+_init_lock = threading.Lock()
+
+def get_embedding_cache():
+    global _embedding_cache
+    with _init_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+def get_embedding_function(model: str = None, provider: str = None):
+    # Engines are shared per (provider, model, base_url) by the model registry.
+    from server.utils.models import models
+    return models.embedding_model(provider, model)
@@ -0,0 +1,15 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+
+# Embedding and vector search are blocking calls; they run here so the event
+# loop keeps serving other requests, and the pool size bounds how many of them
+# hit the CPU and the embedding server at the same time.
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
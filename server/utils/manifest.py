@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from server.vectorstores.layout import assistant_folder
+
+MANIFEST_FILE = "manifest.json"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def file_sha256(file_location: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_location, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_path(vector_db_location: str, assistant_id: str = None) -> str:
+    # data/<tenant>/<assistant>/manifest.json in both store layouts.
+    return os.path.join(assistant_folder(vector_db_location, assistant_id), MANIFEST_FILE)
+
+
+class IngestionManifest:
+    """Content hashes and chunk ids of every file indexed for one assistant.
+
+    Files are identified by name: uploading a file whose name is known but
+    whose hash changed replaces the chunks of the previous version, and a file
+    whose hash is already indexed is skipped before any parsing or embedding.
+    A skipped upload is kept as a reference on the entry it duplicates, so
+    the chunks stay until every file holding that content is deleted.
+    """
+
+    def __init__(self, vector_db_location: str, assistant_id: str = None):
+        self.path = manifest_path(vector_db_location, assistant_id)
+        with _locks_guard:
+            self.lock = _locks.setdefault(self.path, threading.Lock())
+        self.files = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.files = json.load(f).get("files", {})
+        else:
+            self.files = {}
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def find_hash(self, sha256: str):
+        for file_name, entry in self.files.items():
+            if entry["sha256"] == sha256:
+                return file_name
+        return None
+
+    def find_source(self, source: str):
+        """Name of the entry whose chunks ``source`` uses, as indexed file or as a duplicate."""
+        for file_name, entry in self.files.items():
+            if entry["source"] == source or source in entry.get("references", []):
+                return file_name
+        return None
+
+    def get(self, file_name: str):
+        return self.files.get(file_name)
+
+    def record(self, file_name: str, sha256: str, source: str, chunk_ids, references=()):
+        self.files[file_name] = {"sha256": sha256, "source": source, "chunk_ids": list(chunk_ids), "references": list(references)}
+
+    def add_reference(self, file_name: str, source: str):
+        entry = self.files[file_name]
+        references = entry.setdefault("references", [])
+        if source != entry["source"] and source not in references:
+            references.append(source)
+
+    def _keep(self, entry: dict, sources):
+        # Under the next holder's name, or its path when that name is taken.
+        file_name = os.path.basename(sources[0])
+        if file_name in self.files:
+            file_name = sources[0]
+        self.record(file_name, entry["sha256"], sources[0], entry["chunk_ids"], sources[1:])
+
+    def release(self, file_name: str, source: str):
+        """Drops ``source`` from the entry; returns its chunk ids once nothing uses them."""
+        entry = self.files.pop(file_name)
+        sources = [holder for holder in [entry["source"], *entry.get("references", [])] if holder != source]
+        if not sources:
+            return entry["chunk_ids"]
+        if entry["source"] != source:
+            self.record(file_name, entry["sha256"], entry["source"], entry["chunk_ids"], sources[1:])
+        else:
+            self._keep(entry, sources)
+        return []
+
+    def supersede(self, file_name: str):
+        """Drops the entry a new version of ``file_name`` replaces; returns its chunk ids once nothing uses them.
+
+        Duplicates uploaded under other names keep the old content.
+        """
+        entry = self.files.pop(file_name)
+        sources = [holder for holder in [entry["source"], *entry.get("references", [])] if os.path.basename(holder) != file_name]
+        if not sources:
+            return entry["chunk_ids"]
+        self._keep(entry, sources)
+        return []
@@ -0,0 +1,136 @@
+import os
+import threading
+from fastapi import HTTPException
+from langchain_ollama import ChatOllama
+from server.utils.admission import AdmissionController
+from server.utils.embedding import EmbeddingEngine, EMBEDDING_MODEL, get_embedding_cache
+from server.vectorstores.factory import store_embedding
+
+DEFAULT_LLM_PROVIDER = "ollama"
+DEFAULT_LLM_MODEL = "llama3.1:latest"
+DEFAULT_EMBEDDING_PROVIDER = "ollama"
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "4"))
+MODEL_BATCH_CONCURRENCY = int(os.getenv("MODEL_BATCH_CONCURRENCY", "2"))
+EMBEDDING_QUERY_CONCURRENCY = int(os.getenv("EMBEDDING_QUERY_CONCURRENCY", "8"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+class ModelHandle:
+    """A shared client for one (provider, model, base_url).
+
+    ``admission`` caps how many calls to that model this process runs at
+    once; callers hold a slot for the duration of an invoke or a stream.
+    Offline jobs run in plain threads and take ``batch_slots`` instead, a
+    separate capacity, so a backfill never holds the slots requests wait for.
+    """
+
+    def __init__(self, provider: str, model: str, base_url: str, client, concurrency: int = MODEL_CONCURRENCY,
+                 batch_concurrency: int = MODEL_BATCH_CONCURRENCY):
+        self.provider = provider
+        self.model = model
+        self.base_url = base_url
+        self.client = client
+        self.concurrency = concurrency
+        self.admission = AdmissionController(f"{provider}:{model}", concurrency)
+        self.batch_concurrency = batch_concurrency
+        self.batch_slots = threading.BoundedSemaphore(batch_concurrency)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._chat_models = {}
+        self._embedding_models = {}
+        self._embedding_admission = {}
+        self._mismatches = set()
+        self._store_embeddings = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _base_url(base_url: str = None):
+        return base_url or os.getenv("OLLAMA_BASE_URL")
+
+    def chat_model(self, provider: str = None, model: str = None, base_url: str = None, temperature: float = 0) -> ModelHandle:
+        provider = (provider or DEFAULT_LLM_PROVIDER).lower()
+        model = model or DEFAULT_LLM_MODEL
+        base_url = self._base_url(base_url)
+        key = (provider, model, base_url, temperature)
+        with self._lock:
+            handle = self._chat_models.get(key)
+            if handle is None:
+                if provider != "ollama":
+                    raise HTTPException(status_code=400, detail=f"Unsupported LLM provider: {provider}")
+                # One ChatOllama per model keeps one HTTP client, so its
+                # connection pool is reused across requests.
+                client = ChatOllama(model=model, temperature=temperature, base_url=base_url, keep_alive=OLLAMA_KEEP_ALIVE)
+                handle = self._chat_models[key] = ModelHandle(provider, model, base_url, client)
+            return handle
+
+    def embedding_model(self, provider: str = None, model: str = None, base_url: str = None, normalize: bool = True) -> EmbeddingEngine:
+        provider = (provider or DEFAULT_EMBEDDING_PROVIDER).lower()
+        model = model or EMBEDDING_MODEL
+        base_url = self._base_url(base_url)
+        key = (provider, model, base_url, normalize)
+        cache = get_embedding_cache()
+        with self._lock:
+            engine = self._embedding_models.get(key)
+            if engine is None:
+                if provider != "ollama":
+                    raise HTTPException(status_code=400, detail=f"Unsupported embedding provider: {provider}")
+                engine = self._embedding_models[key] = EmbeddingEngine(model=model, base_url=base_url, cache=cache, normalize=normalize)
+                self._embedding_admission[id(engine)] = AdmissionController(f"{provider}:{model}", EMBEDDING_QUERY_CONCURRENCY)
+            return engine
+
+    def embedding_admission(self, engine: EmbeddingEngine) -> AdmissionController:
+        # Query-time embeddings only; ingestion is bounded by the engine's own
+        # in-flight limit instead.
+        with self._lock:
+            return self._embedding_admission[id(engine)]
+
+    def embedding_for_store(self, vector_db_location: str, configured: EmbeddingEngine) -> EmbeddingEngine:
+        """The engine matching a store's vectors; ``configured`` for a new store.
+
+        Queries and ingestion into an existing store must use the model it
+        was written with, whatever the assistant row says now.
+        """
+        recorded = self._store_embeddings.get(vector_db_location)
+        if recorded is None and vector_db_location:
+            # Recorded once on the first write and never changed after it.
+            recorded = store_embedding(vector_db_location)
+            if recorded is not None:
+                self._store_embeddings[vector_db_location] = recorded
+        normalize = recorded.get("normalized", True) if recorded is not None else configured.normalize
+        if recorded is None or (recorded["provider"], recorded["model"], normalize) == (configured.provider, configured.model, configured.normalize):
+            return configured
+        engine = self.embedding_model(recorded["provider"], recorded["model"], normalize=normalize)
+        if (engine.provider, engine.model) == (configured.provider, configured.model):
+            return engine
+        with self._lock:
+            warn = vector_db_location not in self._mismatches
+            self._mismatches.add(vector_db_location)
+        if warn:
+            print(
+                f"⚠️ {vector_db_location} was embedded with {engine.provider}:{engine.model}, not the configured "
+                f"{configured.provider}:{configured.model}; using {engine.model} for it"
+            )
+        return engine
+
+    def for_assistant(self, assistant: dict):
+        assistant = assistant or {}
+        chat = self.chat_model(assistant.get("llm_provider"), assistant.get("llm_model"))
+        embeddings = self.embedding_model(assistant.get("embedding_provider"), assistant.get("embedding_model"))
+        return chat, embeddings
+
+    def stats(self) -> dict:
+        with self._lock:
+            chat = [
+                {"provider": handle.provider, "model": handle.model, "admission": handle.admission.stats(), "batch_concurrency": handle.batch_concurrency}
+                for handle in self._chat_models.values()
+            ]
+            embeddings = [
+                {**engine.stats(), "admission": self._embedding_admission[id(engine)].stats()}
+                for engine in self._embedding_models.values()
+            ]
+        return {"chat": chat, "embeddings": embeddings}
+
+
+models = ModelRegistry()
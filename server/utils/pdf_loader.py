@@ -0,0 +1,98 @@
+import glob
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from langchain.schema.document import Document
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+
+def _page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, stop: int):
+    # Runs in a worker process; only plain strings cross the process boundary.
+    reader = PdfReader(path)
+    return [reader.pages[page].extract_text() for page in range(start, stop)]
+
+
+# One pool per size; loaders asking for another size get their own instead
+# of silently sharing one sized by whoever came first.
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool(max_workers: int = PDF_WORKERS) -> ProcessPoolExecutor:
+    with _pool_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            # Spawned rather than forked: the server process has live threads
+            # and database connections that must not be copied into workers.
+            pool = _pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def shutdown_pdf_pool():
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+class ParallelPDFLoader:
+    """Parses PDFs across a process pool, page ranges at a time.
+
+    Files are split into tasks of ``pages_per_task`` pages so one large file
+    is spread over several workers too. Documents are yielded in file and page
+    order with the same ``source``/``page`` metadata as ``PyPDFLoader``, and
+    at most ``2 * max_workers`` tasks are outstanding so memory stays bounded.
+    """
+
+    def __init__(self, file_paths, max_workers: int = PDF_WORKERS, pages_per_task: int = PDF_PAGES_PER_TASK):
+        self.file_paths = [file_paths] if isinstance(file_paths, str) else list(file_paths)
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+
+    def _tasks(self):
+        for path in self.file_paths:
+            pages = _page_count(path)
+            for start in range(0, pages, self.pages_per_task):
+                yield path, start, min(start + self.pages_per_task, pages)
+
+    @staticmethod
+    def _documents(path: str, start: int, texts):
+        for offset, text in enumerate(texts):
+            yield Document(page_content=text, metadata={"source": path, "page": start + offset})
+
+    def lazy_load(self):
+        if self.max_workers <= 1:
+            for path, start, stop in self._tasks():
+                yield from self._documents(path, start, _extract_pages(path, start, stop))
+            return
+
+        pool = get_pdf_pool(self.max_workers)
+        pending = deque()
+        try:
+            for path, start, stop in self._tasks():
+                pending.append((path, start, pool.submit(_extract_pages, path, start, stop)))
+                if len(pending) >= 2 * self.max_workers:
+                    path, start, future = pending.popleft()
+                    yield from self._documents(path, start, future.result())
+            while pending:
+                path, start, future = pending.popleft()
+                yield from self._documents(path, start, future.result())
+        finally:
+            for _path, _start, future in pending:
+                future.cancel()
+
+    def load(self):
+        return list(self.lazy_load())
+
+
+def pdf_files(directory: str):
+    return sorted(glob.glob(os.path.join(directory, "**", "[!.]*.pdf"), recursive=True))
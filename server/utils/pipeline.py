@@ -0,0 +1,137 @@
+import os
+import queue
+import threading
+from server.utils.chroma import ADD_BATCH_SIZE, split_documents, calculate_chunk_ids, changed_chunks, upsert_chunks
+from server.utils.embedding import get_embedding_function
+from server.utils.store_cache import vector_stores, get_vector_store
+from server.vectorstores.factory import embedding_info, record_store_embedding
+
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+PIPELINE_BATCH_QUEUE_SIZE = int(os.getenv("PIPELINE_BATCH_QUEUE_SIZE", "2"))
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def threaded(iterable, maxsize: int):
+    """Runs ``iterable`` in a background thread behind a bounded queue.
+
+    The producer blocks once ``maxsize`` items are waiting, which is what
+    gives the pipeline its back-pressure. Errors are re-raised in the
+    consumer, and a consumer that stops early stops the producer too.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failed(e))
+        finally:
+            # Close upstream generators in this thread, which also stops any
+            # threaded stage nested inside them.
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def split_pages(documents, progress=None, report_every: int = 16):
+    # Chunk ids restart on every page, so splitting page by page yields the
+    # same ids as splitting the whole file at once.
+    pages = 0
+    for document in documents:
+        pages += 1
+        if progress is not None and pages == report_every:
+            progress.add_pages(pages)
+            pages = 0
+        yield from calculate_chunk_ids(split_documents([document]))
+    if progress is not None and pages:
+        progress.add_pages(pages)
+
+
+def batched(chunks, size: int):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_batches(batches, db, vector_db_location: str, embedding_function, progress=None):
+    for batch in batches:
+        with vector_stores.write_lock(vector_db_location):
+            new_chunks = changed_chunks(db, batch)
+        if progress is not None:
+            progress.add_chunks_total(len(new_chunks))
+        vectors = embedding_function.embed_documents([chunk.page_content for chunk in new_chunks]) if new_chunks else []
+        yield batch, new_chunks, vectors
+
+
+def ingest_documents(documents, vector_db_location: str, progress=None, embedding_function=None, batch_size: int = ADD_BATCH_SIZE, assistant_id: str = None):
+    """Load -> split -> embed -> upsert, one fixed-size batch at a time.
+
+    Loading, embedding and writing overlap in separate threads, and no stage
+    holds more than a bounded number of pages or batches, so memory stays
+    flat however large the input is. Returns the ids of all chunks seen.
+    """
+    embedding_function = embedding_function or get_embedding_function()
+    db = get_vector_store(vector_db_location, embedding_function, assistant_id)
+    with vector_stores.write_lock(vector_db_location):
+        record_store_embedding(vector_db_location, embedding_info(embedding_function))
+    pages = threaded(documents, PIPELINE_QUEUE_SIZE)
+    batches = batched(split_pages(pages, progress), batch_size)
+    embedded = threaded(embed_batches(batches, db, vector_db_location, embedding_function, progress), PIPELINE_BATCH_QUEUE_SIZE)
+
+    chunk_ids = []
+    added = 0
+    try:
+        for batch, new_chunks, vectors in embedded:
+            chunk_ids.extend(chunk.metadata["id"] for chunk in batch)
+            if new_chunks:
+                with vector_stores.write_lock(vector_db_location):
+                    upsert_chunks(db, new_chunks, vectors)
+                added += len(new_chunks)
+                if progress is not None:
+                    progress.add_chunks_embedded(len(new_chunks))
+    finally:
+        if added:
+            with vector_stores.write_lock(vector_db_location):
+                db.persist()
+                vector_stores.mark_updated(vector_db_location, assistant_id)
+        print(f"✅ {added} new or changed chunks added, {len(chunk_ids) - added} unchanged")
+
+    return chunk_ids
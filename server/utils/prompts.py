@@ -29,4 +29,17 @@ prompt = PromptTemplate.from_template(
 
     {input}
     """
-)
\ No newline at end of file
+)
+
+SUMMARY_PROMPT_TEMPLATE = """
+Update the running summary of a conversation with the new exchanges below.
+Keep names, numbers, products, decisions and open questions. Write at most {words} words and reply with the summary only.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:
+"""
@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from server.utils.ttl_cache import TTLCache
+from server.utils.embedding import get_embedding_function
+from server.utils.store_cache import vector_stores, get_vector_store
+from server.utils.retrieval import HYBRID_CANDIDATES, hybrid_search
+from server.utils.rerank import RERANK_CANDIDATES, get_reranker, rerank
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_query(query_text: str) -> str:
+    return _whitespace.sub(" ", query_text).strip().lower()
+
+
+class _AssistantStats:
+    def __init__(self):
+        self.result_hits = 0
+        self.result_misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self.saved_seconds = 0.0
+
+    def as_dict(self):
+        lookups = self.result_hits + self.result_misses
+        return {
+            "result_hits": self.result_hits,
+            "result_misses": self.result_misses,
+            "result_hit_rate": round(self.result_hits / lookups, 3) if lookups else 0.0,
+            "embedding_hits": self.embedding_hits,
+            "embedding_misses": self.embedding_misses,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+class QueryCache:
+    """Two-level cache in front of retrieval.
+
+    Query text -> embedding vector, and (assistant, normalized query,
+    collection version, k, retrieval mode, reranker) -> top-k results. The collection
+    version comes from the store cache and changes on every write or
+    invalidation, so results of an assistant whose documents changed are
+    never served again.
+    """
+
+    def __init__(self):
+        self.embeddings = TTLCache(QUERY_EMBEDDING_CACHE_MAX_ENTRIES, QUERY_EMBEDDING_CACHE_TTL)
+        self.results = TTLCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL)
+        self._stats = defaultdict(_AssistantStats)
+        self._lock = threading.Lock()
+
+    def embed_query(self, assistant_id: str, normalized: str, embeddings=None):
+        embedding_function = embeddings or get_embedding_function()
+        key = (embedding_function.cache_model, normalized)
+        embedding = self.embeddings.get(key)
+        with self._lock:
+            if embedding is not None:
+                self._stats[assistant_id].embedding_hits += 1
+            else:
+                self._stats[assistant_id].embedding_misses += 1
+        if embedding is None:
+            embedding = embedding_function.embed_query(normalized)
+            self.embeddings.put(key, embedding)
+        return embedding
+
+    def search(self, assistant_id: str, vector_db_location: str, query_text: str, k: int = 5, embeddings=None, mode: str = "vector",
+               reranker: str = None, candidates: int = RERANK_CANDIDATES):
+        normalized = normalize_query(query_text)
+        key = (assistant_id, normalized, vector_stores.version(vector_db_location, assistant_id), k, mode, reranker, candidates if reranker else None)
+        cached = self.results.get(key)
+        if cached is not None:
+            results, cost = cached
+            with self._lock:
+                stats = self._stats[assistant_id]
+                stats.result_hits += 1
+                stats.saved_seconds += cost
+            return results
+
+        started = time.perf_counter()
+        embedding = self.embed_query(assistant_id, normalized, embeddings)
+        db = get_vector_store(vector_db_location, embeddings, assistant_id)
+        # With a reranker, a wider candidate set is retrieved and cut down to k.
+        retrieve = max(k, candidates) if reranker else k
+        if mode == "hybrid":
+            results = hybrid_search(db, embedding, query_text, k=retrieve, candidates=max(retrieve, HYBRID_CANDIDATES))
+        else:
+            results = db.search(embedding, k=retrieve)
+        if reranker:
+            results = rerank(get_reranker(reranker), query_text, results, k)
+        cost = time.perf_counter() - started
+
+        self.results.put(key, (results, cost))
+        with self._lock:
+            self._stats[assistant_id].result_misses += 1
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_assistant = {assistant_id: stats.as_dict() for assistant_id, stats in self._stats.items()}
+        return {
+            "embedding_entries": len(self.embeddings),
+            "result_entries": len(self.results),
+            "result_evictions": self.results.evictions,
+            "assistants": per_assistant,
+        }
+
+
+query_cache = QueryCache()
@@ -0,0 +1,99 @@
+import math
+import os
+import threading
+from server.utils.bm25 import tokenize
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_DEVICE = os.getenv("RERANK_DEVICE", "cpu")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512"))
+
+
+class LexicalReranker:
+    """Share of the query's terms found in each chunk, weighted by rarity.
+
+    Term weights are an idf over the candidate set itself, so a term every
+    candidate contains counts for little. Costs one tokenization per chunk.
+    """
+
+    name = "lexical"
+
+    def score(self, query_text: str, texts):
+        query_terms = set(tokenize(query_text))
+        documents = [set(tokenize(text)) for text in texts]
+        if not query_terms or not documents:
+            return [0.0] * len(documents)
+        weights = {}
+        for term in query_terms:
+            df = sum(1 for terms in documents if term in terms)
+            weights[term] = math.log(1.0 + len(documents) / (df + 0.5))
+        total = sum(weights.values())
+        return [sum(weight for term, weight in weights.items() if term in terms) / total for terms in documents]
+
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a sentence-transformers cross-encoder.
+
+    The model is loaded on first use. Pairs are scored ``batch_size`` at a
+    time, and one prediction runs at a time so concurrent requests do not
+    oversubscribe the CPU.
+    """
+
+    name = "cross-encoder"
+
+    def __init__(self, model: str = RERANK_MODEL, device: str = RERANK_DEVICE, batch_size: int = RERANK_BATCH_SIZE):
+        self.model_name = model
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            self._model = CrossEncoder(self.model_name, device=self.device, max_length=RERANK_MAX_LENGTH)
+            print(f"✅ Loaded reranker {self.model_name} on {self.device}")
+        return self._model
+
+    def score(self, query_text: str, texts):
+        if not texts:
+            return []
+        with self._lock:
+            model = self._load()
+            scores = model.predict([(query_text, text) for text in texts], batch_size=self.batch_size, show_progress_bar=False)
+        return [float(score) for score in scores]
+
+
+RERANKERS = ("lexical", "cross-encoder")
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(name: str):
+    if name not in RERANKERS:
+        raise ValueError(f"Unknown reranker: {name}")
+    with _rerankers_lock:
+        reranker = _rerankers.get(name)
+        if reranker is None:
+            if name == "cross-encoder" and CrossEncoder is not None:
+                reranker = CrossEncoderReranker()
+            else:
+                if name == "cross-encoder":
+                    print("⚠️ sentence-transformers is not installed; using the lexical reranker")
+                reranker = LexicalReranker()
+            _rerankers[name] = reranker
+        return reranker
+
+
+def rerank(reranker, query_text: str, results, k: int):
+    """Re-orders retrieved (document, score) pairs; returns the top ``k`` with reranker scores."""
+    scores = reranker.score(query_text, [doc.page_content for doc, _score in results])
+    # sorted() is stable, so ties keep their retrieval order.
+    ranked = sorted(zip((doc for doc, _score in results), scores), key=lambda item: item[1], reverse=True)
+    return ranked[:k]
@@ -0,0 +1,31 @@
+import os
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RETRIEVAL_MODES = ("vector", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """Fuses ranked id lists; each list adds 1 / (k + rank) to its ids."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def hybrid_search(db, embedding, query_text: str, k: int = 5, candidates: int = HYBRID_CANDIDATES):
+    """Vector and BM25 candidates fused with RRF; scores are the fused scores."""
+    vector_results = db.search(embedding, k=candidates)
+    lexical_results = db.lexical.search(query_text, k=candidates) if db.lexical is not None else []
+
+    documents = {doc.metadata.get("id"): doc for doc, _score in vector_results}
+    fused = reciprocal_rank_fusion([
+        [doc.metadata.get("id") for doc, _score in vector_results],
+        [chunk_id for chunk_id, _score in lexical_results],
+    ])[:k]
+
+    missing = [chunk_id for chunk_id, _score in fused if chunk_id not in documents]
+    if missing:
+        documents.update((doc.metadata.get("id"), doc) for doc in db.get_documents(missing))
+    return [(documents[chunk_id], score) for chunk_id, score in fused if chunk_id in documents]
@@ -0,0 +1,90 @@
+import os
+import threading
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+
+
+class _AssistantIndex:
+    def __init__(self, version: int):
+        self.version = version
+        self.vectors = None
+        self.entries = []
+
+
+class SemanticCache:
+    """Per-assistant answer cache matched on query-embedding similarity.
+
+    An answer is reused when a new query is within the cosine threshold of a
+    cached query *and* retrieval returned exactly the same source ids, so a
+    hit never answers from a different context. Each assistant's index is
+    tied to its collection version and dropped when that changes.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self, assistant_id: str, version: int):
+        index = self._indexes.get(assistant_id)
+        if index is None or index.version != version:
+            index = self._indexes[assistant_id] = _AssistantIndex(version)
+        return index
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, assistant_id: str, version: int, embedding, source_ids, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        query = self._normalize(embedding)
+        source_ids = tuple(source_ids)
+        with self._lock:
+            index = self._index(assistant_id, version)
+            if index.vectors is not None and len(index.entries):
+                similarities = index.vectors @ query
+                for position in np.argsort(-similarities):
+                    if similarities[position] < threshold:
+                        break
+                    entry_sources, response = index.entries[position]
+                    if entry_sources == source_ids:
+                        self.hits += 1
+                        return response
+            self.misses += 1
+            return None
+
+    def store(self, assistant_id: str, version: int, embedding, source_ids, response: str, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        vector = self._normalize(embedding)[np.newaxis, :]
+        with self._lock:
+            index = self._index(assistant_id, version)
+            if index.vectors is None:
+                index.vectors = vector
+            else:
+                index.vectors = np.vstack([index.vectors, vector])
+            index.entries.append((tuple(source_ids), response))
+            if len(index.entries) > max_entries:
+                overflow = len(index.entries) - max_entries
+                index.vectors = index.vectors[overflow:]
+                index.entries = index.entries[overflow:]
+
+    def invalidate(self, assistant_id: str):
+        with self._lock:
+            self._indexes.pop(assistant_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "assistants": len(self._indexes),
+                "entries": sum(len(index.entries) for index in self._indexes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from server.vectorstores.factory import open_vector_store
+from server.vectorstores.layout import is_shared_location
+from server.vectorstores.scoped import AssistantScopedStore
+
+CHROMA_CACHE_MAX_BYTES = int(os.getenv("CHROMA_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+CHROMA_CACHE_MAX_STORES = int(os.getenv("CHROMA_CACHE_MAX_STORES", "64"))
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class _Entry:
+    def __init__(self, store, size: int):
+        self.store = store
+        self.size = size
+
+
+class VectorStoreCache:
+    """Process-wide LRU of opened vector stores, keyed by persist directory.
+
+    Memory use of a store is estimated from the size of its persisted
+    directory, which is what Chroma loads into memory when it is opened.
+    """
+
+    def __init__(self, max_bytes: int = CHROMA_CACHE_MAX_BYTES, max_stores: int = CHROMA_CACHE_MAX_STORES):
+        self.max_bytes = max_bytes
+        self.max_stores = max_stores
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._write_locks = {}
+        self._versions = {}
+        self._assistant_versions = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(vector_db_location: str) -> str:
+        return os.path.normpath(os.path.abspath(vector_db_location))
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.store
+            return None
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def write_lock(self, vector_db_location: str) -> threading.Lock:
+        key = self._key(vector_db_location)
+        with self._lock:
+            lock = self._write_locks.get(key)
+            if lock is None:
+                lock = self._write_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, vector_db_location: str, embedding_function=None):
+        key = self._key(vector_db_location)
+        store = self._lookup(key)
+        if store is not None:
+            return store
+
+        # Only one caller opens a given directory; the others wait here and
+        # pick up the loaded store instead of reading it from disk again.
+        with self._key_lock(key):
+            store = self._lookup(key)
+            if store is not None:
+                return store
+
+            with self._lock:
+                self.misses += 1
+            store = open_vector_store(vector_db_location, embedding_function)
+            size = _directory_size(vector_db_location)
+
+            with self._lock:
+                self._entries[key] = _Entry(store, size)
+                self._bytes += size
+                self._evict()
+            return store
+
+    def _evict(self):
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_stores):
+            if len(self._entries) == 1:
+                # Never evict the store that was just opened.
+                break
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def mark_updated(self, vector_db_location: str, assistant_id: str = None):
+        """Record a write made through the cached store itself.
+
+        In a shared collection a write scoped to one assistant only changes
+        that assistant's version, so the others keep their cached results.
+        """
+        key = self._key(vector_db_location)
+        size = _directory_size(vector_db_location)
+        with self._lock:
+            if assistant_id is not None and is_shared_location(vector_db_location):
+                self._assistant_versions[(key, assistant_id)] = self._assistant_versions.get((key, assistant_id), 0) + 1
+            else:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._bytes += size - entry.size
+                entry.size = size
+                self._evict()
+
+    def invalidate(self, vector_db_location: str):
+        key = self._key(vector_db_location)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+                self.invalidations += 1
+
+    def version(self, vector_db_location: str, assistant_id: str = None) -> int:
+        # Both counters only grow, so their sum changes whenever either does.
+        key = self._key(vector_db_location)
+        with self._lock:
+            return self._versions.get(key, 0) + self._assistant_versions.get((key, assistant_id), 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stores": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_stores": self.max_stores,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+vector_stores = VectorStoreCache()
+
+
+def get_vector_store(vector_db_location: str, embedding_function=None, assistant_id: str = None):
+    store = vector_stores.get(vector_db_location, embedding_function)
+    if is_shared_location(vector_db_location):
+        if assistant_id is None:
+            raise ValueError(f"{vector_db_location} is shared between assistants; an assistant_id is required")
+        return AssistantScopedStore(store, assistant_id)
+    return store
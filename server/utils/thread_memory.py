@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+from langchain.prompts import PromptTemplate
+from psycopg.types.json import Jsonb
+from server.database.db import async_db_connection
+from server.utils.context import HISTORY_TOKEN_BUDGET, build_history
+from server.utils.prompts import SUMMARY_PROMPT_TEMPLATE
+from server.utils.tokens import count_tokens, truncate_tokens
+
+# Exchanges kept verbatim; older ones are folded into the summary.
+THREAD_MEMORY_RECENT_TURNS = int(os.getenv("THREAD_MEMORY_RECENT_TURNS", "3"))
+# Each side of an exchange is clipped to this many tokens when stored.
+THREAD_MEMORY_TURN_TOKENS = int(os.getenv("THREAD_MEMORY_TURN_TOKENS", "300"))
+THREAD_MEMORY_SUMMARY_TOKENS = int(os.getenv("THREAD_MEMORY_SUMMARY_TOKENS", "250"))
+# Threads from before thread_memory existed fall back to this many messages.
+HISTORY_MAX_TURNS = 10
+
+summary_prompt = PromptTemplate.from_template(SUMMARY_PROMPT_TEMPLATE)
+
+_summarizing = set()
+_tasks = set()
+
+
+def _text(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def _message_turn(message_text) -> dict:
+    # A messages row ([{"role": ..., "content": ...}, ...]) as a stored exchange.
+    try:
+        parts = json.loads(message_text) if isinstance(message_text, str) else message_text
+    except ValueError:
+        parts = None
+    if not isinstance(parts, list):
+        parts = [{"role": "user", "content": str(message_text)}]
+    parts = [part for part in parts if isinstance(part, dict)]
+    user = "\n".join(_text(part.get("content", "")) for part in parts if part.get("role") == "user")
+    assistant = "\n".join(_text(part.get("content", "")) for part in parts if part.get("role") != "user")
+    return {
+        "user": truncate_tokens(user, THREAD_MEMORY_TURN_TOKENS),
+        "assistant": truncate_tokens(assistant, THREAD_MEMORY_TURN_TOKENS),
+    }
+
+
+def _turn_text(turn: dict) -> str:
+    return f"User: {turn['user']}\nAssistant: {turn['assistant']}"
+
+
+def render_history(summary: str, turns, budget: int):
+    """Summary plus the newest exchanges that fit in ``budget`` tokens.
+
+    The summary gets at most half the budget; exchanges are taken newest
+    first and listed oldest first. Returns (text, tokens).
+    """
+    parts = []
+    if summary:
+        summary_text = truncate_tokens(f"Summary of the earlier conversation: {summary}", budget // 2)
+        if summary_text:
+            parts.append(summary_text)
+    used = count_tokens("\n".join(parts))
+
+    recent = []
+    for turn in reversed(turns):
+        text = _turn_text(turn)
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            break
+        recent.append(text)
+        used += tokens
+    recent.reverse()
+
+    text = "\n".join(parts + recent)
+    return text, count_tokens(text)
+
+
+def _clip_to_budget(text: str, budget: int):
+    # A row rendered under a larger budget than the assistant now has: keep
+    # the newest lines.
+    lines = []
+    used = 0
+    for line in reversed(text.split("\n")):
+        tokens = count_tokens(line)
+        if used + tokens > budget:
+            break
+        lines.append(line)
+        used += tokens
+    lines.reverse()
+    return "\n".join(lines), used
+
+
+async def thread_history(cursor, thread_id: str, budget: int = HISTORY_TOKEN_BUDGET):
+    """History text for a prompt and its token count, read from one row."""
+    await cursor.execute("SELECT history, history_tokens FROM thread_memory WHERE thread_id = %s", (thread_id,))
+    row = await cursor.fetchone()
+    if row is not None:
+        history, tokens = row
+        return (history, tokens) if tokens <= budget else _clip_to_budget(history, budget)
+
+    await cursor.execute(
+        """
+        SELECT message_text
+        FROM messages
+        WHERE thread_id = %s
+        ORDER BY created_at DESC
+        LIMIT %s
+        """,
+        (thread_id, HISTORY_MAX_TURNS)
+    )
+    return build_history([msg[0] for msg in await cursor.fetchall()], budget)
+
+
+async def _seed_memory(cursor, thread_id: str):
+    # Threads from before thread_memory existed start from the messages
+    # thread_history showed for them. The caller's own message was inserted
+    # at NOW() in this transaction, so it is left to the caller.
+    await cursor.execute(
+        """
+        SELECT message_text
+        FROM messages
+        WHERE thread_id = %s AND created_at < NOW()
+        ORDER BY created_at DESC
+        LIMIT %s
+        """,
+        (thread_id, HISTORY_MAX_TURNS)
+    )
+    turns = [_message_turn(row[0]) for row in reversed(await cursor.fetchall())]
+    if not turns:
+        return
+    overflow = max(len(turns) - THREAD_MEMORY_RECENT_TURNS, 0)
+    await cursor.execute(
+        "UPDATE thread_memory SET pending = %s, recent = %s WHERE thread_id = %s",
+        (Jsonb(turns[:overflow]), Jsonb(turns[overflow:]), thread_id)
+    )
+
+
+async def record_turn(cursor, thread_id: str, tenant_id: str, query_text: str, response, budget: int = HISTORY_TOKEN_BUDGET) -> bool:
+    """Adds one exchange to the thread's memory row and re-renders its history.
+
+    A new row starts from the thread's earlier messages. Runs in the caller's
+    transaction, after the exchange's own message was inserted at NOW().
+    Returns True when exchanges are waiting to be folded into the summary.
+    """
+    await cursor.execute(
+        "INSERT INTO thread_memory (thread_id, tenant_id) VALUES (%s, %s) ON CONFLICT (thread_id) DO NOTHING RETURNING thread_id",
+        (thread_id, tenant_id)
+    )
+    if await cursor.fetchone() is not None:
+        await _seed_memory(cursor, thread_id)
+    await cursor.execute("SELECT summary, pending, recent FROM thread_memory WHERE thread_id = %s FOR UPDATE", (thread_id,))
+    summary, pending, recent = await cursor.fetchone()
+
+    recent.append({
+        "user": truncate_tokens(query_text, THREAD_MEMORY_TURN_TOKENS),
+        "assistant": truncate_tokens(_text(response), THREAD_MEMORY_TURN_TOKENS),
+    })
+    overflow = max(len(recent) - THREAD_MEMORY_RECENT_TURNS, 0)
+    pending, recent = pending + recent[:overflow], recent[overflow:]
+
+    # Exchanges not summarized yet still count as history until they are.
+    history, tokens = render_history(summary, pending + recent, budget)
+    await cursor.execute(
+        """
+        UPDATE thread_memory
+        SET pending = %s, recent = %s, history = %s, history_tokens = %s, history_budget = %s, updated_at = NOW()
+        WHERE thread_id = %s
+        """,
+        (Jsonb(pending), Jsonb(recent), history, tokens, budget, thread_id)
+    )
+    return bool(pending)
+
+
+async def _summarize(thread_id: str, tenant_id: str, handle):
+    while True:
+        async with async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT summary, pending FROM thread_memory WHERE thread_id = %s", (thread_id,))
+                row = await cursor.fetchone()
+        if row is None or not row[1]:
+            return
+        summary, batch = row
+
+        chain_input = summary_prompt.format(
+            words=THREAD_MEMORY_SUMMARY_TOKENS * 3 // 4,
+            summary=summary or "(none)",
+            turns="\n".join(_turn_text(turn) for turn in batch),
+        )
+        async with handle.admission.slot(tenant_id):
+            result = await handle.client.ainvoke(chain_input)
+        new_summary = truncate_tokens(result.content.strip(), THREAD_MEMORY_SUMMARY_TOKENS)
+
+        async with async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT pending, recent, history_budget FROM thread_memory WHERE thread_id = %s FOR UPDATE", (thread_id,)
+                )
+                pending, recent, budget = await cursor.fetchone()
+                if pending[:len(batch)] != batch:
+                    # Another process folded these exchanges already.
+                    return
+                pending = pending[len(batch):]
+                history, tokens = render_history(new_summary, pending + recent, budget)
+                await cursor.execute(
+                    """
+                    UPDATE thread_memory
+                    SET summary = %s, summarized_turns = summarized_turns + %s, pending = %s,
+                        history = %s, history_tokens = %s, updated_at = NOW()
+                    WHERE thread_id = %s
+                    """,
+                    (new_summary, len(batch), Jsonb(pending), history, tokens, thread_id)
+                )
+            await conn.commit()
+
+
+async def _summarize_once(thread_id: str, tenant_id: str, handle):
+    try:
+        await _summarize(thread_id, tenant_id, handle)
+    except Exception as e:
+        # Pending exchanges stay in the history and are retried next turn.
+        print(f"⚠️ Summarizing thread {thread_id} failed: {e}")
+    finally:
+        _summarizing.discard(thread_id)
+
+
+def schedule_summary(thread_id: str, tenant_id: str, handle):
+    """Folds pending exchanges into the summary in the background, once per thread."""
+    if thread_id in _summarizing:
+        return
+    _summarizing.add(thread_id)
+    task = asyncio.create_task(_summarize_once(thread_id, tenant_id, handle))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
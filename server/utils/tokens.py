@@ -0,0 +1,31 @@
+import math
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+# Used without tiktoken; about right for English and Indonesian prose.
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+_encoding = tiktoken.get_encoding(TOKEN_ENCODING) if tiktoken is not None else None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of ``text``; an estimate, as served models use their own tokenizers."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    if budget <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else _encoding.decode(tokens[:budget])
+    return text[:int(budget * CHARS_PER_TOKEN)]
@@ -1,6 +1,9 @@
 import os
-from server.utils.chroma import load_documents, split_documents, add_to_chroma, load_documents_webbase
-from server.database.db import get_db_connection
+from server.utils.chroma import load_documents, split_documents, add_to_chroma, delete_from_chroma, load_documents_webbase
+from server.utils.pdf_loader import ParallelPDFLoader
+from server.utils.pipeline import ingest_documents
+from server.utils.manifest import IngestionManifest, file_sha256
+from server.database.db import db_connection
 
 def run_update_database(file_name, file_id, file_location, vector_db_id, vector_db_location):
     try:
@@ -9,39 +12,73 @@ def run_update_database(file_name, file_id, file_location, vector_db_id, vector_
         chunks = split_documents(documents)
         add_to_chroma(chunks, vector_db_location)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO files (id, file_name, file_location, vector_db_id, vector_db_location) VALUES (%s, %s, %s, %s, %s)",
-            (file_id, file_name, file_location, vector_db_id, vector_db_location)
-        )
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO files (id, file_name, file_location, vector_db_id, vector_db_location) VALUES (%s, %s, %s, %s, %s)",
+                (file_id, file_name, file_location, vector_db_id, vector_db_location)
+            )
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
     except Exception as e:
         print(f"Error updating database: {e}")
 
-def run_update_database_multi(file_locations, assistant_id, vector_db_location):
+def ingest_file(file_location, vector_db_location, progress=None, embedding_function=None, assistant_id=None):
+    file_name = os.path.basename(file_location)
+    sha256 = file_sha256(file_location)
+    manifest = IngestionManifest(vector_db_location, assistant_id)
+
+    with manifest.lock:
+        manifest.load()
+        duplicate = manifest.find_hash(sha256)
+        if duplicate is not None:
+            print(f"⏭️ Skipping {file_name}: identical content already indexed as {duplicate}")
+            manifest.add_reference(duplicate, file_location)
+            manifest.save()
+            return False
+
+        previous = manifest.get(file_name)
+        documents = ParallelPDFLoader(file_location).lazy_load()
+        chunk_ids = ingest_documents(documents, vector_db_location, progress=progress, embedding_function=embedding_function, assistant_id=assistant_id)
+
+        # New chunks are written before the old version's are removed, so the
+        # file never disappears from retrieval while it is being replaced.
+        # Duplicates of the old version under other names keep its chunks.
+        if previous is not None:
+            stale_ids = manifest.supersede(file_name)
+            delete_from_chroma(set(stale_ids) - set(chunk_ids), vector_db_location, assistant_id)
+
+        manifest.record(file_name, sha256, file_location, chunk_ids)
+        manifest.save()
+        return True
+
+def forget_file(file_location, vector_db_location, assistant_id=None):
+    manifest = IngestionManifest(vector_db_location, assistant_id)
+    with manifest.lock:
+        manifest.load()
+        file_name = manifest.find_source(file_location)
+        if file_name is None:
+            return
+        chunk_ids = manifest.release(file_name, file_location)
+        if chunk_ids:
+            delete_from_chroma(chunk_ids, vector_db_location, assistant_id)
+        manifest.save()
+
+def run_update_database_multi(file_locations, assistant_id, vector_db_location, progress=None, embedding_function=None):
     try:
-        all_documents = []
         for file_location in file_locations:
-            folder = os.path.dirname(file_location)
-            documents = load_documents(folder)
-            all_documents.extend(documents)
-
-        chunks = split_documents(all_documents)
-        add_to_chroma(chunks, vector_db_location)
+            ingest_file(file_location, vector_db_location, progress=progress, embedding_function=embedding_function, assistant_id=assistant_id)
     except Exception as e:
         print(f"Error updating database: {e}")
+        raise
 
-def run_update_database_webbase(url, assistant_id, vector_db_location):
+def run_update_database_webbase(url, assistant_id, vector_db_location, progress=None, embedding_function=None):
     try:
         
         # folder = os.path.dirname(url)
         documents = load_documents_webbase(url)
-
-        chunks = split_documents(documents)
-        add_to_chroma(chunks, vector_db_location)
+        ingest_documents(documents, vector_db_location, progress=progress, embedding_function=embedding_function, assistant_id=assistant_id)
     except Exception as e:
-        print(f"Error updating database: {e}")
\ No newline at end of file
+        print(f"Error updating database: {e}")
+        raise
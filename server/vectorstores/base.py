@@ -0,0 +1,45 @@
+from typing import Dict, Iterator, List, Tuple
+from langchain.schema.document import Document
+
+
+class VectorStore:
+    """What ingestion and retrieval need from a vector index.
+
+    Scores returned by ``search`` are cosine similarities, higher is better,
+    whatever the backend measures internally. ``where`` filters on metadata
+    equality, e.g. ``{"assistant_id": ...}`` in a shared collection.
+    """
+
+    backend = None
+    # BM25Index over the same chunks, attached when the store is opened.
+    lexical = None
+
+    def get_hashes(self, ids: List[str]) -> Dict[str, str]:
+        """Stored ``content_hash`` for those of ``ids`` that exist."""
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def delete_where(self, where: dict):
+        raise NotImplementedError
+
+    def get_documents(self, ids: List[str] = None, where: dict = None) -> List[Document]:
+        """Stored chunks for ``ids``, or every chunk matching ``where``."""
+        raise NotImplementedError
+
+    def iter_batches(self, batch_size: int = 1000) -> Iterator[Tuple[list, list, list, list]]:
+        """Every stored (ids, embeddings, documents, metadatas), in batches."""
+        raise NotImplementedError
+
+    def search(self, embedding, k: int = 5, where: dict = None) -> List[Tuple[Document, float]]:
+        raise NotImplementedError
+
+    def count(self, where: dict = None) -> int:
+        raise NotImplementedError
+
+    def persist(self):
+        pass
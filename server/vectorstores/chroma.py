@@ -0,0 +1,55 @@
+from langchain.vectorstores.chroma import Chroma
+from langchain.schema.document import Document
+from server.vectorstores.base import VectorStore
+
+CHROMA_MARKERS = ("chroma-collections.parquet", "chroma-embeddings.parquet", "chroma.sqlite3")
+
+
+class ChromaVectorStore(VectorStore):
+    backend = "chroma"
+
+    def __init__(self, persist_directory: str, embedding_function):
+        self.store = Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+    def get_hashes(self, ids):
+        stored = self.store._collection.get(ids=list(ids), include=["metadatas"])
+        return {
+            chunk_id: (metadata or {}).get("content_hash")
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.store._collection.upsert(ids=list(ids), embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids):
+        self.store.delete(ids=list(ids))
+
+    def delete_where(self, where):
+        self.store._collection.delete(where=where)
+
+    def get_documents(self, ids=None, where=None):
+        stored = self.store._collection.get(ids=list(ids) if ids is not None else None, where=where, include=["documents", "metadatas"])
+        return [
+            Document(page_content=document, metadata=metadata or {})
+            for document, metadata in zip(stored["documents"], stored["metadatas"])
+        ]
+
+    def iter_batches(self, batch_size: int = 1000):
+        ids = self.store._collection.get(include=[])["ids"]
+        for start in range(0, len(ids), batch_size):
+            stored = self.store._collection.get(ids=ids[start:start + batch_size], include=["embeddings", "documents", "metadatas"])
+            yield stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"]
+
+    def search(self, embedding, k: int = 5, where=None):
+        results = self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where)
+        # Chroma returns squared L2 distances; for unit vectors that is
+        # 2 - 2 * cosine similarity.
+        return [(doc, 1.0 - distance / 2.0) for doc, distance in results]
+
+    def count(self, where=None) -> int:
+        if where is not None:
+            return len(self.store._collection.get(where=where, include=[])["ids"])
+        return self.store._collection.count()
+
+    def persist(self):
+        self.store.persist()
@@ -0,0 +1,86 @@
+import json
+import os
+from server.utils.embedding import EMBEDDING_MODEL, get_embedding_function
+from server.utils.bm25 import BM25Index, lexical_path
+from server.vectorstores.chroma import ChromaVectorStore, CHROMA_MARKERS
+from server.vectorstores.local import LocalVectorStore, STORE_FILE
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+EMBEDDING_FILE = "embedding.json"
+# Stores written before the model was recorded were all embedded with the
+# default model, whatever the assistant was configured with, through
+# /api/embeddings, which does not normalise.
+LEGACY_EMBEDDING = {"provider": "ollama", "model": EMBEDDING_MODEL, "normalized": False}
+
+
+def _existing_backend(vector_db_location: str):
+    if os.path.exists(os.path.join(vector_db_location, STORE_FILE)):
+        return "local"
+    if any(os.path.exists(os.path.join(vector_db_location, marker)) for marker in CHROMA_MARKERS):
+        return "chroma"
+    return None
+
+
+def backend_for(vector_db_location: str) -> str:
+    # Existing collections keep the backend they were written with.
+    return _existing_backend(vector_db_location) or VECTOR_STORE_BACKEND
+
+
+def embedding_info(engine) -> dict:
+    return {"provider": engine.provider, "model": engine.model, "normalized": engine.normalize}
+
+
+def _describe(info: dict) -> str:
+    return f"{info['provider']}:{info['model']}" + ("" if info.get("normalized", True) else " (unnormalised)")
+
+
+def store_embedding(vector_db_location: str):
+    """The embedding a store's vectors were written with; None for a new store."""
+    path = os.path.join(vector_db_location, EMBEDDING_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    if _existing_backend(vector_db_location) is not None:
+        return dict(LEGACY_EMBEDDING)
+    return None
+
+
+def record_store_embedding(vector_db_location: str, info: dict):
+    """Records the embedding of a store about to be written.
+
+    Raises ValueError when the store already holds another model's vectors:
+    they differ in dimension and meaning, so the two cannot share an index.
+    Callers hold the store's write lock.
+    """
+    recorded = store_embedding(vector_db_location)
+    if recorded is not None:
+        if (recorded["provider"], recorded["model"], recorded.get("normalized", True)) != (info["provider"], info["model"], info["normalized"]):
+            raise ValueError(
+                f"{vector_db_location} holds {_describe(recorded)} embeddings; refusing to write {_describe(info)} vectors into it"
+            )
+        if os.path.exists(os.path.join(vector_db_location, EMBEDDING_FILE)):
+            return
+    os.makedirs(vector_db_location, exist_ok=True)
+    path = os.path.join(vector_db_location, EMBEDDING_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(recorded or info, f)
+    os.replace(path + ".tmp", path)
+
+
+def _open_backend(vector_db_location: str, embedding_function, backend: str):
+    if backend == "local":
+        return LocalVectorStore(vector_db_location)
+    if backend == "chroma":
+        return ChromaVectorStore(vector_db_location, embedding_function or get_embedding_function())
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def open_vector_store(vector_db_location: str, embedding_function=None, backend: str = None):
+    store = _open_backend(vector_db_location, embedding_function, backend or backend_for(vector_db_location))
+    store.lexical = BM25Index(lexical_path(vector_db_location))
+    if not store.lexical.exists() and store.count():
+        # Collections written before the lexical index existed are indexed
+        # once from their stored chunks.
+        documents = store.get_documents()
+        store.lexical.add([doc.metadata.get("id") for doc in documents], [doc.page_content for doc in documents])
+    return store
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import re
+
+# "assistant": one store per assistant under data/<tenant>/<assistant>/CHROMA.
+# "tenant": assistants on the same embedding model share
+# data/<tenant>/COLLECTION_<model>[_<shard>] and are told apart by the
+# assistant_id metadata field. Vectors of different models never share one.
+VECTOR_STORE_LAYOUT = os.getenv("VECTOR_STORE_LAYOUT", "assistant")
+VECTOR_STORE_SHARDS = int(os.getenv("VECTOR_STORE_SHARDS", "1"))
+ASSISTANT_DIRECTORY = "CHROMA"
+SHARED_DIRECTORY = "COLLECTION"
+LAYOUTS = ("assistant", "tenant")
+
+
+def _embedding_name(embedding: dict) -> str:
+    name = f"{embedding['provider']}-{embedding['model']}" + ("" if embedding.get("normalized", True) else "-raw")
+    # Model names carry ":" and "/"; the digest keeps distinct names apart
+    # once those are replaced.
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:6]}"
+
+
+def vector_db_location_for(data_path: str, tenant_id: str, assistant_id: str, layout: str = None, embedding: dict = None) -> str:
+    """Store directory for a new assistant; ``embedding`` (see factory.embedding_info) is needed for the tenant layout."""
+    layout = layout or VECTOR_STORE_LAYOUT
+    if layout == "tenant":
+        if embedding is None:
+            raise ValueError("The tenant layout needs the assistant's embedding model")
+        name = f"{SHARED_DIRECTORY}_{_embedding_name(embedding)}"
+        if VECTOR_STORE_SHARDS > 1:
+            shard = int(hashlib.sha1(assistant_id.encode("utf-8")).hexdigest(), 16) % VECTOR_STORE_SHARDS
+            name = f"{name}_{shard:02d}"
+        return os.path.join(data_path, tenant_id, name)
+    if layout == "assistant":
+        return os.path.join(data_path, tenant_id, assistant_id, ASSISTANT_DIRECTORY)
+    raise ValueError(f"Unknown vector store layout: {layout}")
+
+
+def is_shared_location(vector_db_location: str) -> bool:
+    return os.path.basename(os.path.normpath(vector_db_location)).startswith(SHARED_DIRECTORY)
+
+
+def assistant_folder(vector_db_location: str, assistant_id: str) -> str:
+    """data/<tenant>/<assistant> for either layout."""
+    parent = os.path.dirname(os.path.normpath(vector_db_location))
+    return os.path.join(parent, assistant_id) if is_shared_location(vector_db_location) else parent
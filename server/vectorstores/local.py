@@ -0,0 +1,409 @@
+import json
+import os
+import threading
+from array import array
+import numpy as np
+from langchain.schema.document import Document
+from server.vectorstores.base import VectorStore
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")
+# Collections up to this many live vectors are searched exactly.
+LOCAL_EXACT_MAX = int(os.getenv("LOCAL_EXACT_MAX", "50000"))
+LOCAL_SEARCH_BLOCK = int(os.getenv("LOCAL_SEARCH_BLOCK", "65536"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# persist() compacts once dead records (deleted or overwritten) outnumber
+# this fraction of the live ones, and there are at least LOCAL_COMPACT_MIN.
+LOCAL_COMPACT_RATIO = float(os.getenv("LOCAL_COMPACT_RATIO", "0.5"))
+LOCAL_COMPACT_MIN = int(os.getenv("LOCAL_COMPACT_MIN", "1000"))
+
+STORE_FILE = "store.json"
+VECTORS_FILE = "vectors.bin"
+RECORDS_FILE = "records.jsonl"
+HNSW_FILE = "hnsw.bin"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector index over a memory-mapped matrix.
+
+    Vectors are unit-normalised and stored row by row in ``vectors.bin`` as
+    float32 or float16, so cosine similarity is a dot product and the matrix
+    is paged in by the OS rather than held on the heap. Ids, texts and
+    metadata live in an append-only ``records.jsonl`` that is replayed on
+    open. Small collections are scanned exactly in blocks; above
+    ``LOCAL_EXACT_MAX`` live vectors an HNSW index is used when hnswlib is
+    installed. The index is saved on ``persist`` together with the number of
+    records it covers, and anything written after that is re-added on open.
+    ``compact`` rewrites both files with live rows only; the rewritten pair
+    is switched to through ``store.json``, so a crash leaves the old pair.
+    """
+
+    backend = "local"
+
+    def __init__(self, directory: str, dtype: str = LOCAL_VECTOR_DTYPE, exact_max: int = LOCAL_EXACT_MAX):
+        self.directory = directory
+        self.exact_max = exact_max
+        self._lock = threading.RLock()
+        self.dim = None
+        self.dtype = np.dtype(dtype)
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._alive = bytearray()
+        self.row_of = {}
+        self._records = 0
+        self._matrix = None
+        self._hnsw = None
+        self._hnsw_records = 0
+        self._hnsw_stale = set()
+        self._masks = {}
+        # Bumped by compact(), which renumbers rows.
+        self.generation = 0
+        # Rows of a shared collection by assistant, as int codes, so one
+        # assistant's rows are found without walking every metadata dict.
+        self._assistant_codes = {}
+        self._row_assistants = array("i")
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _data_path(self, name: str, generation: int = None) -> str:
+        # vectors.bin / records.jsonl, or vectors.3.bin / records.3.jsonl
+        # after the third compaction.
+        generation = self.generation if generation is None else generation
+        if not generation:
+            return self._path(name)
+        stem, extension = os.path.splitext(name)
+        return self._path(f"{stem}.{generation}{extension}")
+
+    def _load(self):
+        if not os.path.exists(self._path(STORE_FILE)):
+            return
+        with open(self._path(STORE_FILE)) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.generation = meta.get("generation", 0)
+        hnsw_records = meta.get("hnsw_records", 0)
+
+        if os.path.exists(self._data_path(RECORDS_FILE)):
+            with open(self._data_path(RECORDS_FILE)) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # A torn final line from an interrupted write.
+                        break
+                    self._apply(json.loads(line), stale=self._records >= hnsw_records)
+                    self._records += 1
+
+        # Rows whose record never made it to disk are ignored.
+        self._open_matrix()
+        if hnswlib is not None and hnsw_records and os.path.exists(self._path(HNSW_FILE)):
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.load_index(self._path(HNSW_FILE), max_elements=max(len(self.ids), 1))
+            self._hnsw.set_ef(HNSW_EF_SEARCH)
+            self._hnsw_records = hnsw_records
+
+    def _apply(self, record: dict, stale: bool = False):
+        if record["op"] == "put":
+            row = record["row"]
+            code = self._assistant_code(record["metadata"].get("assistant_id"))
+            if row == len(self.ids):
+                self.ids.append(record["id"])
+                self.documents.append(record["document"])
+                self.metadatas.append(record["metadata"])
+                self._alive.append(1)
+                self._row_assistants.append(code)
+            else:
+                self.ids[row] = record["id"]
+                self.documents[row] = record["document"]
+                self.metadatas[row] = record["metadata"]
+                self._alive[row] = 1
+                self._row_assistants[row] = code
+            self.row_of[record["id"]] = row
+            if stale:
+                self._hnsw_stale.add(row)
+        else:
+            row = self.row_of.pop(record["id"], None)
+            if row is not None:
+                self._alive[row] = 0
+                if stale:
+                    self._hnsw_stale.add(row)
+
+    def _assistant_code(self, assistant_id):
+        if assistant_id is None:
+            return -1
+        code = self._assistant_codes.get(assistant_id)
+        if code is None:
+            code = self._assistant_codes[assistant_id] = len(self._assistant_codes)
+        return code
+
+    @property
+    def alive(self) -> np.ndarray:
+        return np.frombuffer(bytes(self._alive), dtype=bool)
+
+    def _open_matrix(self):
+        rows = len(self.ids)
+        if rows and self.dim:
+            self._matrix = np.memmap(self._data_path(VECTORS_FILE), dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        else:
+            self._matrix = None
+
+    def _write_meta(self):
+        meta = {"dim": self.dim, "dtype": self.dtype.name, "hnsw_records": self._hnsw_records, "generation": self.generation}
+        tmp = self._path(STORE_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(STORE_FILE))
+
+    def get_hashes(self, ids):
+        with self._lock:
+            return {
+                chunk_id: self.metadatas[self.row_of[chunk_id]].get("content_hash")
+                for chunk_id in ids if chunk_id in self.row_of
+            }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32)).astype(self.dtype)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_meta()
+            if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Store {self.directory} holds {self.dim}-dimensional vectors, got shape {vectors.shape}"
+                )
+            records = []
+            vectors_path = self._data_path(VECTORS_FILE)
+            with open(vectors_path, "r+b" if os.path.exists(vectors_path) else "w+b") as f:
+                rows = {}
+                next_row = len(self.ids)
+                for chunk_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                    row = rows.get(chunk_id, self.row_of.get(chunk_id))
+                    if row is None:
+                        row = rows[chunk_id] = next_row
+                        next_row += 1
+                    f.seek(row * self.dim * self.dtype.itemsize)
+                    f.write(vector.tobytes())
+                    records.append({"op": "put", "row": row, "id": chunk_id, "document": document, "metadata": metadata})
+            self._append(records)
+
+    def delete(self, ids):
+        with self._lock:
+            self._append([{"op": "del", "id": chunk_id} for chunk_id in ids if chunk_id in self.row_of])
+
+    def _append(self, records):
+        if not records:
+            return
+        with open(self._data_path(RECORDS_FILE), "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+        for record in records:
+            self._apply(record, stale=True)
+        self._records += len(records)
+        self._masks = {}
+        self._open_matrix()
+
+    def _live_mask(self, where: dict = None) -> np.ndarray:
+        """Live rows whose metadata matches ``where``; cached until the next write."""
+        alive = self.alive
+        if not where:
+            return alive
+        if len(where) == 1 and "assistant_id" in where:
+            code = self._assistant_codes.get(where["assistant_id"])
+            if code is None:
+                return np.zeros(len(alive), dtype=bool)
+            return alive & (np.frombuffer(self._row_assistants.tobytes(), dtype=np.int32) == code)
+        key = tuple(sorted(where.items()))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = np.fromiter(
+                (all(metadata.get(field) == value for field, value in where.items()) for metadata in self.metadatas),
+                dtype=bool, count=len(self.metadatas),
+            )
+        return alive & mask
+
+    def delete_where(self, where):
+        with self._lock:
+            rows = np.flatnonzero(self._live_mask(where))
+            self._append([{"op": "del", "id": self.ids[row]} for row in rows])
+
+    def count(self, where=None) -> int:
+        with self._lock:
+            if where is None:
+                return len(self.row_of)
+            return int(self._live_mask(where).sum())
+
+    def get_documents(self, ids=None, where=None):
+        with self._lock:
+            if ids is None:
+                rows = np.flatnonzero(self._live_mask(where))
+            else:
+                rows = [self.row_of[chunk_id] for chunk_id in ids if chunk_id in self.row_of]
+            return [Document(page_content=self.documents[row], metadata=self.metadatas[row]) for row in rows]
+
+    def iter_batches(self, batch_size: int = 1000):
+        # Batches are looked up by id, as a compaction in between renumbers rows.
+        with self._lock:
+            chunk_ids = [self.ids[row] for row in np.flatnonzero(self.alive)]
+        for start in range(0, len(chunk_ids), batch_size):
+            with self._lock:
+                batch = [self.row_of[chunk_id] for chunk_id in chunk_ids[start:start + batch_size] if chunk_id in self.row_of]
+                if not batch:
+                    continue
+                yield (
+                    [self.ids[row] for row in batch],
+                    np.asarray(self._matrix[batch], dtype=np.float32).tolist(),
+                    [self.documents[row] for row in batch],
+                    [self.metadatas[row] for row in batch],
+                )
+
+    def _result(self, row: int, score: float):
+        return Document(page_content=self.documents[row], metadata=self.metadatas[row]), float(score)
+
+    def _exact(self, query: np.ndarray, k: int, matrix, alive):
+        # Only matching rows are read, so a small assistant in a large shared
+        # collection does not pay for scanning everyone else's vectors.
+        rows = np.flatnonzero(alive)
+        k = min(k, len(rows))
+        if k <= 0:
+            return [], []
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), LOCAL_SEARCH_BLOCK):
+            block_rows = rows[start:start + LOCAL_SEARCH_BLOCK]
+            if block_rows[-1] - block_rows[0] == len(block_rows) - 1:
+                block = matrix[block_rows[0]:block_rows[-1] + 1]
+            else:
+                block = matrix[block_rows]
+            scores[start:start + len(block_rows)] = np.asarray(block, dtype=np.float32) @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def _ensure_hnsw(self):
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.init_index(max_elements=max(len(self.ids), 1024), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+            self._hnsw.set_ef(HNSW_EF_SEARCH)
+            self._hnsw_stale = set(range(len(self.ids)))
+        if not self._hnsw_stale:
+            return
+        if len(self.ids) > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(max(len(self.ids), 2 * self._hnsw.get_max_elements()))
+        rows = np.fromiter(sorted(self._hnsw_stale), dtype=np.int64)
+        alive = self.alive[rows]
+        live = rows[alive]
+        if len(live):
+            self._hnsw.add_items(np.asarray(self._matrix[live], dtype=np.float32), live)
+        for row in rows[~alive]:
+            try:
+                self._hnsw.mark_deleted(int(row))
+            except RuntimeError:
+                pass
+        self._hnsw_stale = set()
+
+    def _search_hnsw(self, query: np.ndarray, k: int, mask):
+        self._ensure_hnsw()
+        self._hnsw.set_ef(max(HNSW_EF_SEARCH, k))
+        try:
+            if mask is None:
+                labels, distances = self._hnsw.knn_query(query, k=k)
+            else:
+                labels, distances = self._hnsw.knn_query(query, k=k, filter=lambda row: bool(mask[row]))
+        except RuntimeError:
+            # The graph could not produce k filtered neighbours.
+            return None
+        return [self._result(int(row), 1.0 - distance) for row, distance in zip(labels[0], distances[0])]
+
+    def search(self, embedding, k: int = 5, where=None):
+        query = _normalize(np.asarray([embedding], dtype=np.float32))[0]
+        while True:
+            with self._lock:
+                if not self.row_of:
+                    return []
+                alive = self._live_mask(where)
+                live = int(alive.sum()) if where else len(self.row_of)
+                if hnswlib is not None and live > self.exact_max:
+                    results = self._search_hnsw(query, min(k, live), alive if where else None)
+                    if results is not None:
+                        return results
+                matrix = self._matrix
+                generation = self.generation
+
+            rows, scores = self._exact(query, k, matrix, alive)
+            with self._lock:
+                # Rows found before a compaction point at other chunks now.
+                if self.generation == generation:
+                    return [self._result(int(row), score) for row, score in zip(rows, scores)]
+
+    def _should_compact(self) -> bool:
+        dead = self._records - len(self.row_of)
+        return dead >= LOCAL_COMPACT_MIN and dead > LOCAL_COMPACT_RATIO * len(self.row_of)
+
+    def compact(self):
+        """Rewrites the vectors and records with live rows only, renumbered in order."""
+        with self._lock:
+            if self._matrix is None:
+                return
+            live = np.flatnonzero(self.alive)
+            generation = self.generation + 1
+            with open(self._data_path(VECTORS_FILE, generation), "wb") as f:
+                for start in range(0, len(live), LOCAL_SEARCH_BLOCK):
+                    f.write(np.ascontiguousarray(self._matrix[live[start:start + LOCAL_SEARCH_BLOCK]]).tobytes())
+            with open(self._data_path(RECORDS_FILE, generation), "w") as f:
+                for new_row, row in enumerate(live):
+                    record = {"op": "put", "row": new_row, "id": self.ids[row], "document": self.documents[row], "metadata": self.metadatas[row]}
+                    f.write(json.dumps(record) + "\n")
+
+            previous = self.generation
+            self.ids = [self.ids[row] for row in live]
+            self.documents = [self.documents[row] for row in live]
+            self.metadatas = [self.metadatas[row] for row in live]
+            self._alive = bytearray(b"\x01" * len(live))
+            self._row_assistants = array("i", (self._row_assistants[row] for row in live))
+            self.row_of = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+            self._records = len(live)
+            self._masks = {}
+            # Row numbers are the HNSW labels, so the graph is rebuilt when
+            # next needed.
+            self._hnsw = None
+            self._hnsw_records = 0
+            self._hnsw_stale = set()
+            self.generation = generation
+            self._write_meta()
+            self._open_matrix()
+
+            for name in (VECTORS_FILE, RECORDS_FILE):
+                try:
+                    os.remove(self._data_path(name, previous))
+                except FileNotFoundError:
+                    pass
+            if os.path.exists(self._path(HNSW_FILE)):
+                os.remove(self._path(HNSW_FILE))
+
+    def persist(self):
+        with self._lock:
+            if self._should_compact():
+                self.compact()
+            if self._matrix is not None:
+                self._matrix.flush()
+            if self._hnsw is not None:
+                self._ensure_hnsw()
+                self._hnsw.save_index(self._path(HNSW_FILE))
+                self._hnsw_records = self._records
+            if self.dim is not None:
+                self._write_meta()
@@ -0,0 +1,89 @@
+"""Moves per-assistant vector stores into the tenant-shared layout.
+
+    python -m server.vectorstores.migrate_layout [--tenant TENANT] [--remove-old]
+
+Vectors are copied as stored, so nothing is re-embedded, into the tenant's
+collection for the model they were written with. Each assistant is
+copied and then repointed in one transaction; re-running the tool skips
+assistants that already live in a shared collection.
+"""
+import argparse
+import shutil
+from server.database.db import db_connection
+from server.utils.store_cache import vector_stores, get_vector_store
+from server.vectorstores.factory import embedding_info, open_vector_store, record_store_embedding, store_embedding
+from server.utils.models import models
+from server.vectorstores.layout import vector_db_location_for, is_shared_location
+
+DATA_PATH = "data"
+COPY_BATCH_SIZE = 1000
+
+
+def copy_store(old_location: str, new_location: str, assistant_id: str) -> int:
+    source = open_vector_store(old_location)
+    target = get_vector_store(new_location, assistant_id=assistant_id)
+    copied = 0
+    with vector_stores.write_lock(new_location):
+        recorded = store_embedding(old_location)
+        if recorded is not None:
+            record_store_embedding(new_location, recorded)
+        for ids, embeddings, documents, metadatas in source.iter_batches(COPY_BATCH_SIZE):
+            target.upsert(ids, embeddings, documents, metadatas)
+            target.lexical.add(ids, documents)
+            copied += len(ids)
+        target.persist()
+        vector_stores.mark_updated(new_location, assistant_id)
+    return copied
+
+
+def migrate_assistant(cursor, tenant_id: str, assistant_id: str, old_location: str, configured: dict):
+    # The collection is chosen by the model the vectors were written with,
+    # which for older stores is not necessarily the configured one.
+    embedding = store_embedding(old_location) or configured
+    new_location = vector_db_location_for(DATA_PATH, tenant_id, assistant_id, layout="tenant", embedding=embedding)
+    copied = copy_store(old_location, new_location, assistant_id)
+    cursor.execute(
+        "UPDATE assistants SET vector_db_location = %s WHERE id = %s AND tenant_id = %s",
+        (new_location, assistant_id, tenant_id)
+    )
+    cursor.execute(
+        "UPDATE files SET vector_db_location = %s WHERE assistant_id = %s AND tenant_id = %s",
+        (new_location, assistant_id, tenant_id)
+    )
+    print(f"✅ {tenant_id}/{assistant_id}: {copied} chunks -> {new_location}")
+
+
+def migrate(tenant_id: str = None, remove_old: bool = False):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        if tenant_id:
+            cursor.execute(
+                "SELECT tenant_id, id, vector_db_location, embedding_provider, embedding_model FROM assistants WHERE tenant_id = %s ORDER BY id",
+                (tenant_id,)
+            )
+        else:
+            cursor.execute("SELECT tenant_id, id, vector_db_location, embedding_provider, embedding_model FROM assistants ORDER BY tenant_id, id")
+        assistants = [row for row in cursor.fetchall() if row[2] and not is_shared_location(row[2])]
+
+        for tenant, assistant_id, old_location, provider, model in assistants:
+            try:
+                configured = embedding_info(models.embedding_model(provider, model))
+                migrate_assistant(cursor, tenant, assistant_id, old_location, configured)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ {tenant}/{assistant_id}: {e}")
+                continue
+            vector_stores.invalidate(old_location)
+            if remove_old:
+                # Only once the rows point at the shared collection.
+                shutil.rmtree(old_location, ignore_errors=True)
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenant")
+    parser.add_argument("--remove-old", action="store_true", help="delete each per-assistant directory once migrated")
+    args = parser.parse_args()
+    migrate(args.tenant, args.remove_old)
@@ -0,0 +1,87 @@
+from server.vectorstores.base import VectorStore
+
+SCOPE_SEPARATOR = "::"
+
+
+class _ScopedLexical:
+    def __init__(self, index, scope):
+        self.index = index
+        self.scope = scope
+
+    def exists(self) -> bool:
+        return self.index.exists()
+
+    def add(self, ids, texts):
+        self.index.add(self.scope.qualify(ids), texts, group=self.scope.assistant_id)
+
+    def delete(self, ids):
+        self.index.delete(self.scope.qualify(ids))
+
+    def search(self, query_text: str, k: int = 20):
+        results = self.index.search(query_text, k=k, group=self.scope.assistant_id)
+        return [(self.scope.unqualify(chunk_id), score) for chunk_id, score in results]
+
+
+class AssistantScopedStore(VectorStore):
+    """One assistant's view of a collection shared by a tenant.
+
+    Stored ids are prefixed with the assistant id so chunk ids (which can be
+    a bare URL for web sources) never collide between assistants, and every
+    chunk carries ``assistant_id`` in its metadata for filtered search and
+    delete. Callers keep using plain chunk ids.
+    """
+
+    def __init__(self, store: VectorStore, assistant_id: str):
+        self.store = store
+        self.assistant_id = assistant_id
+        self.backend = store.backend
+        self.where = {"assistant_id": assistant_id}
+        self.prefix = f"{assistant_id}{SCOPE_SEPARATOR}"
+        self.lexical = _ScopedLexical(store.lexical, self) if store.lexical is not None else None
+
+    def qualify(self, ids):
+        return [self.prefix + chunk_id for chunk_id in ids]
+
+    def unqualify(self, chunk_id: str) -> str:
+        return chunk_id[len(self.prefix):] if chunk_id.startswith(self.prefix) else chunk_id
+
+    def get_hashes(self, ids):
+        return {self.unqualify(chunk_id): value for chunk_id, value in self.store.get_hashes(self.qualify(ids)).items()}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        metadatas = [{**metadata, "assistant_id": self.assistant_id} for metadata in metadatas]
+        self.store.upsert(self.qualify(ids), embeddings, documents, metadatas)
+
+    def delete(self, ids):
+        self.store.delete(self.qualify(ids))
+
+    def delete_where(self, where):
+        self.store.delete_where({**where, **self.where})
+
+    def delete_all(self):
+        self.store.delete_where(self.where)
+        if self.store.lexical is not None:
+            self.store.lexical.delete_group(self.assistant_id)
+
+    def get_documents(self, ids=None, where=None):
+        if ids is not None:
+            return self.store.get_documents(self.qualify(ids))
+        return self.store.get_documents(where={**(where or {}), **self.where})
+
+    def iter_batches(self, batch_size: int = 1000):
+        for ids, embeddings, documents, metadatas in self.store.iter_batches(batch_size):
+            keep = [i for i, metadata in enumerate(metadatas) if (metadata or {}).get("assistant_id") == self.assistant_id]
+            if keep:
+                yield (
+                    [self.unqualify(ids[i]) for i in keep], [embeddings[i] for i in keep],
+                    [documents[i] for i in keep], [metadatas[i] for i in keep],
+                )
+
+    def search(self, embedding, k: int = 5, where=None):
+        return self.store.search(embedding, k=k, where={**(where or {}), **self.where})
+
+    def count(self, where=None) -> int:
+        return self.store.count(where={**(where or {}), **self.where})
+
+    def persist(self):
+        self.store.persist()
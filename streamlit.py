@@ -1,109 +1,140 @@
 import streamlit as st
 import requests
 import pandas as pd
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import os, json
 st.set_page_config(page_title="maxchat",)
-def create_connection():
-    conn = psycopg2.connect(
-        dbname=os.getenv("POSTGRES_DBNAME"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        host=os.getenv("POSTGRES_HOST"),
-        port=os.getenv("POSTGRES_PORT")
-    )
-    return conn
-
-def get_chat_history():
-    conn = create_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT DISTINCT ON (thread_id) 
-            thread_id, 
-            assistant_id, 
-            tenant_id, 
-            message_text, 
-            created_at, 
-            id
-        FROM messages
-        ORDER BY thread_id, created_at DESC
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return pd.DataFrame(rows)
-
-def get_messages(thread_id):
-    conn = create_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT message_text FROM messages
-        WHERE thread_id = %s
-        ORDER BY created_at
-    """, (thread_id,))
-    messages = cur.fetchall()
-    cur.close()
-    conn.close()
-    
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:1111/api/v1/assistant")
+API_TOKEN = os.getenv("API_TOKEN", "")
+DEFAULT_ASSISTANT_ID = os.getenv("ASSISTANT_ID", "default_assistant_id")
+
+def auth_headers():
+    return {"Authorization": f"Bearer {API_TOKEN}"}
+
+THREAD_PAGE_SIZE = 50
+
+# Threads come newest activity first, a page at a time; ``pages`` grows when
+# the user asks for older chats.
+def get_chat_history(pages=1):
+    threads = []
+    cursor = None
+    for _ in range(pages):
+        params = {"limit": THREAD_PAGE_SIZE}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(f"{API_BASE_URL}/threads", params=params, headers=auth_headers())
+        response.raise_for_status()
+        body = response.json()
+        threads.extend(body["threads"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    columns = ["id", "assistant_id", "tenant_id", "created_at", "last_message_at", "message_count"]
+    history = pd.DataFrame(threads, columns=columns).rename(columns={"id": "thread_id"})
+    return history, cursor is not None
+
+MESSAGE_PAGE_SIZE = 50
+
+# The newest page of a thread, oldest message first, and the cursor for the
+# page before it (None at the start of the thread).
+def get_messages(assistant_id, thread_id, cursor=None):
+    params = {"limit": MESSAGE_PAGE_SIZE, "order": "desc"}
+    if cursor:
+        params["cursor"] = cursor
+    response = requests.get(f"{API_BASE_URL}/{assistant_id}/threads/{thread_id}/messages", params=params, headers=auth_headers())
+    response.raise_for_status()
+    body = response.json()
     flattened_messages = []
-    for msg in messages:
-        try:
-            parsed_messages = json.loads(msg['message_text'])
-            flattened_messages.extend(parsed_messages)
-        except json.JSONDecodeError:
-            st.error(f"Error parsing JSON for message: {msg['message_text']}")
-    
-    return flattened_messages
-
-def send_message(thread_id, assistant_id, tenant_id, query_text):
-    base_url = "http://localhost:8000/api/v1/query"
-    url = f"{base_url}?assistant_id=83a78f36-2b72-4432-b197-881be8457fa4&tenant_id=2"
-    
-    if thread_id:
-        url += f"&thread_id={thread_id}"
-    
+    for exchange in reversed(body["messages"]):
+        flattened_messages.extend(exchange["messages"])
+    return flattened_messages, body["next_cursor"]
+
+def create_thread(assistant_id):
+    response = requests.post(f"{API_BASE_URL}/{assistant_id}/thread", headers=auth_headers())
+    response.raise_for_status()
+    return response.json()["thread_id"]
+
+# Yields response tokens as they arrive; the closing "done" event (sources,
+# thread_id) or an "error" event is copied into ``final``.
+def stream_message(thread_id, assistant_id, query_text, final):
+    if not thread_id:
+        thread_id = create_thread(assistant_id)
+    final["thread_id"] = thread_id
+
     payload = {
         "query_text": query_text
     }
-    
-    response = requests.post(url, json=payload)
-    return response.json()
+
+    with requests.post(
+        f"{API_BASE_URL}/{assistant_id}/query/{thread_id}/stream",
+        json=payload,
+        headers=auth_headers(),
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    yield data["content"]
+                elif event == "done":
+                    final.update(data)
+                elif event == "error":
+                    final["error"] = data
 
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'current_thread_id' not in st.session_state:
     st.session_state.current_thread_id = None
 if 'current_assistant_id' not in st.session_state:
-    st.session_state.current_assistant_id = "default_assistant_id"
+    st.session_state.current_assistant_id = DEFAULT_ASSISTANT_ID
 if 'current_tenant_id' not in st.session_state:
     st.session_state.current_tenant_id = "default_tenant_id"
 if 'is_new_chat' not in st.session_state:
     st.session_state.is_new_chat = False
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = 1
+if 'earlier_messages_cursor' not in st.session_state:
+    st.session_state.earlier_messages_cursor = None
 
 st.sidebar.title("Chat History")
 
 if st.sidebar.button("New Chat"):
     st.session_state.current_thread_id = None
     st.session_state.messages = []
+    st.session_state.earlier_messages_cursor = None
     st.session_state.is_new_chat = True
     st.rerun()
 
-history = get_chat_history()
+history, has_more = get_chat_history(st.session_state.history_pages)
 selected_thread = st.sidebar.selectbox(
     "Select a chat:",
     [""] + list(history['thread_id']),
-    format_func=lambda x: f"Thread {x} - {history[history['thread_id'] == x]['created_at'].iloc[0]}" if x else "Select a chat"
+    format_func=lambda x: f"Thread {x} - {history[history['thread_id'] == x]['last_message_at'].iloc[0]}" if x else "Select a chat"
 )
+if has_more and st.sidebar.button("Older chats"):
+    st.session_state.history_pages += 1
+    st.rerun()
 
 if selected_thread and selected_thread != st.session_state.current_thread_id:
     st.session_state.current_thread_id = selected_thread
-    st.session_state.messages = get_messages(selected_thread)
     selected_row = history[history['thread_id'] == selected_thread].iloc[0]
+    st.session_state.messages, st.session_state.earlier_messages_cursor = get_messages(selected_row['assistant_id'], selected_thread)
     st.session_state.current_assistant_id = selected_row['assistant_id']
     st.session_state.current_tenant_id = selected_row['tenant_id']
     st.session_state.is_new_chat = False
 
+if st.session_state.earlier_messages_cursor and st.button("Load earlier messages"):
+    earlier, st.session_state.earlier_messages_cursor = get_messages(
+        st.session_state.current_assistant_id,
+        st.session_state.current_thread_id,
+        st.session_state.earlier_messages_cursor
+    )
+    st.session_state.messages = earlier + st.session_state.messages
+    st.rerun()
+
 chat_container = st.container()
 with chat_container:
     for message in st.session_state.messages:
@@ -118,24 +149,24 @@ if prompt := st.chat_input("Type your message here..."):
         st.write(prompt)
 
     with response_placeholder.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = send_message(
+        final = {}
+        try:
+            assistant_response = st.write_stream(stream_message(
                 st.session_state.current_thread_id,
                 st.session_state.current_assistant_id,
-                st.session_state.current_tenant_id,
-                prompt
-            )
-
-            if st.session_state.is_new_chat or not st.session_state.current_thread_id:
-                st.session_state.current_thread_id = response.get('thread_id')
-                st.session_state.is_new_chat = False
-
-            if response.get('message') == "Query executed":
-                assistant_response = response.get('result', {}).get('response', 'No response')
-            else:
-                assistant_response = 'An error occurred while processing your request.'
-            
+                prompt,
+                final
+            ))
+        except requests.RequestException:
+            assistant_response = 'An error occurred while processing your request.'
             st.write(assistant_response)
+        if 'error' in final:
+            assistant_response = f"An error occurred while processing your request: {final['error']['detail']}"
+            st.write(assistant_response)
+
+        if st.session_state.is_new_chat or not st.session_state.current_thread_id:
+            st.session_state.current_thread_id = final.get('thread_id')
+            st.session_state.is_new_chat = False
 
     st.session_state.messages.append({"role": "assistant", "content": assistant_response})
 
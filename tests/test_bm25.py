@@ -0,0 +1,54 @@
+from server.utils.bm25 import BM25Index, tokenize
+
+
+def test_tokenize_keeps_numbers_whole_and_split():
+    tokens = tokenize("Call 0812-3451-1449 now")
+
+    assert "0812-3451-1449" in tokens
+    assert "081234511449" in tokens
+    assert "3451" in tokens
+    assert tokens[0] == "call"
+
+
+def test_search_ranks_matching_chunks(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a", "b", "c"], ["red apple pie", "green apple", "blue sky"])
+
+    results = index.search("apple pie")
+
+    assert [chunk_id for chunk_id, _score in results] == ["a", "b"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_replaced_and_deleted_chunks_are_not_returned(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a", "b"], ["apple", "apple banana"])
+    index.add(["a"], ["cherry"])
+    index.delete(["b"])
+
+    assert index.search("apple") == []
+    assert [chunk_id for chunk_id, _score in index.search("cherry")] == ["a"]
+    assert len(index) == 1
+
+
+def test_groups_are_searched_and_deleted_separately(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a"], ["apple"], group="g1")
+    index.add(["b"], ["apple"], group="g2")
+
+    assert [chunk_id for chunk_id, _score in index.search("apple", group="g2")] == ["b"]
+    assert index.search("apple", group="unknown") == []
+
+    index.delete_group("g1")
+    assert [chunk_id for chunk_id, _score in index.search("apple")] == ["b"]
+
+
+def test_reopen_replays_postings(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a", "b"], ["apple", "banana"])
+    index.delete(["a"])
+
+    reopened = BM25Index(str(tmp_path))
+
+    assert reopened.search("apple") == []
+    assert [chunk_id for chunk_id, _score in reopened.search("banana")] == ["b"]
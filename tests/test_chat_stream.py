@@ -0,0 +1,108 @@
+import asyncio
+from server.api.v1.assistant.schema.workflow import QueryRequest
+from server.api.v1.assistant.workflows import chat_handler
+
+
+def _stream(monkeypatch, tokens):
+    saved = []
+
+    async def prepare_thread(assistant_id, tenant_id, thread_id):
+        return {"type": "rag", "settings": {}}, thread_id
+
+    async def stream_rag(query_text, assistant_id, thread_id, assistant):
+        return {"tokens": tokens(), "sources": []}
+
+    async def save_message(query_text, assistant_response, assistant_id, tenant_id, thread_id, assistant=None, partial=False):
+        saved.append({"query": query_text, "response": assistant_response, "partial": partial})
+
+    monkeypatch.setattr(chat_handler, "_prepare_thread", prepare_thread)
+    monkeypatch.setattr(chat_handler, "stream_rag", stream_rag)
+    monkeypatch.setattr(chat_handler, "_save_message", save_message)
+    return saved
+
+
+async def _read(response, events=None):
+    received = []
+    async for chunk in response.body_iterator:
+        received.append(chunk)
+        if events is not None and len(received) == events:
+            await response.body_iterator.aclose()
+            break
+    return received
+
+
+def _respond():
+    return chat_handler.stream_query_endpoint(QueryRequest(query_text="hi"), "assistant", "thread", "tenant")
+
+
+def test_completed_stream_saves_full_turn(monkeypatch):
+    async def tokens():
+        for token in ("Hello", " there"):
+            yield token
+
+    saved = _stream(monkeypatch, tokens)
+
+    async def run():
+        return await _read(await _respond())
+
+    received = asyncio.run(run())
+
+    assert received[-1].startswith("event: done")
+    assert saved == [{"query": "hi", "response": "Hello there", "partial": False}]
+
+
+def test_cancelled_stream_saves_partial_turn(monkeypatch):
+    async def tokens():
+        yield "Hello"
+        yield " there"
+        await asyncio.sleep(3600)
+        yield "never sent"
+
+    saved = _stream(monkeypatch, tokens)
+
+    async def run():
+        return await _read(await _respond(), events=2)
+
+    received = asyncio.run(run())
+
+    assert len(received) == 2
+    assert saved == [{"query": "hi", "response": "Hello there", "partial": True}]
+
+
+def test_cancelled_task_still_saves_partial_turn(monkeypatch):
+    async def tokens():
+        yield "Hello"
+        await asyncio.sleep(3600)
+        yield "never sent"
+
+    saved = _stream(monkeypatch, tokens)
+
+    async def run():
+        task = asyncio.create_task(_read(await _respond()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+
+    assert saved == [{"query": "hi", "response": "Hello", "partial": True}]
+
+
+def test_failed_stream_reports_error_and_saves_nothing(monkeypatch):
+    async def tokens():
+        yield "Hello"
+        raise RuntimeError("model went away")
+
+    saved = _stream(monkeypatch, tokens)
+
+    async def run():
+        return await _read(await _respond())
+
+    received = asyncio.run(run())
+
+    assert received[-1].startswith("event: error")
+    assert '"status": 500' in received[-1]
+    assert saved == []
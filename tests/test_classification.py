@@ -0,0 +1,28 @@
+from server.utils.classification import is_due, parse_label
+
+
+def test_parse_label_prefers_label_line():
+    response = "Qualified leads ask for prices.\nLabel: L1-Junk"
+
+    assert parse_label(response) == "L1-Junk"
+
+
+def test_parse_label_does_not_read_longer_label_as_shorter():
+    assert parse_label("Label: [L1-Qualified]") == "L1-Qualified"
+
+
+def test_parse_label_skips_label_line_listing_every_label():
+    response = "Label: L1-Qualified, S_JUNK, Qualified, L1-Junk\nThis one is S_JUNK."
+
+    assert parse_label(response) == "S_JUNK"
+
+
+def test_parse_label_without_label():
+    assert parse_label("I cannot tell.") is None
+
+
+def test_is_due():
+    assert not is_due(9, None, threshold=10)
+    assert is_due(10, None, threshold=10)
+    assert not is_due(15, 10, threshold=10)
+    assert is_due(20, 10, threshold=10)
@@ -0,0 +1,62 @@
+from langchain.schema.document import Document
+from server.utils.context import build_context, build_history, merge_adjacent, mmr, parse_chunk_id
+
+
+def _doc(text, chunk_id=None):
+    return Document(page_content=text, metadata={"id": chunk_id} if chunk_id else {})
+
+
+def test_parse_chunk_id():
+    assert parse_chunk_id("data/a.pdf:3:2") == ("data/a.pdf:3", 2)
+    assert parse_chunk_id("data/a.pdf:3:x") is None
+    assert parse_chunk_id(None) is None
+
+
+def test_mmr_drops_near_duplicates():
+    results = [
+        (_doc("the quick brown fox jumps"), 0.9),
+        (_doc("the quick brown fox jumps"), 0.8),
+        (_doc("an unrelated sentence here"), 0.5),
+    ]
+
+    picked = mmr(results, k=3)
+
+    assert [score for _doc, score in picked] == [0.9, 0.5]
+
+
+def test_merge_adjacent_joins_neighbours_and_drops_overlap():
+    results = [
+        (_doc("first part of the page text", "a.pdf:1:0"), 0.9),
+        (_doc("other page", "a.pdf:2:0"), 0.7),
+        (_doc("of the page text and then more", "a.pdf:1:1"), 0.5),
+    ]
+
+    merged = merge_adjacent(results)
+
+    assert merged[0] == ("first part of the page text and then more", ["a.pdf:1:0", "a.pdf:1:1"], 0.9)
+    assert merged[1] == ("other page", ["a.pdf:2:0"], 0.7)
+
+
+def test_build_context_truncates_when_nothing_fits():
+    results = [(_doc("word " * 400), 1.0)]
+
+    context = build_context(results, budget=10)
+
+    assert 0 < context.tokens <= 10
+    assert context.results == results
+
+
+def test_build_history_keeps_newest_turns_oldest_first():
+    messages = [
+        '[{"role": "user", "content": "third"}, {"role": "assistant", "content": "3"}]',
+        [{"role": "user", "content": "second"}, {"role": "assistant", "content": "2"}],
+        "not json",
+    ]
+
+    text, tokens = build_history(messages, budget=1000)
+
+    assert text == "not json\nUser: second\nAssistant: 2\nUser: third\nAssistant: 3"
+    assert tokens > 0
+
+    text, _tokens = build_history(messages, budget=6)
+    assert text == "User: third\nAssistant: 3"
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pytest
+from server.vectorstores import local
+from server.vectorstores.local import LocalVectorStore
+
+
+def _put(store, ids, vectors, assistant_id="a1"):
+    store.upsert(ids, vectors, [f"text {chunk_id}" for chunk_id in ids], [{"id": chunk_id, "assistant_id": assistant_id} for chunk_id in ids])
+
+
+def _ids(results):
+    return [doc.metadata["id"] for doc, _score in results]
+
+
+def test_search_returns_nearest_with_cosine_scores(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x", "y", "z"], [[1, 0, 0], [0, 2, 0], [1, 1, 0]])
+
+    results = store.search([3, 0, 0], k=2)
+
+    assert _ids(results) == ["x", "z"]
+    assert results[0][1] == pytest.approx(1.0)
+    assert results[1][1] == pytest.approx(1 / np.sqrt(2), rel=1e-3)
+
+
+def test_upsert_overwrites_existing_id_in_place(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x", "y"], [[1, 0], [0, 1]])
+    _put(store, ["x"], [[0, 1]])
+
+    assert store.count() == 2
+    assert len(store.ids) == 2
+    assert store.search([0, 1], k=1)[0][1] == pytest.approx(1.0)
+
+
+def test_upsert_rejects_other_dimension(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x"], [[1, 0, 0]])
+
+    with pytest.raises(ValueError):
+        _put(store, ["y"], [[1, 0]])
+    assert store.count() == 1
+
+
+def test_where_filters_by_assistant(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x"], [[1, 0]], assistant_id="a1")
+    _put(store, ["y"], [[1, 0.1]], assistant_id="a2")
+
+    assert _ids(store.search([1, 0], k=5, where={"assistant_id": "a2"})) == ["y"]
+    assert store.count({"assistant_id": "a1"}) == 1
+    assert store.count({"assistant_id": "unknown"}) == 0
+
+    store.delete_where({"assistant_id": "a1"})
+    assert _ids(store.search([1, 0], k=5)) == ["y"]
+
+
+def test_reopen_replays_records_and_ignores_torn_line(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x", "y"], [[1, 0], [0, 1]])
+    store.delete(["x"])
+    store.persist()
+    with open(tmp_path / local.RECORDS_FILE, "a") as f:
+        f.write('{"op": "put", "row": 2')
+
+    reopened = LocalVectorStore(str(tmp_path))
+
+    assert reopened.count() == 1
+    assert _ids(reopened.search([1, 0], k=5)) == ["y"]
+
+
+def test_compact_drops_dead_rows_and_survives_reopen(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x", "y", "z"], [[1, 0], [0, 1], [1, 1]])
+    _put(store, ["y"], [[0, 1]])
+    store.delete(["x"])
+
+    store.compact()
+
+    assert store.ids == ["y", "z"]
+    assert store.row_of == {"y": 0, "z": 1}
+    assert not os.path.exists(tmp_path / local.VECTORS_FILE)
+    assert not os.path.exists(tmp_path / local.RECORDS_FILE)
+    with open(store._data_path(local.RECORDS_FILE)) as f:
+        assert len(f.readlines()) == 2
+
+    reopened = LocalVectorStore(str(tmp_path))
+    assert reopened.generation == 1
+    assert _ids(reopened.search([0, 1], k=2)) == ["y", "z"]
+    _put(reopened, ["w"], [[-1, 0]])
+    assert reopened.search([-1, 0], k=1)[0][1] == pytest.approx(1.0)
+
+
+def test_persist_compacts_past_the_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "LOCAL_COMPACT_MIN", 2)
+    store = LocalVectorStore(str(tmp_path))
+    _put(store, ["x", "y", "z"], [[1, 0], [0, 1], [1, 1]])
+    store.delete(["x", "y"])
+
+    store.persist()
+
+    assert store.generation == 1
+    assert store.ids == ["z"]
+
+
+def test_hnsw_search_matches_exact(tmp_path):
+    pytest.importorskip("hnswlib")
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 8))
+    ids = [str(i) for i in range(len(vectors))]
+    exact = LocalVectorStore(str(tmp_path / "exact"))
+    approximate = LocalVectorStore(str(tmp_path / "hnsw"), exact_max=10)
+    _put(exact, ids, vectors)
+    _put(approximate, ids, vectors)
+
+    query = vectors[17]
+    assert _ids(approximate.search(query, k=1)) == _ids(exact.search(query, k=1)) == ["17"]
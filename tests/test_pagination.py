@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+import pytest
+from fastapi import HTTPException
+from server.utils.pagination import decode_cursor, encode_cursor, page
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(timestamp, "row-1")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, "row-1")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(datetime(2024, 5, 1), "x")[:-4]])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_page_splits_off_the_extra_row():
+    timestamp = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    rows = [("a", timestamp), ("b", timestamp), ("c", timestamp)]
+
+    assert page(rows, 3, key=lambda row: (row[1], row[0])) == (rows, None)
+
+    rows_page, cursor = page(rows, 2, key=lambda row: (row[1], row[0]))
+    assert rows_page == rows[:2]
+    assert decode_cursor(cursor) == (timestamp, "b")